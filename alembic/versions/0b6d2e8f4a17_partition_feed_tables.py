@@ -0,0 +1,139 @@
+"""Partition feed tables by month
+
+Revision ID: 0b6d2e8f4a17
+Revises: f3a7c1e9b250
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic
+revision = '0b6d2e8f4a17'
+down_revision = 'f3a7c1e9b250'
+branch_labels = None
+depends_on = None
+
+# Feed ids set aside for the latest month's partition
+FEEDS_PER_PARTITION = 1000000
+
+
+def create_feed_post_table(**kwargs):
+    op.create_table('feed_post',
+        sa.Column('feed_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('comment_count', sa.Integer(), nullable=False),
+        sa.Column('feed_rank', sa.Integer(), nullable=False),
+        sa.Column('point_count', sa.Integer(), nullable=False),
+        sa.Column('comments_carried', sa.Boolean(),
+            server_default=sa.false(), nullable=False),
+        sa.ForeignKeyConstraint(['feed_id'], ['feed.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('feed_id', 'post_id'),
+        **kwargs
+    )
+    op.create_index('feed_post_feed_index', 'feed_post',
+        ['feed_id', 'post_id'], unique=False,
+        postgresql_include=['comment_count', 'feed_rank', 'point_count'])
+
+
+def create_feed_comment_table(**kwargs):
+    op.create_table('feed_comment',
+        sa.Column('comment_id', sa.Integer(), nullable=False),
+        sa.Column('feed_id', sa.Integer(), nullable=False),
+        sa.Column('feed_rank', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['comment_id'], ['comment.id'],
+            ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['feed_id'], ['feed.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('comment_id', 'feed_id'),
+        **kwargs
+    )
+    op.create_index('feed_comment_feed_index', 'feed_comment',
+        ['feed_id', 'comment_id'], unique=False,
+        postgresql_include=['feed_rank'])
+
+
+def rename_table(table, new_table):
+    op.rename_table(table, new_table)
+    op.execute('ALTER INDEX ' + table + '_pkey RENAME TO ' + new_table +
+        '_pkey')
+    op.execute('ALTER INDEX ' + table + '_feed_index RENAME TO ' + new_table +
+        '_feed_index')
+
+
+def move_rows(from_table, to_table):
+    op.execute('INSERT INTO ' + to_table + ' SELECT * FROM ' + from_table)
+    op.drop_table(from_table)
+
+
+def get_partition_bounds():
+    connection = op.get_bind()
+
+    # Start each month's partition at the first feed id of that month or
+    # any later one, so partitions keep to the order of feed ids
+    months = connection.execute(sa.text("""
+        SELECT month, MIN(first_id) OVER (ORDER BY month DESC) AS start
+          FROM (SELECT date_trunc('month', created) AS month,
+                       MIN(id) AS first_id
+                  FROM feed
+              GROUP BY 1) AS feed_month
+      ORDER BY month
+        """)).all()
+
+    last_id = connection.execute(sa.text('SELECT GREATEST((SELECT MAX(id) '
+        'FROM feed), (SELECT last_value FROM feed_id_seq))')).scalar()
+
+    if not months:
+        months = connection.execute(sa.text("SELECT date_trunc('month', "
+            "NOW() AT TIME ZONE 'UTC') AS month, NULL AS start")).all()
+
+    # Skip months whose feeds all have ids after a later month's, and hold
+    # every id before the first month in its partition
+    bounds = []
+
+    for index, (month, start) in enumerate(months):
+        if index + 1 < len(months) and months[index + 1].start == start:
+            continue
+
+        bounds.append([month, start])
+
+    bounds[0][1] = None
+
+    return [(month, start, end) for (month, start), end in zip(bounds,
+        [start for _, start in bounds[1:]] +
+        [last_id + FEEDS_PER_PARTITION])]
+
+
+def create_partitions(table, bounds):
+    for month, start, end in bounds:
+        op.execute('CREATE TABLE ' + table + month.strftime('_%Y_%m') +
+            ' PARTITION OF ' + table + ' FOR VALUES FROM (' +
+            ('MINVALUE' if start is None else str(start)) + ') TO (' +
+            str(end) + ')')
+
+
+def upgrade():
+    # Rebuild tables partitioned by feed id, one partition per month of
+    # feeds, moving their rows into them
+    bounds = get_partition_bounds()
+
+    rename_table('feed_post', 'feed_post_unpartitioned')
+    create_feed_post_table(postgresql_partition_by='RANGE (feed_id)')
+    create_partitions('feed_post', bounds)
+    move_rows('feed_post_unpartitioned', 'feed_post')
+
+    rename_table('feed_comment', 'feed_comment_unpartitioned')
+    create_feed_comment_table(postgresql_partition_by='RANGE (feed_id)')
+    create_partitions('feed_comment', bounds)
+    move_rows('feed_comment_unpartitioned', 'feed_comment')
+
+
+def downgrade():
+    rename_table('feed_post', 'feed_post_partitioned')
+    create_feed_post_table()
+    move_rows('feed_post_partitioned', 'feed_post')
+
+    rename_table('feed_comment', 'feed_comment_partitioned')
+    create_feed_comment_table()
+    move_rows('feed_comment_partitioned', 'feed_comment')
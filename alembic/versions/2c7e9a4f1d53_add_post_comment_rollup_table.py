@@ -0,0 +1,62 @@
+"""Add post comment rollup table
+
+Revision ID: 2c7e9a4f1d53
+Revises: 6f1b3d8e2a40
+Create Date: 2026-10-19 11:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic
+revision = '2c7e9a4f1d53'
+down_revision = '6f1b3d8e2a40'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 10000
+
+
+def upgrade():
+    op.create_table('post_comment_rollup',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('comment_count', sa.BigInteger(), nullable=False),
+        sa.Column('level_sum', sa.BigInteger(), nullable=False),
+        sa.Column('word_count_sum', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id')
+    )
+
+    # Roll up stored comments a batch of posts at a time, committing each
+    # batch, rather than summing every comment in one transaction
+    connection = op.get_bind()
+
+    with op.get_context().autocommit_block():
+        last_id = 0
+
+        while True:
+            batch_end = connection.execute(sa.text('SELECT MAX(id) FROM '
+                '(SELECT id FROM post WHERE id > :last_id ORDER BY id '
+                'LIMIT :batch_size) AS batch'), {'last_id': last_id,
+                'batch_size': BATCH_SIZE}).scalar()
+
+            if batch_end is None:
+                break
+
+            connection.execute(sa.text("""
+                INSERT INTO post_comment_rollup
+                     SELECT post_id, COUNT(*), SUM(level),
+                            SUM(total_word_count)
+                       FROM comment
+                      WHERE post_id > :last_id
+                        AND post_id <= :batch_end
+                   GROUP BY post_id
+                """), {'last_id': last_id, 'batch_end': batch_end})
+
+            last_id = batch_end
+
+
+def downgrade():
+    op.drop_table('post_comment_rollup')
@@ -0,0 +1,101 @@
+"""Add feed rollup table
+
+Revision ID: 4e8c2a6d9f31
+Revises: 9d5a3f7b2c18
+Create Date: 2026-10-19 00:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic
+revision = '4e8c2a6d9f31'
+down_revision = '9d5a3f7b2c18'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 100
+
+
+def upgrade():
+    op.create_table('feed_rollup',
+        sa.Column('feed_id', sa.Integer(), nullable=False),
+        sa.Column('feed_post_count', sa.BigInteger(), nullable=False),
+        sa.Column('comment_count_sum', sa.BigInteger(), nullable=False),
+        sa.Column('point_count_sum', sa.BigInteger(), nullable=False),
+        sa.Column('feed_comment_count', sa.BigInteger(), nullable=False),
+        sa.Column('level_sum', sa.BigInteger(), nullable=False),
+        sa.Column('word_count_sum', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['feed_id'], ['feed.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('feed_id')
+    )
+
+    # Roll up feeds scraped before this a batch of consecutive feeds at a
+    # time, committing each batch, rather than summing every feed's rows in
+    # one transaction (comment intervals are bounded by the batch, so ones
+    # that ended before it aren't scanned)
+    connection = op.get_bind()
+
+    with op.get_context().autocommit_block():
+        last_id = 0
+
+        while True:
+            batch_end = connection.execute(sa.text('SELECT MAX(id) FROM '
+                '(SELECT id FROM feed WHERE id > :last_id ORDER BY id '
+                'LIMIT :batch_size) AS batch'), {'last_id': last_id,
+                'batch_size': BATCH_SIZE}).scalar()
+
+            if batch_end is None:
+                break
+
+            connection.execute(sa.text("""
+                WITH posts AS (
+                     SELECT feed_id, COUNT(*) AS feed_post_count,
+                            SUM(comment_count) AS comment_count_sum,
+                            SUM(point_count) AS point_count_sum
+                       FROM feed_post
+                      WHERE feed_id > :last_id
+                        AND feed_id <= :batch_end
+                   GROUP BY feed_id
+                ), comments AS (
+                     SELECT feed.id AS feed_id,
+                            COUNT(*) AS feed_comment_count,
+                            SUM(comment.level) AS level_sum,
+                            SUM(comment.total_word_count) AS word_count_sum
+                       FROM comment_interval
+                            JOIN feed
+                              ON feed.source = comment_interval.source
+                             AND feed.id BETWEEN comment_interval.first_feed_id
+                                 AND comment_interval.last_feed_id
+                            JOIN comment
+                              ON comment.id = comment_interval.comment_id
+                      WHERE feed.id > :last_id
+                        AND feed.id <= :batch_end
+                        AND comment_interval.last_feed_id > :last_id
+                        AND comment_interval.first_feed_id <= :batch_end
+                   GROUP BY feed.id
+                )
+                INSERT INTO feed_rollup
+                     SELECT feed.id,
+                            COALESCE(posts.feed_post_count, 0),
+                            COALESCE(posts.comment_count_sum, 0),
+                            COALESCE(posts.point_count_sum, 0),
+                            COALESCE(comments.feed_comment_count, 0),
+                            COALESCE(comments.level_sum, 0),
+                            COALESCE(comments.word_count_sum, 0)
+                       FROM feed
+                            LEFT JOIN posts
+                                   ON posts.feed_id = feed.id
+                            LEFT JOIN comments
+                                   ON comments.feed_id = feed.id
+                      WHERE feed.id > :last_id
+                        AND feed.id <= :batch_end
+                """), {'last_id': last_id, 'batch_end': batch_end})
+
+            last_id = batch_end
+
+
+def downgrade():
+    op.drop_table('feed_rollup')
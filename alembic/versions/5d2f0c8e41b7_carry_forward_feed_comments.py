@@ -0,0 +1,28 @@
+"""Carry forward feed comments
+
+Revision ID: 5d2f0c8e41b7
+Revises: 3a45b3d1ba9a
+Create Date: 2026-10-18 12:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic
+revision = '5d2f0c8e41b7'
+down_revision = '3a45b3d1ba9a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('feed_post', sa.Column('comments_carried', sa.Boolean(),
+        server_default=sa.false(), nullable=False))
+    op.create_index('comment_post_id_index', 'comment', ['post_id'],
+        unique=False)
+
+
+def downgrade():
+    op.drop_index('comment_post_id_index', table_name='comment')
+    op.drop_column('feed_post', 'comments_carried')
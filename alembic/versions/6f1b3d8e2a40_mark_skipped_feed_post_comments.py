@@ -0,0 +1,25 @@
+"""Mark skipped feed post comments
+
+Revision ID: 6f1b3d8e2a40
+Revises: 4e8c2a6d9f31
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic
+revision = '6f1b3d8e2a40'
+down_revision = '4e8c2a6d9f31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('feed_post', sa.Column('comments_skipped', sa.Boolean(),
+        server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    op.drop_column('feed_post', 'comments_skipped')
@@ -0,0 +1,120 @@
+"""Store comment rank intervals
+
+Revision ID: 7c4e1a9d3b62
+Revises: 0b6d2e8f4a17
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic
+revision = '7c4e1a9d3b62'
+down_revision = '0b6d2e8f4a17'
+branch_labels = None
+depends_on = None
+
+
+def get_partition_bounds():
+    # Partition by the same months of feeds as feed_post
+    return op.get_bind().execute(sa.text("""
+        SELECT substring(child.relname FROM '_\\d{4}_\\d{2}$') AS month,
+               pg_get_expr(child.relpartbound, child.oid) AS bound
+          FROM pg_inherits
+          JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+         WHERE pg_inherits.inhparent = CAST('feed_post' AS regclass)
+        """)).all()
+
+
+def create_partitions(table):
+    for month, bound in get_partition_bounds():
+        op.execute('CREATE TABLE ' + table + month + ' PARTITION OF ' +
+            table + ' ' + bound)
+
+
+def upgrade():
+    op.create_table('comment_interval',
+        sa.Column('comment_id', sa.Integer(), nullable=False),
+        sa.Column('source', postgresql.ENUM('news', 'newest', 'ask', 'show',
+            'best', name='feed_source', create_type=False), nullable=False),
+        sa.Column('first_feed_id', sa.Integer(), nullable=False),
+        sa.Column('last_feed_id', sa.Integer(), nullable=False),
+        sa.Column('feed_rank', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['comment_id'], ['comment.id'],
+            ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['first_feed_id'], ['feed.id'],
+            ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['last_feed_id'], ['feed.id'],
+            ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('comment_id', 'source', 'last_feed_id'),
+        postgresql_partition_by='RANGE (last_feed_id)'
+    )
+    op.create_index('comment_interval_feed_index', 'comment_interval',
+        ['source', 'last_feed_id', 'first_feed_id'], unique=False,
+        postgresql_include=['comment_id', 'feed_rank'])
+    create_partitions('comment_interval')
+
+    # Merge each comment's ranks in consecutive feeds of a list into
+    # intervals, numbering feeds of each list in order so consecutive feeds
+    # with the same rank share an interval
+    op.execute("""
+        INSERT INTO comment_interval (comment_id, source, first_feed_id,
+                    last_feed_id, feed_rank)
+             SELECT comment_id, source, MIN(feed_id), MAX(feed_id), feed_rank
+               FROM (SELECT feed_comment.comment_id, feed_comment.feed_id,
+                            feed_comment.feed_rank, feed.source,
+                            feed.feed_number - ROW_NUMBER() OVER (
+                                PARTITION BY feed_comment.comment_id,
+                                             feed.source,
+                                             feed_comment.feed_rank
+                                    ORDER BY feed.feed_number
+                            ) AS interval_number
+                       FROM feed_comment
+                       JOIN (SELECT id, source, ROW_NUMBER() OVER (
+                                        PARTITION BY source ORDER BY id
+                                    ) AS feed_number
+                               FROM feed) AS feed
+                         ON feed.id = feed_comment.feed_id) AS ranks
+           GROUP BY comment_id, source, feed_rank, interval_number
+        """)
+
+    op.drop_table('feed_comment')
+
+    # Read intervals as a rank for each feed they cover
+    op.execute("""
+        CREATE VIEW feed_comment AS
+             SELECT comment_interval.comment_id, feed.id AS feed_id,
+                    comment_interval.feed_rank
+               FROM comment_interval
+               JOIN feed
+                 ON feed.source = comment_interval.source
+                AND feed.id BETWEEN comment_interval.first_feed_id
+                                AND comment_interval.last_feed_id
+        """)
+
+
+def downgrade():
+    op.execute('CREATE TABLE feed_comment_ranks AS SELECT * FROM '
+        'feed_comment')
+    op.execute('DROP VIEW feed_comment')
+
+    op.create_table('feed_comment',
+        sa.Column('comment_id', sa.Integer(), nullable=False),
+        sa.Column('feed_id', sa.Integer(), nullable=False),
+        sa.Column('feed_rank', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['comment_id'], ['comment.id'],
+            ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['feed_id'], ['feed.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('comment_id', 'feed_id'),
+        postgresql_partition_by='RANGE (feed_id)'
+    )
+    op.create_index('feed_comment_feed_index', 'feed_comment',
+        ['feed_id', 'comment_id'], unique=False,
+        postgresql_include=['feed_rank'])
+    create_partitions('feed_comment')
+
+    op.execute('INSERT INTO feed_comment SELECT * FROM feed_comment_ranks')
+    op.drop_table('feed_comment_ranks')
+    op.drop_table('comment_interval')
@@ -0,0 +1,30 @@
+"""Add feed source
+
+Revision ID: 8b3e6f1a9c24
+Revises: 5d2f0c8e41b7
+Create Date: 2026-10-18 14:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic
+revision = '8b3e6f1a9c24'
+down_revision = '5d2f0c8e41b7'
+branch_labels = None
+depends_on = None
+
+feed_source = sa.Enum('news', 'newest', 'ask', 'show', 'best',
+    name='feed_source')
+
+
+def upgrade():
+    feed_source.create(op.get_bind())
+    op.add_column('feed', sa.Column('source', feed_source,
+        server_default='news', nullable=False))
+
+
+def downgrade():
+    op.drop_column('feed', 'source')
+    feed_source.drop(op.get_bind())
@@ -0,0 +1,88 @@
+"""Add post summary table
+
+Revision ID: 9d5a3f7b2c18
+Revises: 7c4e1a9d3b62
+Create Date: 2026-10-18 23:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic
+revision = '9d5a3f7b2c18'
+down_revision = '7c4e1a9d3b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('post_summary',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('first_feed_id', sa.Integer(), nullable=False),
+        sa.Column('last_feed_id', sa.Integer(), nullable=False),
+        sa.Column('comment_count', sa.Integer(), nullable=False),
+        sa.Column('feed_rank', sa.Integer(), nullable=False),
+        sa.Column('point_count', sa.Integer(), nullable=False),
+        sa.Column('max_comment_count', sa.Integer(), nullable=False),
+        sa.Column('max_comment_feed_rank', sa.Integer(), nullable=False),
+        sa.Column('max_comment_point_count', sa.Integer(), nullable=False),
+        sa.Column('max_point_comment_count', sa.Integer(), nullable=False),
+        sa.Column('max_point_feed_rank', sa.Integer(), nullable=False),
+        sa.Column('max_point_count', sa.Integer(), nullable=False),
+        sa.Column('best_rank_comment_count', sa.Integer(), nullable=False),
+        sa.Column('best_feed_rank', sa.Integer(), nullable=False),
+        sa.Column('best_rank_point_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id')
+    )
+
+    # Summarize each post from its front page feed rows: its first and last
+    # feeds, and the first of its rows in order of each snapshot
+    op.execute("""
+        INSERT INTO post_summary
+             SELECT post_id, MIN(feed_id), MAX(feed_id),
+                    (ARRAY_AGG(comment_count ORDER BY feed_id DESC))[1],
+                    (ARRAY_AGG(feed_rank ORDER BY feed_id DESC))[1],
+                    (ARRAY_AGG(point_count ORDER BY feed_id DESC))[1],
+                    (ARRAY_AGG(comment_count
+                        ORDER BY comment_count DESC, feed_id))[1],
+                    (ARRAY_AGG(feed_rank
+                        ORDER BY comment_count DESC, feed_id))[1],
+                    (ARRAY_AGG(point_count
+                        ORDER BY comment_count DESC, feed_id))[1],
+                    (ARRAY_AGG(comment_count
+                        ORDER BY point_count DESC, feed_id))[1],
+                    (ARRAY_AGG(feed_rank
+                        ORDER BY point_count DESC, feed_id))[1],
+                    (ARRAY_AGG(point_count
+                        ORDER BY point_count DESC, feed_id))[1],
+                    (ARRAY_AGG(comment_count
+                        ORDER BY feed_rank, point_count DESC, feed_id))[1],
+                    (ARRAY_AGG(feed_rank
+                        ORDER BY feed_rank, point_count DESC, feed_id))[1],
+                    (ARRAY_AGG(point_count
+                        ORDER BY feed_rank, point_count DESC, feed_id))[1]
+               FROM feed_post
+                    JOIN feed
+                      ON feed.id = feed_post.feed_id
+              WHERE feed.source = 'news'
+           GROUP BY post_id
+        """)
+
+    # Index after filling the table, rather than updating indexes per row
+    op.create_index('post_summary_comment_count_index', 'post_summary',
+        [sa.text('max_comment_count DESC')], unique=False)
+    op.create_index('post_summary_point_count_index', 'post_summary',
+        [sa.text('max_point_count DESC')], unique=False)
+    op.create_index('post_summary_rank_index', 'post_summary',
+        ['best_feed_rank', sa.text('best_rank_point_count DESC')],
+        unique=False)
+
+
+def downgrade():
+    op.drop_index('post_summary_rank_index', table_name='post_summary')
+    op.drop_index('post_summary_point_count_index', table_name='post_summary')
+    op.drop_index('post_summary_comment_count_index',
+        table_name='post_summary')
+    op.drop_table('post_summary')
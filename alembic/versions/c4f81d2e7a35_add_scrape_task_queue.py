@@ -0,0 +1,50 @@
+"""Add scrape task queue
+
+Revision ID: c4f81d2e7a35
+Revises: 8b3e6f1a9c24
+Create Date: 2026-10-18 15:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic
+revision = 'c4f81d2e7a35'
+down_revision = '8b3e6f1a9c24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scrape_task',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('feed_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('comment_count', sa.Integer(), nullable=False),
+        sa.Column('share_feed_ids', postgresql.ARRAY(sa.Integer()),
+            server_default='{}', nullable=False),
+        sa.Column('status', sa.Enum('pending', 'running', 'done', 'failed',
+            name='scrape_task_status'), server_default='pending',
+            nullable=False),
+        sa.Column('claimed_by', sa.TEXT(), nullable=True),
+        sa.Column('lease_until', sa.TIMESTAMP(), nullable=True),
+        sa.Column('attempts', sa.Integer(), server_default='0',
+            nullable=False),
+        sa.Column('error', sa.TEXT(), nullable=True),
+        sa.ForeignKeyConstraint(['feed_id'], ['feed.id'],
+            ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'],
+            ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('feed_id', 'post_id')
+    )
+    op.create_index('scrape_task_claim_index', 'scrape_task',
+        ['status', 'lease_until'], unique=False)
+
+
+def downgrade():
+    op.drop_index('scrape_task_claim_index', table_name='scrape_task')
+    op.drop_table('scrape_task')
+    sa.Enum(name='scrape_task_status').drop(op.get_bind())
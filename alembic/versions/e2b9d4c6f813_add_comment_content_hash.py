@@ -0,0 +1,53 @@
+"""Add comment content hash
+
+Revision ID: e2b9d4c6f813
+Revises: c4f81d2e7a35
+Create Date: 2026-10-18 18:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic
+revision = 'e2b9d4c6f813'
+down_revision = 'c4f81d2e7a35'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 10000
+
+
+def upgrade():
+    # Add hash as a plain column, which doesn't rewrite the comment table
+    # (the loader hashes comments as it writes them)
+    op.add_column('comment', sa.Column('content_hash', sa.LargeBinary(),
+        nullable=True))
+
+    # Hash stored comments a batch of ids at a time, committing each batch,
+    # rather than rewriting and locking every comment in one transaction
+    # (comments still without a hash are rewritten when they are scraped)
+    connection = op.get_bind()
+
+    with op.get_context().autocommit_block():
+        last_id = 0
+
+        while True:
+            batch_end = connection.execute(sa.text('SELECT MAX(id) FROM '
+                '(SELECT id FROM comment WHERE id > :last_id ORDER BY id '
+                'LIMIT :batch_size) AS batch'), {'last_id': last_id,
+                'batch_size': BATCH_SIZE}).scalar()
+
+            if batch_end is None:
+                break
+
+            connection.execute(sa.text('UPDATE comment SET content_hash = '
+                "decode(md5(content), 'hex') WHERE id > :last_id AND id <= "
+                ':batch_end'), {'last_id': last_id, 'batch_end': batch_end})
+
+            last_id = batch_end
+
+
+def downgrade():
+    op.drop_column('comment', 'content_hash')
@@ -0,0 +1,67 @@
+"""Add feed-leading indexes
+
+Revision ID: f3a7c1e9b250
+Revises: e2b9d4c6f813
+Create Date: 2026-10-18 19:10:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic
+revision = 'f3a7c1e9b250'
+down_revision = 'e2b9d4c6f813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Build indexes without locking tables against scrapes, which can't be
+    # done in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('feed_source_created_index', 'feed',
+            ['source', 'created'], unique=False,
+            postgresql_concurrently=True)
+        op.create_index('feed_post_feed_index', 'feed_post',
+            ['feed_id', 'post_id'], unique=False,
+            postgresql_include=['comment_count', 'feed_rank', 'point_count'],
+            postgresql_concurrently=True)
+        op.create_index('feed_comment_feed_index', 'feed_comment',
+            ['feed_id', 'comment_id'], unique=False,
+            postgresql_include=['feed_rank'], postgresql_concurrently=True)
+        op.create_index('comment_stats_index', 'comment', ['id'],
+            unique=False, postgresql_include=['level', 'post_id',
+            'total_word_count', 'username'], postgresql_concurrently=True)
+
+        op.drop_index('feed_id_index', table_name='feed',
+            postgresql_concurrently=True)
+        op.drop_index('feed_post_index', table_name='feed_post',
+            postgresql_concurrently=True)
+        op.drop_index('feed_comment_index', table_name='feed_comment',
+            postgresql_concurrently=True)
+        op.drop_index('comment_index', table_name='comment',
+            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('comment_index', 'comment', ['id', 'level',
+            'parent_comment', 'post_id', 'total_word_count', 'username'],
+            unique=False, postgresql_concurrently=True)
+        op.create_index('feed_comment_index', 'feed_comment',
+            ['comment_id', 'feed_id', 'feed_rank'], unique=False,
+            postgresql_concurrently=True)
+        op.create_index('feed_post_index', 'feed_post', ['comment_count',
+            'feed_id', 'feed_rank', 'point_count', 'post_id'], unique=False,
+            postgresql_concurrently=True)
+        op.create_index('feed_id_index', 'feed', ['id'], unique=False,
+            postgresql_concurrently=True)
+
+        op.drop_index('comment_stats_index', table_name='comment',
+            postgresql_concurrently=True)
+        op.drop_index('feed_comment_feed_index', table_name='feed_comment',
+            postgresql_concurrently=True)
+        op.drop_index('feed_post_feed_index', table_name='feed_post',
+            postgresql_concurrently=True)
+        op.drop_index('feed_source_created_index', table_name='feed',
+            postgresql_concurrently=True)
@@ -0,0 +1,70 @@
+import argparse
+import gc
+import time
+import tracemalloc
+
+from hacker_news import parsers
+from utils import pages
+
+
+# Time each parser backend on a generated feed page and post page
+def time_parse(parse, content, repeat):
+    started = time.perf_counter()
+
+    for _ in range(repeat):
+        parse(content)
+
+    return (time.perf_counter() - started) / repeat
+
+
+# Measure memory allocated while parsing and kept by the returned records
+def measure_parse(parse, content):
+    tracemalloc.start()
+
+    try:
+        records = parse(content)
+
+        # Collect the parse tree's reference cycles before measuring
+        gc.collect()
+        kept, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    del records
+
+    return kept, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse time per page for '
+        'each HTML parser backend')
+    parser.add_argument('--posts', type=int, default=30)
+    parser.add_argument('--comments', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    posts = pages.synthetic_posts(args.posts)
+    feed_content = pages.feed_page(posts, more_page=2)
+    post_content = pages.post_page(posts[0]['id'],
+        pages.synthetic_thread(args.comments), more_page=2)
+
+    for name in parsers.PARSERS:
+        html_parser = parsers.get_parser(name)
+
+        feed_time = time_parse(html_parser.parse_feed_page, feed_content,
+            args.repeat)
+        post_time = time_parse(html_parser.parse_post_page, post_content,
+            args.repeat)
+
+        post_kept, post_peak = measure_parse(html_parser.parse_post_page,
+            post_content)
+
+        print(f'{name}: feed page with {args.posts} posts in '
+            f'{feed_time * 1000:.1f}ms, post page with {args.comments} '
+            f'comments in {post_time * 1000:.1f}ms (peak '
+            f'{post_peak / 1024 / 1024:.1f} MiB, records '
+            f'{post_kept / 1024:.0f} KiB)')
+
+
+if __name__ == '__main__':
+    main()
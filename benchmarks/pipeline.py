@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import os
+import testing.postgresql
+import time
+
+from hacker_news import client, models, parsers, scraper
+from utils.tests import FixtureServer, create_test_database
+
+from benchmarks.writes import generate_pages
+
+
+async def scrape(feed_id, parse_workers, parse_executor):
+    async with client.HackerNewsClient() as hn_client:
+        return await scraper.ScrapeRun(feed_id, hn_client,
+            parse_workers=parse_workers,
+            parse_executor=parse_executor).run()
+
+
+# Start pool of parse workers ahead of the run, as a long-running scraper
+# would keep it
+def start_parse_executor(parse_workers):
+    if not parse_workers:
+        return None
+
+    parse_executor = parsers.create_parse_executor(parse_workers)
+
+    list(parse_executor.map(parsers.parse_feed_page,
+        [b'<html></html>'] * parse_workers))
+
+    return parse_executor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scrape time by number of '
+        'parse worker processes')
+    parser.add_argument('--posts', type=int, default=30)
+    parser.add_argument('--comments', type=int, default=300)
+    parser.add_argument('--workers', type=int, nargs='+',
+        default=[0, 1, 2, 4, 8])
+    args = parser.parse_args()
+
+    generated_pages = generate_pages(args.posts, args.comments)
+
+    print(f'{os.cpu_count()} CPUs, {os.getenv("SCRAPE_PARSER") or "default"} '
+        'parser')
+
+    with testing.postgresql.Postgresql() as postgresql:
+        create_test_database(postgresql)
+
+        with FixtureServer(pages=generated_pages) as fixture_server:
+            os.environ['HN_BASE_URL'] = fixture_server.url
+
+            # Scrape the same pages with each number of parse workers (0
+            # parses on the event loop), timing runs after their workers have
+            # started; only the first scrape adds posts and comments, so it is
+            # run once more to warm up first
+            for parse_workers in [args.workers[0]] + args.workers:
+                session = models.Session()
+                feed = models.Feed()
+                session.add(feed)
+                session.commit()
+                feed_id = feed.id
+                session.close()
+
+                parse_executor = start_parse_executor(parse_workers)
+
+                started = time.perf_counter()
+                summary = asyncio.run(scrape(feed_id, parse_workers,
+                    parse_executor))
+                elapsed = time.perf_counter() - started
+
+                if parse_executor:
+                    parse_executor.shutdown()
+
+                print(f'{parse_workers} parse workers: {summary.pages} pages '
+                    f'in {elapsed:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import os
+import testing.postgresql
+
+from sqlalchemy import event
+
+from hacker_news import client, models, scraper
+from utils import pages
+from utils.tests import FixtureServer, create_test_database
+
+
+# Count database round trips made while scraping a feed page and a post page
+def count_round_trips(coroutine):
+    statements = []
+
+    def record(*args):
+        statements.append(args[2])
+
+    event.listen(models.engine, 'before_cursor_execute', record)
+
+    try:
+        asyncio.run(coroutine)
+    finally:
+        event.remove(models.engine, 'before_cursor_execute', record)
+
+    return len(statements)
+
+
+async def scrape_feed_page(feed_id):
+    async with client.HackerNewsClient() as hn_client:
+        await scraper.scrape_page(1, feed_id, hn_client)
+
+
+async def scrape_post_page(post_id, feed_id):
+    async with client.HackerNewsClient() as hn_client:
+        await scraper.scrape_post(post_id, feed_id, hn_client, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Database round trips per '
+        'scraped page')
+    parser.add_argument('--posts', type=int, default=30)
+    parser.add_argument('--comments', type=int, default=500)
+    args = parser.parse_args()
+
+    posts = pages.synthetic_posts(args.posts)
+    thread = pages.synthetic_thread(args.comments)
+    post_id = posts[0]['id']
+
+    generated_pages = {
+        '/news?p=1': pages.feed_page(posts),
+        '/item?id=' + str(post_id): pages.post_page(post_id, thread),
+        }
+
+    with testing.postgresql.Postgresql() as postgresql:
+        create_test_database(postgresql)
+
+        with FixtureServer(pages=generated_pages) as fixture_server:
+            os.environ['HN_BASE_URL'] = fixture_server.url
+
+            # Scrape the same pages twice: once into an empty database and
+            # once more when every post and comment already exists
+            for run in ('new rows', 'existing rows'):
+                session = models.Session()
+                feed = models.Feed()
+                session.add(feed)
+                session.commit()
+                feed_id = feed.id
+                session.close()
+
+                feed_round_trips = count_round_trips(
+                    scrape_feed_page(feed_id))
+                post_round_trips = count_round_trips(
+                    scrape_post_page(post_id, feed_id))
+
+                print(f'{run}: feed page with {args.posts} posts: '
+                    f'{feed_round_trips} round trips')
+                print(f'{run}: post page with {args.comments} comments: '
+                    f'{post_round_trips} round trips')
+
+
+if __name__ == '__main__':
+    main()
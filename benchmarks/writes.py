@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import os
+import testing.postgresql
+import time
+
+from sqlalchemy import text
+
+from hacker_news import client, models, scraper
+from utils import pages
+from utils.tests import FixtureServer, create_test_database
+
+
+# Build three feed pages of posts and a post page of comments for each post
+def generate_pages(posts_per_page, comments_per_post):
+    generated_pages = {}
+    first_comment_id = 100000
+
+    for page in (1, 2, 3):
+        posts = pages.synthetic_posts(posts_per_page,
+            first_id=1000 * page, seed=page)
+        generated_pages['/news?p=' + str(page)] = pages.feed_page(posts)
+
+        for post in posts:
+            thread = pages.synthetic_thread(comments_per_post,
+                first_id=first_comment_id, seed=post['id'])
+            first_comment_id += comments_per_post
+            generated_pages['/item?id=' + str(post['id'])] = pages.post_page(
+                post['id'], thread)
+
+    return generated_pages
+
+
+def wal_position(session):
+    return session.execute(text('SELECT pg_current_wal_lsn()')).scalar()
+
+
+async def scrape(feed_id):
+    async with client.HackerNewsClient() as hn_client:
+        return await scraper.ScrapeRun(feed_id, hn_client).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write time and WAL volume '
+        'per scrape')
+    parser.add_argument('--posts', type=int, default=30)
+    parser.add_argument('--comments', type=int, default=100)
+    args = parser.parse_args()
+
+    generated_pages = generate_pages(args.posts, args.comments)
+
+    with testing.postgresql.Postgresql() as postgresql:
+        create_test_database(postgresql)
+
+        with FixtureServer(pages=generated_pages) as fixture_server:
+            os.environ['HN_BASE_URL'] = fixture_server.url
+
+            # Scrape twice: once into an empty database and once more when
+            # only feed_post and feed_comment rows are new
+            for run in ('new rows', 'existing rows'):
+                session = models.Session()
+                feed = models.Feed()
+                session.add(feed)
+                session.commit()
+                feed_id = feed.id
+                start_wal = wal_position(session)
+
+                started = time.perf_counter()
+                summary = asyncio.run(scrape(feed_id))
+                elapsed = time.perf_counter() - started
+
+                wal_bytes = session.execute(
+                    text('SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), '
+                    ':start)'), {'start': start_wal}).scalar()
+                session.close()
+
+                print(f'{run}: {summary.posts} posts, {summary.comments} '
+                    f'comments in {elapsed:.2f}s, '
+                    f'{int(wal_bytes) / 1024 / 1024:.1f} MiB WAL')
+
+
+if __name__ == '__main__':
+    main()
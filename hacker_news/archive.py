@@ -0,0 +1,107 @@
+import calendar
+import gzip
+import hashlib
+import json
+import os
+import time
+
+from hacker_news import client
+
+RUN_NAME_FORMAT = '%Y%m%dT%H%M%SZ'
+
+
+# Store each fetched page gzipped under the SHA-256 hash of its content, so a
+# page that is unchanged between scrapes is stored once, and list the pages
+# fetched in each scrape run in a manifest named after the run's UTC start
+# time:
+#   objects/ab/cdef...html.gz
+#   runs/20180501T103000Z.jsonl
+class PageArchive:
+    def __init__(self, directory, run=None):
+        self.directory = directory
+        self.run = run or time.strftime(RUN_NAME_FORMAT, time.gmtime())
+        self.started = calendar.timegm(time.strptime(self.run,
+            RUN_NAME_FORMAT))
+
+        self.manifest_path = os.path.join(directory, 'runs', self.run +
+            '.jsonl')
+
+        # Load pages already archived for run
+        self.pages = {}
+
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path) as manifest:
+                for line in manifest:
+                    entry = json.loads(line)
+                    self.pages[entry['page']] = entry['sha256']
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2],
+            digest[2:] + '.html.gz')
+
+    def add_page(self, page, content):
+        digest = hashlib.sha256(content).hexdigest()
+        object_path = self.object_path(digest)
+
+        # Write page content if it isn't archived yet, renaming it into place
+        # so a partly written file is never read back
+        if not os.path.isfile(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+
+            with open(object_path + '.tmp', 'wb') as object_file:
+                object_file.write(gzip.compress(content))
+
+            os.replace(object_path + '.tmp', object_path)
+
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+
+        with open(self.manifest_path, 'a') as manifest:
+            manifest.write(json.dumps({'page': page, 'sha256': digest}) +
+                '\n')
+
+        self.pages[page] = digest
+
+    def get_page(self, page):
+        if page not in self.pages:
+            return None
+
+        with open(self.object_path(self.pages[page]), 'rb') as object_file:
+            return gzip.decompress(object_file.read())
+
+
+def list_runs(directory):
+    runs_directory = os.path.join(directory, 'runs')
+
+    if not os.path.isdir(runs_directory):
+        return []
+
+    return sorted(name[:-len('.jsonl')] for name in os.listdir(runs_directory)
+        if name.endswith('.jsonl'))
+
+
+# Serve pages from an archived run in place of Hacker News
+class ArchiveClient(client.HackerNewsClient):
+    def __init__(self, page_archive, concurrency=None):
+        super().__init__(concurrency=concurrency)
+
+        self.page_archive = page_archive
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def now(self):
+        # Page ages are relative to the time the run was scraped
+        return self.page_archive.started
+
+    async def fetch(self, path, params=None):
+        page = client.get_page_name(path, params)
+        content = self.page_archive.get_page(page)
+
+        if content is None:
+            raise LookupError('Page ' + page + ' is not archived for run ' +
+                self.page_archive.run)
+
+        return content
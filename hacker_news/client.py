@@ -0,0 +1,298 @@
+import aiohttp
+import asyncio
+import os
+import random
+import time
+
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_BASE_URL = 'https://news.ycombinator.com'
+DEFAULT_CONCURRENCY = 8
+KEEPALIVE_TIMEOUT = 30
+REQUEST_TIMEOUT = 15
+USER_AGENT = 'hacker_news_scrape'
+
+# Retry failed requests with exponential backoff (seconds), and pause
+# requests to a host after several failures in a row
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1
+DEFAULT_MAX_BACKOFF = 30
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_PAUSE = 60
+
+# Halve a host's request rate when it throttles requests, down to the minimum
+# rate, and raise it by the increase after each healthy response
+DEFAULT_MIN_RATE = 0.5
+DEFAULT_RATE_INCREASE = 0.5
+RATE_DECREASE = 0.5
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+
+
+# Let requests to a host start at most rate times per second on average
+# (without a limit if rate is 0), allowing bursts of up to burst requests
+# after a quiet period
+class RateLimit:
+    def __init__(self, rate, burst=1, min_rate=DEFAULT_MIN_RATE,
+        increase=DEFAULT_RATE_INCREASE):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.increase = increase
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+
+        # Take turns waiting for the next token, so requests start in the
+        # order they asked for one
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens +
+                    (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def slow_down(self):
+        # Start from a burst of requests per second if rate wasn't limited
+        self.rate = max(self.min_rate, (self.rate or self.burst) *
+            RATE_DECREASE)
+        self.tokens = min(self.tokens, 1)
+
+    def speed_up(self):
+        if not self.rate or self.rate == self.max_rate:
+            return
+
+        self.rate += self.increase
+
+        if self.max_rate:
+            self.rate = min(self.rate, self.max_rate)
+
+
+# Pause requests to a host for a while once threshold requests in a row have
+# failed, then let requests through again, pausing again if the next one
+# fails too
+class CircuitBreaker:
+    def __init__(self, threshold, pause):
+        self.threshold = threshold
+        self.pause = pause
+        self.failures = 0
+        self.paused_until = 0
+
+    async def wait(self):
+        delay = self.paused_until - time.monotonic()
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+
+        if self.failures < self.threshold:
+            return False
+
+        self.paused_until = time.monotonic() + self.pause
+        self.failures = self.threshold - 1
+
+        return True
+
+
+def is_retryable(error):
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES
+
+    return isinstance(error, (aiohttp.ClientConnectionError,
+        asyncio.TimeoutError))
+
+
+def get_retry_after(error):
+    # Get seconds to wait that a throttling response asked for, if any
+    headers = getattr(error, 'headers', None) or {}
+
+    try:
+        return float(headers.get('Retry-After', 0))
+
+    except ValueError:
+        return 0
+
+
+def get_page_name(path, params=None):
+    # Name page by its URL path and query (e.g., /item?id=3&p=2)
+    if params:
+        return path + '?' + urlencode(params)
+
+    return path
+
+
+class HackerNewsClient:
+    def __init__(self, base_url=None, concurrency=None,
+        timeout=REQUEST_TIMEOUT, page_archive=None, rate=None, burst=None,
+        min_rate=None, retries=None, backoff=None, max_backoff=None,
+        breaker_threshold=None, breaker_pause=None):
+        # Read base URL and concurrency limit from environment variables if
+        # not given so that scrapes can be pointed at a stand-in server
+        self.base_url = (base_url or os.getenv('HN_BASE_URL') or
+            DEFAULT_BASE_URL).rstrip('/')
+        self.concurrency = int(concurrency or os.getenv('SCRAPE_CONCURRENCY')
+            or DEFAULT_CONCURRENCY)
+        self.timeout = timeout
+
+        # Save every fetched page to archive if given
+        self.page_archive = page_archive
+
+        # Budget requests per host, adapting the rate (requests per second,
+        # or no limit until throttled if 0) to the host's responses
+        self.rate = float(rate or os.getenv('SCRAPE_RATE') or 0)
+        self.burst = int(burst or os.getenv('SCRAPE_BURST') or
+            self.concurrency)
+        self.min_rate = float(min_rate or os.getenv('SCRAPE_MIN_RATE') or
+            DEFAULT_MIN_RATE)
+        self.rate_limits = {}
+
+        # Retry failed requests, pausing requests to a host that keeps
+        # failing
+        self.retries = int(retries if retries is not None else
+            os.getenv('SCRAPE_RETRIES') or DEFAULT_RETRIES)
+        self.backoff = float(backoff or os.getenv('SCRAPE_BACKOFF') or
+            DEFAULT_BACKOFF)
+        self.max_backoff = float(max_backoff or
+            os.getenv('SCRAPE_MAX_BACKOFF') or DEFAULT_MAX_BACKOFF)
+        self.breaker_threshold = int(breaker_threshold or
+            os.getenv('SCRAPE_BREAKER_THRESHOLD') or DEFAULT_BREAKER_THRESHOLD)
+        self.breaker_pause = float(breaker_pause or
+            os.getenv('SCRAPE_BREAKER_PAUSE') or DEFAULT_BREAKER_PAUSE)
+        self.circuit_breakers = {}
+
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        # Share one pool of keep-alive connections across every fetch, sized
+        # to the concurrency limit so idle sockets are reused, not reopened
+        connector = aiohttp.TCPConnector(limit=self.concurrency,
+            keepalive_timeout=KEEPALIVE_TIMEOUT)
+
+        self.session = aiohttp.ClientSession(connector=connector,
+            headers={'Accept-Encoding': 'gzip, deflate',
+            'User-Agent': USER_AGENT}, raise_for_status=True,
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+            self.session = None
+
+    def now(self):
+        # Get current UTC time in seconds, which page ages are relative to
+        return int(datetime.now().timestamp())
+
+    def get_rate_limit(self, host):
+        if host not in self.rate_limits:
+            self.rate_limits[host] = RateLimit(self.rate, self.burst,
+                self.min_rate)
+
+        return self.rate_limits[host]
+
+    def get_circuit_breaker(self, host):
+        if host not in self.circuit_breakers:
+            self.circuit_breakers[host] = CircuitBreaker(
+                self.breaker_threshold, self.breaker_pause)
+
+        return self.circuit_breakers[host]
+
+    def get_backoff(self, attempt, error):
+        # Wait a random time up to an exponentially growing limit, so retries
+        # of requests that failed together are spread out, or as long as a
+        # throttling response asked for
+        backoff = random.uniform(0, min(self.max_backoff,
+            self.backoff * 2 ** (attempt - 1)))
+
+        return max(backoff, min(get_retry_after(error), self.max_backoff))
+
+    async def fetch(self, path, params=None):
+        url = self.base_url + path
+        host = urlsplit(url).netloc
+        rate_limit = self.get_rate_limit(host)
+        circuit_breaker = self.get_circuit_breaker(host)
+        attempt = 0
+
+        while True:
+            await circuit_breaker.wait()
+
+            # Wait for a free slot and the host's rate budget before sending
+            # request; response bodies are decompressed by aiohttp when the
+            # server sends them gzipped
+            try:
+                async with self.semaphore:
+                    await rate_limit.acquire()
+
+                    async with self.session.get(url,
+                        params=params) as response:
+                            content = await response.read()
+
+            except Exception as error:
+                if not is_retryable(error):
+                    raise
+
+                if (isinstance(error, aiohttp.ClientResponseError) and
+                    error.status in THROTTLE_STATUSES):
+                        rate_limit.slow_down()
+
+                if circuit_breaker.record_failure():
+                    print('Requests to ' + host + ' paused for ' +
+                        str(self.breaker_pause) + 's after ' +
+                        str(self.breaker_threshold) + ' failures in a row')
+
+                if attempt >= self.retries:
+                    raise
+
+                attempt += 1
+
+                await asyncio.sleep(self.get_backoff(attempt, error))
+                continue
+
+            circuit_breaker.record_success()
+            rate_limit.speed_up()
+            break
+
+        if self.page_archive is not None:
+            self.page_archive.add_page(get_page_name(path, params),
+                content)
+
+        return content
+
+    async def fetch_feed_page(self, page, source='news'):
+        # Feed lists are served from their own paths (e.g., /newest?p=2)
+        return await self.fetch('/' + source, {'p': page})
+
+    async def fetch_post_page(self, post_id, page_number=None):
+        params = {'id': post_id}
+
+        if page_number:
+            params['p'] = page_number
+
+        return await self.fetch('/item', params)
@@ -0,0 +1,221 @@
+import os
+import socket
+
+from collections import namedtuple
+from contextlib import contextmanager
+from sqlalchemy import text
+
+from hacker_news import loader, models
+
+# Key of the advisory lock held by the process scraping feeds, so only one
+# scrape adds feeds at a time across processes and hosts
+SCRAPE_LOCK_KEY = 7526810
+DEFAULT_LEASE = 600
+DEFAULT_POLL_INTERVAL = 1
+
+Task = namedtuple('Task', ['id', 'feed_id', 'post_id', 'comment_count'])
+
+
+@contextmanager
+def scrape_lock():
+    # Hold lock on a connection of its own for as long as the scrape runs;
+    # Postgres releases it if the process dies
+    connection = models.engine.connect()
+    acquired = False
+
+    try:
+        acquired = connection.execute(text('SELECT '
+            'pg_try_advisory_lock(:key)'), {'key': SCRAPE_LOCK_KEY}).scalar()
+        connection.commit()
+
+        yield acquired
+
+    finally:
+        if acquired:
+            connection.execute(text('SELECT pg_advisory_unlock(:key)'),
+                {'key': SCRAPE_LOCK_KEY})
+            connection.commit()
+
+        connection.close()
+
+
+def is_scrape_running():
+    # Look for the scrape's lock without taking it, so checking never stops a
+    # scrape that starts at the same time from getting the lock (a bigint
+    # key is held as its high and low 32 bits, with objsubid 1)
+    with models.engine.connect() as connection:
+        return connection.execute(text('SELECT EXISTS (SELECT 1 FROM pg_locks '
+            "WHERE locktype = 'advisory' AND database = (SELECT oid FROM "
+            'pg_database WHERE datname = current_database()) AND classid = '
+            'CAST(:key AS bigint) >> 32 AND objid = CAST(:key AS bigint) & '
+            '4294967295 AND objsubid = 1 AND granted)'),
+            {'key': SCRAPE_LOCK_KEY}).scalar()
+
+
+def is_enabled():
+    return os.getenv('SCRAPE_WORK_QUEUE', '').lower() in ('1', 'true', 'yes')
+
+
+# Share a scrape's post pages between scraper processes through the
+# scrape_task table: the scrape adds a task for each post it lists, and every
+# process claims tasks with a lease, skipping tasks other processes have
+# locked, so a task whose process died is claimed again once its lease ends
+class WorkQueue:
+    def __init__(self, lease=None, poll_interval=None, worker=None):
+        self.lease = float(lease or os.getenv('SCRAPE_LEASE') or
+            DEFAULT_LEASE)
+        self.poll_interval = float(poll_interval or
+            os.getenv('SCRAPE_POLL_INTERVAL') or DEFAULT_POLL_INTERVAL)
+        self.worker = worker or socket.gethostname() + ':' + str(os.getpid())
+
+    def enqueue(self, feed_id, posts):
+        if not posts:
+            return
+
+        # Connect to database
+        session = models.Session()
+
+        try:
+            session.execute(text('INSERT INTO scrape_task (feed_id, post_id, '
+                'comment_count) VALUES (:feed_id, :post_id, :comment_count) '
+                'ON CONFLICT DO NOTHING'), [{'feed_id': feed_id,
+                'post_id': int(post.id), 'comment_count': post.comment_count}
+                for post in posts])
+
+            session.commit()
+
+        finally:
+            session.close()
+
+    def claim(self, limit=1):
+        # Connect to database
+        session = models.Session()
+
+        try:
+            rows = session.execute(text('UPDATE scrape_task SET status = '
+                "'running', claimed_by = :worker, lease_until = "
+                'LOCALTIMESTAMP + make_interval(secs => :lease), attempts = '
+                'attempts + 1 WHERE id IN (SELECT id FROM scrape_task WHERE '
+                "status = 'pending' OR (status = 'running' AND lease_until < "
+                'LOCALTIMESTAMP) ORDER BY id LIMIT :limit FOR UPDATE SKIP '
+                'LOCKED) RETURNING id, feed_id, post_id, comment_count'),
+                {'worker': self.worker, 'lease': self.lease,
+                'limit': limit}).all()
+
+            session.commit()
+
+        finally:
+            session.close()
+
+        return [Task(row.id, row.feed_id, str(row.post_id), row.comment_count)
+            for row in rows]
+
+    def share(self, feed_id, post_id, to_feed_id):
+        # Connect to database
+        session = models.Session()
+
+        # Copy comment ranks of post scraped for one feed to another feed
+        # once its task is finished, or now if it has been already
+        try:
+            task_id = session.execute(text('UPDATE scrape_task SET '
+                'share_feed_ids = array_append(share_feed_ids, :to_feed_id) '
+                'WHERE feed_id = :feed_id AND post_id = :post_id AND status '
+                "IN ('pending', 'running') RETURNING id"), {'feed_id': feed_id,
+                'post_id': int(post_id), 'to_feed_id': to_feed_id}).scalar()
+
+            if task_id is None:
+                loader.copy_comments(session.connection(), feed_id,
+                    to_feed_id, [int(post_id)])
+
+            session.commit()
+
+        finally:
+            session.close()
+
+    def complete(self, task, error=None):
+        # Connect to database
+        session = models.Session()
+
+        try:
+            share_feed_ids = session.execute(text('UPDATE scrape_task SET '
+                'status = :status, lease_until = NULL, error = :error WHERE '
+                'id = :id RETURNING share_feed_ids'), {'id': task.id,
+                'status': 'failed' if error else 'done',
+                'error': error}).scalar()
+
+            for to_feed_id in share_feed_ids or ():
+                loader.copy_comments(session.connection(), task.feed_id,
+                    to_feed_id, [int(task.post_id)])
+
+            # Don't carry forward comments of a post whose pages failed, in
+            # its feed or the feeds it is shared with
+            if error:
+                loader.skip_comments(session.connection(), [(feed_id,
+                    task.post_id) for feed_id in [task.feed_id,
+                    *(share_feed_ids or ())]])
+
+            session.commit()
+
+        finally:
+            session.close()
+
+    def skip(self, feed_ids):
+        # Connect to database
+        session = models.Session()
+
+        # Give up feeds' tasks that no process is working on, marking their
+        # posts' comments skipped in the feeds and the feeds they are shared
+        # with, and returning their posts' ids
+        try:
+            rows = session.execute(text('UPDATE scrape_task SET status = '
+                "'failed', lease_until = NULL, error = 'Skipped after time "
+                "budget' WHERE feed_id = ANY(:feed_ids) AND (status = "
+                "'pending' OR (status = 'running' AND lease_until < "
+                'LOCALTIMESTAMP)) RETURNING feed_id, post_id, share_feed_ids'),
+                {'feed_ids': list(feed_ids)}).all()
+
+            if rows:
+                loader.skip_comments(session.connection(), [(feed_id,
+                    row.post_id) for row in rows for feed_id in [row.feed_id,
+                    *row.share_feed_ids]])
+
+            session.commit()
+
+        finally:
+            session.close()
+
+        return [str(row.post_id) for row in rows]
+
+    def remaining(self, feed_ids=None):
+        # Connect to database
+        session = models.Session()
+
+        # Count tasks that are waiting or being worked on, for the given
+        # feeds if any
+        try:
+            query = ('SELECT count(*) FROM scrape_task WHERE status IN '
+                "('pending', 'running')")
+
+            if feed_ids is not None:
+                query += ' AND feed_id = ANY(:feed_ids)'
+
+            return session.execute(text(query),
+                {'feed_ids': list(feed_ids or ())}).scalar()
+
+        finally:
+            session.close()
+
+    def clear(self, feed_ids):
+        # Connect to database
+        session = models.Session()
+
+        # Remove feeds' finished tasks, keeping failed ones to look into
+        try:
+            session.execute(text('DELETE FROM scrape_task WHERE feed_id = '
+                "ANY(:feed_ids) AND status = 'done'"),
+                {'feed_ids': list(feed_ids)})
+
+            session.commit()
+
+        finally:
+            session.close()
@@ -0,0 +1,72 @@
+import asyncpg
+import os
+
+from hacker_news import models
+
+DEFAULT_POOL_SIZE = 2
+
+# Errors raised when the database can't be reached
+CONNECTION_ERRORS = (OSError, asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError)
+
+
+def get_dsn():
+    # Connect to the database that models are set up with, without
+    # SQLAlchemy's driver name
+    if models.engine is None:
+        return None
+
+    return models.engine.url.set(drivername='postgresql').render_as_string(
+        hide_password=False)
+
+
+async def create_pool(size=None):
+    # Keep a few connections for every page's queries and writes in a scrape,
+    # opening them when they are first needed
+    size = int(size or os.getenv('SCRAPE_DB_POOL_SIZE') or DEFAULT_POOL_SIZE)
+
+    # Plan statements for the arrays they are sent each time, rather than
+    # switching to a generic plan that guesses how long the arrays are
+    return await asyncpg.create_pool(get_dsn(), min_size=0, max_size=size,
+        server_settings={'plan_cache_mode': 'force_custom_plan'})
+
+
+async def get_existing_ids(db_pool, table, ids):
+    # Return the given ids (as strings, the way they are scraped from the page)
+    # that are already stored in table, using a single set-based query
+    if not ids:
+        return set()
+
+    rows = await db_pool.fetch('SELECT id FROM ' + table + ' WHERE id = '
+        'ANY($1::integer[])', [int(row_id) for row_id in ids])
+
+    return {str(row['id']) for row in rows}
+
+
+async def get_content_hashes(db_pool, comment_ids):
+    # Return content hashes of the given comments that are already stored, by
+    # id as a string
+    if not comment_ids:
+        return {}
+
+    rows = await db_pool.fetch('SELECT id, content_hash FROM comment WHERE id '
+        '= ANY($1::integer[])', [int(row_id) for row_id in comment_ids])
+
+    return {str(row['id']): row['content_hash'] for row in rows}
+
+
+async def get_previous_comment_counts(db_pool, feed_id, post_ids):
+    # Return comment counts of the given posts (by id as a string) in the
+    # previous feed scraped from the same list
+    if not post_ids:
+        return {}
+
+    rows = await db_pool.fetch('SELECT feed_post.post_id, '
+        'feed_post.comment_count FROM feed_post WHERE feed_post.post_id = '
+        'ANY($2::integer[]) AND feed_post.feed_id = (SELECT previous_feed.id '
+        'FROM feed JOIN feed AS previous_feed ON previous_feed.source = '
+        'feed.source AND previous_feed.id < feed.id WHERE feed.id = $1 ORDER '
+        'BY previous_feed.id DESC LIMIT 1)', feed_id,
+        [int(post_id) for post_id in post_ids])
+
+    return {str(row['post_id']): row['comment_count'] for row in rows}
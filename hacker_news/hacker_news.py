@@ -1,19 +1,14 @@
-import asyncio
 import json
 import os
-import requests
-import time
 
-from bs4 import BeautifulSoup, UnicodeDammit
 from datetime import datetime, timedelta, timezone
 from flask import abort, jsonify, make_response, request
-from sqlalchemy import desc, text
+from sqlalchemy import and_, desc, select, text
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql import func
 
 from hacker_news import models
 
-REQUEST_TIMEOUT = 15
 MAX_RESULT_COUNT = 100
 
 
@@ -48,306 +43,6 @@ def has_database():
     return models.engine is not None
 
 
-def scrape_loop():
-    # Connect to database
-    session = models.Session()
-
-    # Add feed to database
-    new_feed = models.Feed()
-
-    session.add(new_feed)
-
-    session.commit()
-
-    feed_id = new_feed.id
-
-    # Create asynchronous tasks to scrape first three pages of Hacker News
-    loop = asyncio.get_event_loop()
-
-    tasks = [
-        loop.create_task(scrape_page(1, feed_id, loop)),
-        loop.create_task(scrape_page(2, feed_id, loop)),
-        loop.create_task(scrape_page(3, feed_id, loop))
-        ]
-
-    wait_tasks = asyncio.wait(tasks)
-
-    loop.run_until_complete(wait_tasks)
-
-    loop.close()
-
-    session.close()
-
-    print('Scrape completed for first three pages of Hacker News.')
-
-    return
-
-
-async def scrape_page(page, feed_id, loop):
-    # Connect to database
-    session = models.Session()
-
-    print('Scrape initiated for page ' + str(page) + ' of Hacker News.')
-
-    # Get current UTC time in seconds
-    now = int(datetime.now().timestamp())
-
-    # Get HTML tree from feed page
-    feed_html = requests.get(
-        'https://news.ycombinator.com/news?p=' + str(page),
-        timeout=REQUEST_TIMEOUT,
-    )
-
-    feed_content = feed_html.content
-
-    feed_soup = BeautifulSoup(feed_content, 'html.parser')
-
-    # Get all post rows from HTML tree
-    post_rows = feed_soup.find_all('tr', 'athing')
-
-    for post_row in post_rows:
-        # Get subtext row with additional post data
-        subtext_row = post_row.next_sibling
-
-        # Get post id
-        post_id = post_row.get('id')
-
-        # Check if post exists in database
-        post_exists = session.query(models.Post.id).filter_by(
-            id=post_id).scalar()
-
-        # Get core post data if it is not in database already
-        if not post_exists:
-            # Get UTC timestamp for post's posting time by subtracting the
-            # number of days/hours/minutes ago given on the webpage from the
-            # current UTC timestamp
-            time_unit = subtext_row.find('span', 'age').a.get_text().split()[1]
-
-            if 'day' in time_unit:
-                created = now - 86400 * int(subtext_row.find(
-                    'span', 'age').a.get_text().split()[0])
-
-            elif 'hour' in time_unit:
-                created = now - 3600 * int(subtext_row.find(
-                    'span', 'age').a.get_text().split()[0])
-
-            else:
-                created = now - 60 * int(subtext_row.find(
-                    'span', 'age').a.get_text().split()[0])
-
-            created = time.strftime(
-                '%Y-%m-%d %H:%M', time.localtime(created))
-
-            # Get post's link
-            link_span = post_row.find('span', 'titleline').find('a')
-            link = link_span.get('href')
-
-            # Get post's title
-            title = link_span.get_text()
-
-            # Set post's type based on title
-            if 'Show HN:' in title:
-                type = 'show'
-            elif 'Ask HN:' in title:
-                type = 'ask'
-            else:
-                type = 'article'
-
-            # Get username of user who posted post or set as blank for job
-            # posting
-            if subtext_row.find('a', 'hnuser'):
-                username = subtext_row.find('a', 'hnuser').get_text()
-            else:
-                username = ''
-
-            # Get website that post is from or set as blank for ask posting
-            if post_row.find('span', 'sitestr'):
-                website = post_row.find('span', 'sitestr').get_text()
-            else:
-                website = ''
-
-            # Add post data to database
-            post = models.Post(created=created, id=post_id, link=link,
-                title=title, type=type, username=username, website=website)
-
-            session.add(post)
-
-        # Get post's comment count if it is listed (otherwise, set to 0)
-        if 'comment' in subtext_row.find_all(
-            href='item?id=' + post_id)[-1].get_text():
-                unicode_count = UnicodeDammit(subtext_row.find_all(
-                    href='item?id=' + post_id)[-1].get_text())
-                comment_count = unicode_count.unicode_markup.split()[0]
-        else:
-            comment_count = 0
-
-        # Get post's rank on feed page
-        feed_rank = post_row.find('span', 'rank').get_text()[:-1]
-
-        # Get post's score if it is listed (otherwise, post is job posting)
-        if subtext_row.find('span', 'score'):
-            point_count = subtext_row.find(
-                'span', 'score').get_text().split()[0]
-        else:
-            point_count = 0
-            type = 'job'
-
-        # Add feed-based post data to database
-        feed_post = models.FeedPost(comment_count=comment_count,
-            feed_id=feed_id, feed_rank=feed_rank, point_count=point_count,
-            post_id=post_id)
-
-        session.add(feed_post)
-
-        session.commit()
-
-        # Create asynchronous task to scrape post page for its comments
-        loop.create_task(scrape_post(post_id, feed_id, loop, None))
-
-    return
-
-
-async def scrape_post(post_id, feed_id, loop, page_number):
-    # Connect to database
-    session = models.Session()
-
-    # Get current UTC time in seconds
-    now = int(datetime.now().timestamp())
-
-    # Get HTML tree from post's webpage, specifying page number if given
-    if page_number:
-        post_html = requests.get(
-            'https://news.ycombinator.com/item?id=' + str(post_id) + '&p=' +
-            str(page_number), timeout=REQUEST_TIMEOUT)
-
-    else:
-        post_html = requests.get(
-            'https://news.ycombinator.com/item?id=' + str(post_id),
-            timeout=REQUEST_TIMEOUT,
-        )
-
-    post_content = post_html.content
-
-    post_soup = BeautifulSoup(post_content, 'html.parser')
-
-    # If post page contains a "More" link to more comments, create asynchronous
-    # task to scrape that page for its comments
-    if (post_soup.find('a', 'morelink')):
-        page_number = post_soup.find('a', 'morelink').get(
-            'href').split('&p=')[1]
-
-        loop.create_task(scrape_post(post_id, feed_id, loop, page_number))
-
-    # Get all comment rows from HTML tree
-    comment_rows = post_soup.select('tr.athing.comtr')
-
-    # Set starting comment feed rank to 0
-    comment_feed_rank = 0
-
-    for comment_row in comment_rows:
-        # Get comment id
-        comment_id = comment_row.get('id')
-
-        # Check if comment exists in database
-        comment_exists = session.query(models.Comment.id).filter_by(
-            id=comment_id).scalar()
-
-        # Get core comment data if it is not in database already
-        if not comment_exists:
-            # If comment has content span, get text from span
-            if comment_row.find('div', 'comment').find_all('span'):
-                comment_content = comment_row.find(
-                    'div', 'comment').find_all('span')[0].get_text()
-
-                # Remove the last word ('reply') from the comment content
-                # and strip trailing whitespace
-                comment_content = comment_content.rsplit(' ', 1)[0].strip()
-
-                total_word_count = len(comment_content.split())
-
-            # Otherwise, comment is flagged, so get flagged message as text
-            # and strip trailing whitespace
-            else:
-                comment_content = comment_row.find(
-                    'div', 'comment').get_text().strip()
-
-                total_word_count = 0
-
-            # Get UTC timestamp for comment's posting time by subtracting
-            # the number of days/hours/minutes ago given on the webpage from
-            # the current UTC timestamp
-            comment_time_unit = comment_row.find(
-                'span', 'age').a.get_text().split()[1]
-
-            if 'day' in comment_time_unit:
-                comment_created = now - 86400 * int(comment_row.find(
-                    'span', 'age').a.get_text().split()[0])
-
-            elif 'hour' in comment_time_unit:
-                comment_created = now - 3600 * int(comment_row.find(
-                    'span', 'age').a.get_text().split()[0])
-
-            else:
-                comment_created = now - 60 * int(comment_row.find(
-                    'span', 'age').a.get_text().split()[0])
-
-            comment_created = time.strftime(
-                '%Y-%m-%d %H:%M', time.localtime(comment_created))
-
-            # Get comment's level in tree by getting indentation width
-            # value divided by value of one indent (40px)
-            level = int(comment_row.find(
-                'td', 'ind').contents[0].get('width')) / 40
-
-            # Set parent comment as blank if comment is the top-level
-            # comment
-            if level == 0:
-                parent_comment = None
-
-            # Otherwise, get preceding comment in comment tree
-            else:
-                parent_comment = session.query(models.Comment).with_entities(
-                    models.Comment.id).join(models.FeedComment).filter(
-                    models.Comment.level == (level - 1)).filter(
-                    models.FeedComment.feed_id == feed_id).filter(
-                    models.Comment.post_id == post_id).order_by(
-                    models.FeedComment.feed_rank).limit(1).one()[0]
-
-            # Get username of user who posted comment
-            try:
-                comment_username = comment_row.find('a', 'hnuser').get_text()
-
-            except AttributeError:
-                comment_username = ''
-
-            # Add scraped comment data to database
-            comment = models.Comment(content=comment_content,
-                created=comment_created, id=comment_id, level=level,
-                parent_comment=parent_comment, post_id=post_id,
-                total_word_count=total_word_count, username=comment_username,
-                word_counts=func.to_tsvector('simple_english',
-                comment_content.lower()))
-
-            session.add(comment)
-
-        # Increment comment feed rank to get current comment's rank
-        comment_feed_rank += 1
-
-        # Add feed-based comment data to database
-        feed_comment = models.FeedComment(comment_id=comment_id,
-            feed_id=feed_id, feed_rank=comment_feed_rank)
-
-        session.add(feed_comment)
-
-    session.commit()
-
-    # Print message if there are no more pages of comments to scrape
-    if not post_soup.find('a', 'morelink'):
-        print('Post ' + str(post_id) + ' and its comments scraped')
-
-    return
-
-
 def get_comment(comment_id):
     # Connect to database
     session = models.Session()
@@ -406,11 +101,23 @@ def get_feeds(time_period):
     session = models.Session()
 
     try:
+        # All-time statistics cover the posts that were on the front page
+        # (those with a summary) and their comments, rather than a list of
+        # every feed
         if time_period == 'all':
             return None
 
+        # Statistics for a time period cover the front page's feeds, since
+        # other lists are scraped into feeds of their own
+        feeds = session.query(models.Feed.id).filter(
+            models.Feed.source == 'news')
+
+        # Statistics for the hour read the latest feed whose scrape finished
+        # (it is rolled up once all its rows are written), rather than a feed
+        # still being scraped
         if time_period == 'hour':
-            rows = session.query(models.Feed.id).order_by(
+            rows = feeds.join(models.FeedRollup,
+                models.FeedRollup.feed_id == models.Feed.id).order_by(
                 models.Feed.created.desc()
             ).limit(1).all()
         else:
@@ -419,12 +126,12 @@ def get_feeds(time_period):
                 datetime.now(timezone.utc).replace(tzinfo=None) -
                 timedelta(days=days)
             )
-            rows = session.query(models.Feed.id).filter(
+            rows = feeds.filter(
                 models.Feed.created >= cutoff
             ).all()
 
         if not rows:
-            rows = session.query(models.Feed.id).order_by(
+            rows = feeds.order_by(
                 models.Feed.created.desc()
             ).limit(1).all()
 
@@ -433,37 +140,107 @@ def get_feeds(time_period):
         session.close()
 
 
+def get_feed_comments(feed_ids):
+    # Get comment ranks in the given feeds from comment intervals, bounding
+    # intervals by the feeds' ids so ones that ended before the feeds (or
+    # started after them) aren't scanned
+    interval_feeds = and_(models.Feed.source ==
+        models.CommentInterval.source, models.Feed.id.between(
+            models.CommentInterval.first_feed_id,
+            models.CommentInterval.last_feed_id))
+
+    return select(models.CommentInterval.comment_id,
+        models.Feed.id.label('feed_id'),
+        models.CommentInterval.feed_rank).join(models.Feed,
+        interval_feeds).where(
+        models.Feed.id.in_(feed_ids),
+        models.CommentInterval.last_feed_id >= min(feed_ids, default=0),
+        models.CommentInterval.first_feed_id <= max(feed_ids, default=0)
+        ).subquery()
+
+
+def get_rolled_up_average(session, feed_ids, sum_column, count_column,
+    get_row_totals):
+    # Combine sums and counts of feeds' rollups, filtering by feed_ids if
+    # specified. Feeds that aren't rolled up yet (being scraped) are summed
+    # from their rows when feed_ids are specified, and left out of all feeds.
+    # Nothing is averaged (None) when there are no rows to average
+    if feed_ids is None:
+        total, count = session.query(func.sum(sum_column),
+            func.sum(count_column)).join(models.Feed,
+            models.Feed.id == models.FeedRollup.feed_id).filter(
+            models.Feed.source == 'news').one()
+
+        return round(total / count) if count else None
+
+    rollups = session.query(models.FeedRollup.feed_id, sum_column,
+        count_column).filter(models.FeedRollup.feed_id.in_(feed_ids)).all()
+
+    total = sum(rollup[1] for rollup in rollups)
+    count = sum(rollup[2] for rollup in rollups)
+
+    unrolled_feed_ids = sorted(set(feed_ids) - {rollup.feed_id
+        for rollup in rollups})
+
+    if unrolled_feed_ids:
+        row_total, row_count = get_row_totals(unrolled_feed_ids).one()
+
+        total += row_total or 0
+        count += row_count
+
+    return round(total / count) if count else None
+
+
+def get_all_time_comment_average(session, sum_column):
+    # Combine rollups of front page posts' comments, counting each comment
+    # once rather than once per feed that lists it
+    total, count = session.query(func.sum(sum_column),
+        func.sum(models.PostCommentRollup.comment_count)).join(
+        models.PostSummary, models.PostSummary.post_id ==
+        models.PostCommentRollup.post_id).one()
+
+    return round(total / count) if count else None
+
+
 def get_average_comment_count(feed_ids):
     # Connect to database
     session = models.Session()
 
     # Get average comment count, filtering by feed_ids if specified
-    if feed_ids is not None:
-        average = round(session.query(
-            func.avg(models.FeedPost.comment_count)).filter(
-            models.FeedPost.feed_id.in_(feed_ids)).one()[0])
-
-    else:
-        average = round(session.query(
-            func.avg(models.FeedPost.comment_count)).one()[0])
+    average = get_rolled_up_average(session, feed_ids,
+        models.FeedRollup.comment_count_sum,
+        models.FeedRollup.feed_post_count,
+        lambda feed_ids: session.query(func.sum(models.FeedPost.comment_count),
+            func.count()).filter(models.FeedPost.feed_id.in_(feed_ids)))
 
     session.close()
 
     return jsonify(average)
 
 
+def get_comment_totals(session, column, feed_ids):
+    feed_comments = get_feed_comments(feed_ids)
+
+    return session.query(func.sum(column), func.count()).select_from(
+        models.Comment).join(feed_comments, feed_comments.c.comment_id ==
+        models.Comment.id)
+
+
 def get_average_comment_tree_depth(feed_ids):
     # Connect to database
     session = models.Session()
 
     # Get average comment level, filtering by feed_ids if specified
     if feed_ids is not None:
-        average = round(session.query(func.avg(models.Comment.level)).join(
-            models.FeedComment).filter(
-            models.FeedComment.feed_id.in_(feed_ids)).one()[0])
+        average = get_rolled_up_average(session, feed_ids,
+            models.FeedRollup.level_sum,
+            models.FeedRollup.feed_comment_count,
+            lambda feed_ids: get_comment_totals(session,
+            models.Comment.level, feed_ids))
 
     else:
-        average = round(session.query(func.avg(models.Comment.level)).one()[0])
+        average = get_all_time_comment_average(session,
+            models.PostCommentRollup.level_sum)
 
     session.close()
 
@@ -476,13 +253,15 @@ def get_average_comment_word_count(feed_ids):
 
     # Get average comment word count, filtering by feed_ids if specified
     if feed_ids is not None:
-        average = round(session.query(func.avg(
-            models.Comment.total_word_count)).join(models.FeedComment).filter(
-            models.FeedComment.feed_id.in_(feed_ids)).one()[0])
+        average = get_rolled_up_average(session, feed_ids,
+            models.FeedRollup.word_count_sum,
+            models.FeedRollup.feed_comment_count,
+            lambda feed_ids: get_comment_totals(session,
+            models.Comment.total_word_count, feed_ids))
 
     else:
-        average = round(session.query(func.avg(
-            models.Comment.total_word_count)).one()[0])
+        average = get_all_time_comment_average(session,
+            models.PostCommentRollup.word_count_sum)
 
     session.close()
 
@@ -494,14 +273,11 @@ def get_average_point_count(feed_ids):
     session = models.Session()
 
     # Get average post point count, filtering by feed_ids if specified
-    if feed_ids is not None:
-        average = round(session.query(func.avg(
-            models.FeedPost.point_count)).filter(
-            models.FeedPost.feed_id.in_(feed_ids)).one()[0])
-
-    else:
-        average = round(session.query(func.avg(
-            models.FeedPost.point_count)).one()[0])
+    average = get_rolled_up_average(session, feed_ids,
+        models.FeedRollup.point_count_sum,
+        models.FeedRollup.feed_post_count,
+        lambda feed_ids: session.query(func.sum(models.FeedPost.point_count),
+            func.count()).filter(models.FeedPost.feed_id.in_(feed_ids)))
 
     session.close()
 
@@ -518,12 +294,14 @@ def get_comments_with_highest_word_counts(feed_ids):
 
     # Get comments with highest word counts, filtering by feed_ids if specified
     if feed_ids is not None:
+        feed_comments = get_feed_comments(feed_ids)
+
         subquery = session.query(models.Comment).with_entities(
             models.Comment.content, models.Comment.created, models.Comment.id,
             models.Comment.level, models.Comment.parent_comment,
             models.Comment.post_id, models.Comment.username,
-            models.Comment.total_word_count).join(models.FeedComment).filter(
-            models.FeedComment.feed_id.in_(feed_ids)).order_by(
+            models.Comment.total_word_count).join(feed_comments,
+            feed_comments.c.comment_id == models.Comment.id).order_by(
             models.Comment.id,
             models.Comment.total_word_count.desc()).distinct(
             models.Comment.id).subquery()
@@ -536,7 +314,8 @@ def get_comments_with_highest_word_counts(feed_ids):
             models.Comment.content, models.Comment.created, models.Comment.id,
             models.Comment.level, models.Comment.parent_comment,
             models.Comment.post_id, models.Comment.username,
-            models.Comment.total_word_count).order_by(
+            models.Comment.total_word_count).join(models.PostSummary,
+            models.PostSummary.post_id == models.Comment.post_id).order_by(
             models.Comment.total_word_count.desc()).limit(count)
 
     return jsonify(serialize_query(query, session))
@@ -588,7 +367,9 @@ def get_most_frequent_comment_words(feed_ids):
               SELECT *
                 FROM ts_stat(
                      $$SELECT word_counts
-                         FROM comment$$
+                         FROM comment
+                              JOIN post_summary
+                                ON post_summary.post_id = comment.post_id$$
                 )
                WHERE LENGTH (word) > 1
             ORDER BY nentry DESC
@@ -615,12 +396,14 @@ def get_deepest_comment_tree(feed_ids):
     # Get highest level comment (deepest in comment tree), filtering by
     # feed_ids if specified
     if feed_ids is not None:
+        feed_comments = get_feed_comments(feed_ids)
+
         subquery = session.query(models.Comment).with_entities(
             models.Comment.content, models.Comment.created, models.Comment.id,
             models.Comment.level, models.Comment.parent_comment,
             models.Comment.post_id, models.Comment.username).join(
-            models.FeedComment).filter(
-            models.FeedComment.feed_id.in_(feed_ids)).order_by(
+            feed_comments, feed_comments.c.comment_id ==
+            models.Comment.id).order_by(
             models.Comment.id, models.Comment.level.desc()).distinct(
             models.Comment.id).subquery()
 
@@ -641,17 +424,18 @@ def get_deepest_comment_tree(feed_ids):
         comment = session.query(models.Comment).with_entities(
             models.Comment.content, models.Comment.created, models.Comment.id,
             models.Comment.level, models.Comment.parent_comment,
-            models.Comment.post_id, models.Comment.username).order_by(
+            models.Comment.post_id, models.Comment.username).join(
+            models.PostSummary,
+            models.PostSummary.post_id == models.Comment.post_id).order_by(
             models.Comment.level.desc()).limit(1).one()._asdict()
 
-        # Get post information
+        # Get post information, with its counts and rank in its latest feed
         post = session.query(models.Post).with_entities(models.Post.created,
             models.Post.id, models.Post.link, models.Post.title,
             models.Post.type, models.Post.username,
-            models.FeedPost.comment_count, models.FeedPost.feed_rank,
-            models.FeedPost.point_count).join(models.FeedPost).filter(
-            models.Post.id == comment['post_id']).order_by(
-            models.FeedPost.feed_id.desc()).limit(1).one()._asdict()
+            models.PostSummary.comment_count, models.PostSummary.feed_rank,
+            models.PostSummary.point_count).join(models.PostSummary).filter(
+            models.Post.id == comment['post_id']).one()._asdict()
 
     comment.pop('post_id')
     comment.pop('level')
@@ -710,17 +494,17 @@ def get_posts_with_highest_comment_counts(feed_ids):
             subquery.columns.get('comment_count').desc()).limit(count)
 
     else:
-        subquery = session.query(models.Post).with_entities(
+        # Read each post's snapshot from its summary, rather than from all
+        # of its feed rows
+        query = session.query(models.PostSummary).with_entities(
             models.Post.created, models.Post.id, models.Post.link,
             models.Post.title, models.Post.type, models.Post.username,
-            models.Post.website, models.FeedPost.comment_count,
-            models.FeedPost.feed_rank, models.FeedPost.point_count).join(
-            models.FeedPost).order_by(
-            models.Post.id, models.FeedPost.comment_count.desc()).distinct(
-            models.Post.id).subquery()
-
-        query = session.query(subquery).order_by(
-            subquery.columns.get('comment_count').desc()).limit(count)
+            models.Post.website,
+            models.PostSummary.max_comment_count.label('comment_count'),
+            models.PostSummary.max_comment_feed_rank.label('feed_rank'),
+            models.PostSummary.max_comment_point_count.label('point_count')
+            ).join(models.Post).order_by(
+            models.PostSummary.max_comment_count.desc()).limit(count)
 
     return jsonify(serialize_query(query, session))
 
@@ -749,17 +533,17 @@ def get_posts_with_highest_point_counts(feed_ids):
             subquery.columns.get('point_count').desc()).limit(count)
 
     else:
-        subquery = session.query(models.Post).with_entities(
+        # Read each post's snapshot from its summary, rather than from all
+        # of its feed rows
+        query = session.query(models.PostSummary).with_entities(
             models.Post.created, models.Post.id, models.Post.link,
             models.Post.title, models.Post.type, models.Post.username,
-            models.Post.website, models.FeedPost.comment_count,
-            models.FeedPost.feed_rank, models.FeedPost.point_count).join(
-            models.FeedPost).order_by(
-            models.Post.id, models.FeedPost.point_count.desc()).distinct(
-            models.Post.id).subquery()
-
-        query = session.query(subquery).order_by(
-            subquery.columns.get('point_count').desc()).limit(count)
+            models.Post.website,
+            models.PostSummary.max_point_comment_count.label('comment_count'),
+            models.PostSummary.max_point_feed_rank.label('feed_rank'),
+            models.PostSummary.max_point_count.label('point_count')).join(
+            models.Post).order_by(
+            models.PostSummary.max_point_count.desc()).limit(count)
 
     return jsonify(serialize_query(query, session))
 
@@ -792,7 +576,8 @@ def get_post_types(feed_ids):
 
     else:
         subquery = session.query(models.Post).with_entities(
-            models.Post.id, models.Post.type).subquery()
+            models.Post.id, models.Post.type).join(
+            models.PostSummary).subquery()
 
         query = session.query(subquery).with_entities(
             subquery.columns.get('type'),
@@ -843,7 +628,9 @@ def get_most_frequent_title_words(feed_ids):
               SELECT *
                 FROM ts_stat(
                      $$SELECT to_tsvector('simple_english', LOWER(title))
-                         FROM post$$
+                         FROM post
+                              JOIN post_summary
+                                ON post_summary.post_id = post.id$$
                 )
                WHERE word NOT IN ('ask', 'hn', 'show')
                  AND LENGTH (word) > 1
@@ -890,19 +677,18 @@ def get_top_posts(feed_ids):
             subquery.columns.get('point_count').desc()).limit(count)
 
     else:
-        subquery = session.query(models.Post).with_entities(
+        # Read each post's snapshot from its summary, rather than from all
+        # of its feed rows
+        query = session.query(models.PostSummary).with_entities(
             models.Post.created, models.Post.id, models.Post.link,
             models.Post.title, models.Post.type, models.Post.username,
-            models.Post.website, models.FeedPost.comment_count,
-            models.FeedPost.feed_rank, models.FeedPost.point_count).join(
-            models.FeedPost).order_by(
-            models.Post.id, models.FeedPost.feed_rank,
-            models.FeedPost.point_count.desc()).distinct(
-            models.Post.id).subquery()
-
-        query = session.query(subquery).order_by(
-            subquery.columns.get('feed_rank'),
-            subquery.columns.get('point_count').desc()).limit(count)
+            models.Post.website,
+            models.PostSummary.best_rank_comment_count.label('comment_count'),
+            models.PostSummary.best_feed_rank.label('feed_rank'),
+            models.PostSummary.best_rank_point_count.label('point_count')
+            ).join(models.Post).order_by(
+            models.PostSummary.best_feed_rank,
+            models.PostSummary.best_rank_point_count.desc()).limit(count)
 
     return jsonify(serialize_query(query, session))
 
@@ -934,7 +720,8 @@ def get_top_websites(feed_ids):
 
     else:
         subquery = session.query(models.Post).with_entities(
-            models.Post.id, models.Post.website).filter(
+            models.Post.id, models.Post.website).join(
+            models.PostSummary).filter(
             models.Post.website != '').subquery()
 
         query = session.query(subquery).with_entities(
@@ -962,12 +749,14 @@ def get_users_with_most_comments(feed_ids):
     # Get users who posted the most comments, filtering by feed_ids if
     # specified
     if feed_ids is not None:
+        feed_comments = get_feed_comments(feed_ids)
+
         subquery = session.query(models.Comment).with_entities(
             models.Comment.id, models.Comment.total_word_count,
-            models.Comment.username).join(models.FeedComment).filter(
-            models.FeedComment.feed_id.in_(feed_ids)).filter(
+            models.Comment.username).join(feed_comments,
+            feed_comments.c.comment_id == models.Comment.id).filter(
             models.Comment.username != '').order_by(models.Comment.id,
-            models.FeedComment.feed_id.desc()).distinct(
+            feed_comments.c.feed_id.desc()).distinct(
             models.Comment.id).subquery()
 
         query = session.query(subquery).with_entities(
@@ -981,7 +770,8 @@ def get_users_with_most_comments(feed_ids):
     else:
         subquery = session.query(models.Comment).with_entities(
             models.Comment.id, models.Comment.total_word_count,
-            models.Comment.username).filter(
+            models.Comment.username).join(models.PostSummary,
+            models.PostSummary.post_id == models.Comment.post_id).filter(
             models.Comment.username != '').subquery()
 
         query = session.query(subquery).with_entities(
@@ -1019,7 +809,8 @@ def get_users_with_most_posts(feed_ids):
 
     else:
         subquery = session.query(models.Post).with_entities(
-            models.Post.id, models.Post.username).filter(
+            models.Post.id, models.Post.username).join(
+            models.PostSummary).filter(
             models.Post.username != '').subquery()
 
         query = session.query(subquery).with_entities(
@@ -1042,12 +833,14 @@ def get_users_with_most_words_in_comments(feed_ids):
     # Get users who posted the most words in comments, filtering by feed_ids if
     # specified
     if feed_ids is not None:
+        feed_comments = get_feed_comments(feed_ids)
+
         subquery = session.query(models.Comment).with_entities(
             models.Comment.id, models.Comment.total_word_count,
-            models.Comment.username).join(models.FeedComment).filter(
-            models.FeedComment.feed_id.in_(feed_ids)).filter(
+            models.Comment.username).join(feed_comments,
+            feed_comments.c.comment_id == models.Comment.id).filter(
             models.Comment.username != '').order_by(models.Comment.id,
-            models.FeedComment.feed_id.desc()).distinct(
+            feed_comments.c.feed_id.desc()).distinct(
             models.Comment.id).subquery()
 
         query = session.query(subquery).with_entities(
@@ -1061,7 +854,8 @@ def get_users_with_most_words_in_comments(feed_ids):
     else:
         subquery = session.query(models.Comment).with_entities(
             models.Comment.id, models.Comment.total_word_count,
-            models.Comment.username).filter(
+            models.Comment.username).join(models.PostSummary,
+            models.PostSummary.post_id == models.Comment.post_id).filter(
             models.Comment.username != '').subquery()
 
         query = session.query(subquery).with_entities(
@@ -0,0 +1,540 @@
+import array
+
+from sqlalchemy.dialects import postgresql
+
+from hacker_news import models
+
+POST_COLUMNS = ('id', 'created', 'link', 'title', 'type', 'username',
+    'website')
+FEED_POST_COLUMNS = ('feed_id', 'post_id', 'comment_count', 'feed_rank',
+    'point_count', 'comments_carried')
+COMMENT_COLUMNS = ('id', 'content', 'created', 'level', 'parent_comment',
+    'post_id', 'total_word_count', 'username')
+FEED_COMMENT_COLUMNS = ('comment_id', 'feed_id', 'feed_rank')
+UPDATED_COMMENT_COLUMNS = ('id', 'content', 'total_word_count')
+
+# Snapshots of a post kept in its summary: the summary columns of its comment
+# count, rank and point count, the order of its feed rows the snapshot is the
+# first of, and when a later summary's snapshot replaces an earlier one
+POST_SNAPSHOTS = (
+    (('comment_count', 'feed_rank', 'point_count'), 'feed_id DESC',
+        'excluded.last_feed_id > post_summary.last_feed_id'),
+    (('max_comment_count', 'max_comment_feed_rank',
+        'max_comment_point_count'), 'comment_count DESC, feed_id',
+        'excluded.max_comment_count > post_summary.max_comment_count'),
+    (('max_point_comment_count', 'max_point_feed_rank', 'max_point_count'),
+        'point_count DESC, feed_id',
+        'excluded.max_point_count > post_summary.max_point_count'),
+    (('best_rank_comment_count', 'best_feed_rank', 'best_rank_point_count'),
+        'feed_rank, point_count DESC, feed_id',
+        '(excluded.best_feed_rank, post_summary.best_rank_point_count) < '
+        '(post_summary.best_feed_rank, excluded.best_rank_point_count)'),
+    )
+
+# Get comment word counts from text search vector created in database, and
+# hash comment content to find comments that changed when scraped again
+WORD_COUNTS = "to_tsvector('simple_english', LOWER(content))"
+CONTENT_HASH = "decode(md5(content), 'hex')"
+
+# Columns loaded into each table, in foreign key order, and columns computed
+# from them in the database (feed comment ranks are loaded separately, into
+# intervals)
+TABLES = {
+    'post': (POST_COLUMNS, {}),
+    'feed_post': (FEED_POST_COLUMNS, {}),
+    'comment': (COMMENT_COLUMNS, {'word_counts': WORD_COUNTS,
+        'content_hash': CONTENT_HASH}),
+    }
+
+
+# Ranks of a feed's comments, kept as arrays of integers rather than a tuple
+# per comment, since a feed lists many thousands of comments, and read as
+# (comment_id, feed_id, feed_rank) rows
+class FeedCommentRows:
+    def __init__(self, feed_id):
+        self.feed_id = feed_id
+        self.comment_ids = array.array('q')
+        self.feed_ranks = array.array('q')
+
+    def append(self, comment_id, feed_rank):
+        self.comment_ids.append(int(comment_id))
+        self.feed_ranks.append(feed_rank)
+
+    def clear(self):
+        del self.comment_ids[:]
+        del self.feed_ranks[:]
+
+    def __len__(self):
+        return len(self.comment_ids)
+
+    def __iter__(self):
+        for comment_id, feed_rank in zip(self.comment_ids, self.feed_ranks):
+            yield comment_id, self.feed_id, feed_rank
+
+
+class FeedLoader:
+    def __init__(self, feed_id, row_spool=None):
+        self.feed_id = feed_id
+        self.row_spool = row_spool
+        self.posts = []
+        self.feed_posts = []
+        self.comments = []
+        self.updated_comments = []
+        self.feed_comments = FeedCommentRows(feed_id)
+        self.copied_comments = {}
+        self.skipped_post_ids = []
+        self.rolled_up_feed_ids = []
+
+    def add_post(self, post_id, created, link, title, type, username,
+        website):
+        self.posts.append(
+            (post_id, created, link, title, type, username, website))
+
+    def add_feed_post(self, post_id, comment_count, feed_rank, point_count,
+        comments_carried=False):
+        self.feed_posts.append((self.feed_id, post_id, comment_count,
+            feed_rank, point_count, comments_carried))
+
+    def add_comment(self, comment_id, content, created, level, parent_comment,
+        post_id, total_word_count, username):
+        self.comments.append((comment_id, content, created, level,
+            parent_comment, post_id, total_word_count, username))
+
+    def update_comment(self, comment_id, content, total_word_count):
+        self.updated_comments.append((comment_id, content, total_word_count))
+
+    def add_feed_comment(self, comment_id, feed_rank):
+        self.feed_comments.append(comment_id, feed_rank)
+
+    def copy_comments(self, from_feed_id, to_feed_id, post_id):
+        self.copied_comments.setdefault((from_feed_id, to_feed_id),
+            []).append(int(post_id))
+
+    def carry_forward_comments(self, previous_feed_id, post_id):
+        self.copy_comments(previous_feed_id, self.feed_id, post_id)
+
+    def share_comments(self, feed_id, post_id):
+        self.copy_comments(self.feed_id, feed_id, post_id)
+
+    def skip_comments(self, post_id):
+        self.skipped_post_ids.append(int(post_id))
+
+    def roll_up(self, feed_ids=None):
+        # Roll up feeds (the loader's own by default) with the last of its
+        # rows, once every row of the feeds is added and every comment rank
+        # they share is copied
+        self.rolled_up_feed_ids = list(feed_ids or [self.feed_id])
+
+    def get_rows(self):
+        # Mark posts whose comments weren't scraped as skipped in the feed
+        # and in the other feeds their comment ranks are copied to
+        skipped_feed_posts = [(self.feed_id, post_id)
+            for post_id in self.skipped_post_ids]
+        skipped_feed_posts.extend((to_feed_id, post_id)
+            for (from_feed_id, to_feed_id), post_ids in
+            self.copied_comments.items() if from_feed_id == self.feed_id
+            for post_id in post_ids if post_id in self.skipped_post_ids)
+
+        rows = {'post': self.posts, 'feed_post': self.feed_posts,
+            'comment': self.comments, 'feed_comment': self.feed_comments,
+            'updated_comment': self.updated_comments,
+            'skipped_feed_post': skipped_feed_posts,
+            'feed_rollup': [(feed_id, ) for feed_id in
+            self.rolled_up_feed_ids]}
+        copied_comments = [(from_feed_id, to_feed_id, post_ids)
+            for (from_feed_id, to_feed_id), post_ids in
+            self.copied_comments.items()]
+
+        return rows, copied_comments
+
+    def flush(self):
+        # Save rows to spool to be written to database later if given,
+        # otherwise write them now
+        if self.row_spool is not None:
+            self.row_spool.add_batch(*self.get_rows())
+        else:
+            write_rows(*self.get_rows())
+
+        self.clear()
+
+    async def flush_async(self, db_pool):
+        # Write rows with a connection from the pool, so the event loop keeps
+        # fetching pages while they are written
+        if self.row_spool is not None:
+            self.row_spool.add_batch(*self.get_rows())
+        else:
+            await write_rows_async(db_pool, *self.get_rows())
+
+        self.clear()
+
+    async def flush_comments_async(self, db_pool):
+        # Write posts and comments added so far, keeping feed rows to write
+        # with the rest of the feed's rows, so the feed is never partly
+        # written
+        rows = {'post': self.posts, 'comment': self.comments,
+            'updated_comment': self.updated_comments}
+
+        if self.row_spool is not None:
+            self.row_spool.add_batch(rows, [])
+        else:
+            await write_rows_async(db_pool, rows, [])
+
+        self.posts.clear()
+        self.comments.clear()
+        self.updated_comments.clear()
+
+    def clear(self):
+        self.posts.clear()
+        self.feed_posts.clear()
+        self.comments.clear()
+        self.updated_comments.clear()
+        self.feed_comments.clear()
+        self.copied_comments.clear()
+        self.skipped_post_ids.clear()
+        self.rolled_up_feed_ids.clear()
+
+
+def write_rows(rows, copied_comments):
+    # Connect to database
+    session = models.Session()
+
+    # Write every buffered row for the feed in one transaction, in foreign
+    # key order
+    try:
+        connection = session.connection()
+
+        for statement, table_rows in get_loads(rows, '%s'):
+            for chunk in iter_chunks(table_rows):
+                connection.exec_driver_sql(statement,
+                    tuple(get_column_values(chunk)))
+
+        # Copy comment ranks of posts whose comments weren't scraped again
+        # from the previous feed, and of posts scraped for this feed to the
+        # other feeds of the run that list them
+        for from_feed_id, to_feed_id, post_ids in copied_comments:
+            copy_comments(connection, from_feed_id, to_feed_id, post_ids)
+
+        if rows.get('skipped_feed_post'):
+            skip_comments(connection, rows['skipped_feed_post'])
+
+        # Roll up feeds whose rows are all written
+        if rows.get('feed_rollup'):
+            roll_up_feeds(connection, [row[0] for row in rows['feed_rollup']])
+
+        session.commit()
+
+    finally:
+        session.close()
+
+
+async def write_rows_async(db_pool, rows, copied_comments):
+    loads = get_loads(rows, '${}')
+
+    # Write rows in one transaction, sending statements that don't take data
+    # together rather than waiting for each one in turn
+    async with db_pool.acquire() as connection:
+        async with connection.transaction():
+            for statement, table_rows in loads:
+                for chunk in iter_chunks(table_rows):
+                    await connection.execute(statement,
+                        *get_column_values(chunk))
+
+            statements = [get_copy_comments_statement(*copy)
+                for copy in copied_comments]
+
+            if rows.get('skipped_feed_post'):
+                statements.append(get_skip_comments_statement(
+                    rows['skipped_feed_post']))
+
+            if rows.get('feed_rollup'):
+                statements.append(get_roll_up_feeds_statement(
+                    [row[0] for row in rows['feed_rollup']]))
+
+            if statements:
+                await connection.execute('; '.join(statements))
+
+
+def iter_chunks(rows, size=1000):
+    # Send rows a chunk at a time, rather than formatting them all at once
+    chunk = []
+
+    for row in rows:
+        chunk.append(row)
+
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def get_loads(rows, placeholder):
+    # Get each set of rows to write, in foreign key order, with the statement
+    # that writes them, taking arrays of their column values as parameters
+    # (placeholder is the driver's, formatted with each parameter's position)
+    loads = []
+
+    for table, (columns, computed_columns) in TABLES.items():
+        if rows.get(table):
+            loads.append((get_load_statement(table, columns,
+                computed_columns, get_placeholders(placeholder, columns)),
+                rows[table]))
+
+    if rows.get('feed_comment'):
+        placeholders = get_placeholders(placeholder, FEED_COMMENT_COLUMNS)
+        loads.append((get_add_intervals_statement(get_rows_query(
+            'feed_comment', FEED_COMMENT_COLUMNS, placeholders)),
+            rows['feed_comment']))
+
+    if rows.get('updated_comment'):
+        loads.append((get_update_statement(get_placeholders(placeholder,
+            UPDATED_COMMENT_COLUMNS)), rows['updated_comment']))
+
+    return loads
+
+
+def get_placeholders(placeholder, columns):
+    return [placeholder.format(position)
+        for position in range(1, len(columns) + 1)]
+
+
+def get_column_values(rows):
+    # Send rows as an array of each column's values, as text cast back to
+    # the columns' types in the database, rather than a parameter per value
+    return [[None if value is None else str(value) for value in values]
+        for values in zip(*rows)]
+
+
+def get_rows_query(table, columns, placeholders):
+    # Select rows from arrays of their column values (placeholders, in the
+    # order of columns), so they are written straight into tables rather than
+    # copied into temporary tables whose catalog rows are written to the WAL
+    table_columns = models.Base.metadata.tables[table].columns
+
+    return ('SELECT ' + ', '.join('CAST(' + column + ' AS ' +
+        table_columns[column].type.compile(dialect=postgresql.dialect()) +
+        ') AS ' + column for column in columns) + ' FROM unnest(' + ', '.join(
+        placeholder + '::text[]' for placeholder in placeholders) + ') AS '
+        'load (' + ', '.join(columns) + ')')
+
+
+def get_load_statement(table, columns, computed_columns, placeholders):
+    # Insert rows into the table, skipping rows that already exist there
+    rows_table = table + '_rows'
+    statement = ('WITH ' + rows_table + ' AS (' + get_rows_query(table,
+        columns, placeholders) + ')')
+
+    insert_statement = ('INSERT INTO ' + table + ' (' + ', '.join(
+        columns + tuple(computed_columns)) + ') SELECT ' + ', '.join(
+        columns + tuple(computed_columns.values())) + ' FROM ' + rows_table +
+        ' ON CONFLICT DO NOTHING')
+
+    # Update summaries of the feeds' posts along with their feed rows, and
+    # rollups of posts' comments with the comments that were inserted
+    if table == 'feed_post':
+        return (statement + ', inserted AS (' + insert_statement + ') ' +
+            get_summarize_posts_statement(rows_table))
+    elif table == 'comment':
+        return (statement + ', inserted AS (' + insert_statement +
+            ' RETURNING post_id, level, total_word_count) ' +
+            get_add_to_post_rollups_statement('inserted'))
+
+    return statement + ' ' + insert_statement
+
+
+def get_summarize_posts_statement(feed_posts_table):
+    # Summarize each post's rows of front page feeds in feed posts table,
+    # merging them into its summary: keep its first and last feeds, and
+    # replace each snapshot with the rows' snapshot if it is newer (latest)
+    # or better (the rest)
+    snapshot_columns = [column for columns, _, _ in POST_SNAPSHOTS
+        for column in columns]
+
+    return ('INSERT INTO post_summary (post_id, first_feed_id, last_feed_id, '
+        + ', '.join(snapshot_columns) + ') SELECT post_id, MIN(feed_id), '
+        'MAX(feed_id), ' + ', '.join('(ARRAY_AGG(' + feed_post_column +
+        ' ORDER BY ' + order + '))[1]' for _, order, _ in POST_SNAPSHOTS
+        for feed_post_column in ('comment_count', 'feed_rank',
+        'point_count')) + ' FROM ' + feed_posts_table + ' JOIN feed ON '
+        'feed.id = ' + feed_posts_table + '.feed_id WHERE feed.source = '
+        "'news' GROUP BY post_id "
+        'ON CONFLICT (post_id) DO UPDATE SET first_feed_id = '
+        'LEAST(post_summary.first_feed_id, excluded.first_feed_id), '
+        'last_feed_id = GREATEST(post_summary.last_feed_id, '
+        'excluded.last_feed_id), ' + ', '.join(column + ' = CASE WHEN ' +
+        replaces + ' THEN excluded.' + column + ' ELSE post_summary.' +
+        column + ' END' for columns, _, replaces in POST_SNAPSHOTS
+        for column in columns))
+
+
+def summarize_posts(connection):
+    # Summarize posts from all of their feed rows, for feed rows written
+    # without the loader
+    connection.exec_driver_sql(get_summarize_posts_statement('feed_post'))
+
+
+def get_roll_up_posts_statement(post_ids_query):
+    # Count comments of posts (rows of post ids query) and sum their levels
+    # and word counts, replacing the posts' rollups
+    return ('INSERT INTO post_comment_rollup (post_id, comment_count, '
+        'level_sum, word_count_sum) SELECT post_id, COUNT(*), SUM(level), '
+        'SUM(total_word_count) FROM comment WHERE post_id IN (' +
+        post_ids_query + ') GROUP BY post_id ON CONFLICT (post_id) DO UPDATE '
+        'SET comment_count = excluded.comment_count, level_sum = '
+        'excluded.level_sum, word_count_sum = excluded.word_count_sum')
+
+
+def roll_up_posts(connection):
+    # Roll up comments of every post, for comments written without the
+    # loader
+    connection.exec_driver_sql(get_roll_up_posts_statement(
+        'SELECT id FROM post'))
+
+
+def get_add_to_post_rollups_statement(comments_table):
+    # Add comments (rows of comments table) not yet rolled up to their posts'
+    # rollups
+    return ('INSERT INTO post_comment_rollup (post_id, comment_count, '
+        'level_sum, word_count_sum) SELECT post_id, COUNT(*), SUM(level), '
+        'SUM(total_word_count) FROM ' + comments_table + ' GROUP BY post_id '
+        'ON CONFLICT (post_id) DO UPDATE SET comment_count = '
+        'post_comment_rollup.comment_count + excluded.comment_count, '
+        'level_sum = post_comment_rollup.level_sum + excluded.level_sum, '
+        'word_count_sum = post_comment_rollup.word_count_sum + '
+        'excluded.word_count_sum')
+
+
+def get_update_statement(placeholders):
+    # Rewrite content of comments that changed since they were stored,
+    # recomputing their word counts and content hashes, and add the change in
+    # their word counts to rollups of their posts and of the feeds that list
+    # them (every part of the statement reads comments as they were before)
+    return ('WITH updated AS (SELECT ' + ', '.join(UPDATED_COMMENT_COLUMNS) +
+        ', ' + WORD_COUNTS + ' AS word_counts, ' + CONTENT_HASH + ' AS '
+        'content_hash FROM (' + get_rows_query('comment',
+        UPDATED_COMMENT_COLUMNS, placeholders) + ') AS updated_comment_rows), '
+        'changes AS (SELECT comment.id, comment.post_id, '
+        'updated.total_word_count - comment.total_word_count AS '
+        'word_count_change FROM updated JOIN comment ON comment.id = '
+        'updated.id WHERE updated.total_word_count <> '
+        'comment.total_word_count), feed_rollups AS (UPDATE feed_rollup SET '
+        'word_count_sum = feed_rollup.word_count_sum + '
+        'feed_changes.word_count_change FROM (SELECT feed.id AS feed_id, '
+        'SUM(changes.word_count_change) AS word_count_change FROM changes '
+        'JOIN comment_interval ON comment_interval.comment_id = changes.id '
+        'JOIN feed ON feed.source = comment_interval.source AND feed.id '
+        'BETWEEN comment_interval.first_feed_id AND '
+        'comment_interval.last_feed_id GROUP BY feed.id) AS feed_changes '
+        'WHERE feed_rollup.feed_id = feed_changes.feed_id), post_rollups AS '
+        '(UPDATE post_comment_rollup SET word_count_sum = '
+        'post_comment_rollup.word_count_sum + post_changes.word_count_change '
+        'FROM (SELECT post_id, SUM(word_count_change) AS word_count_change '
+        'FROM changes GROUP BY post_id) AS post_changes WHERE '
+        'post_comment_rollup.post_id = post_changes.post_id) UPDATE comment '
+        'SET content = updated.content, total_word_count = '
+        'updated.total_word_count, word_counts = updated.word_counts, '
+        'content_hash = updated.content_hash FROM updated WHERE comment.id = '
+        'updated.id')
+
+
+def get_add_intervals_statement(ranks_query):
+    # Record comment ranks in feeds (rows of ranks query) as intervals of
+    # feeds from the same list: extend a comment's interval that ends at the
+    # list's previous feed with the same rank, otherwise start an interval,
+    # skipping ranks already recorded
+    return ('WITH ranks AS (SELECT DISTINCT ON (ranks.comment_id, '
+        'ranks.feed_id) ranks.comment_id, ranks.feed_id, ranks.feed_rank, '
+        'feed.source, (SELECT MAX(previous_feed.id) FROM feed AS '
+        'previous_feed WHERE previous_feed.source = feed.source AND '
+        'previous_feed.id < feed.id) AS previous_feed_id FROM (' +
+        ranks_query + ') AS ranks JOIN feed ON feed.id = ranks.feed_id ORDER '
+        'BY ranks.comment_id, ranks.feed_id, ranks.feed_rank), extended AS '
+        '(UPDATE comment_interval SET last_feed_id = ranks.feed_id FROM ranks '
+        'WHERE comment_interval.comment_id = ranks.comment_id AND '
+        'comment_interval.source = ranks.source AND '
+        'comment_interval.last_feed_id = ranks.previous_feed_id AND '
+        'comment_interval.feed_rank = ranks.feed_rank RETURNING '
+        'comment_interval.comment_id, comment_interval.last_feed_id) '
+        'INSERT INTO comment_interval (comment_id, source, first_feed_id, '
+        'last_feed_id, feed_rank) SELECT ranks.comment_id, ranks.source, '
+        'ranks.feed_id, ranks.feed_id, ranks.feed_rank FROM ranks WHERE NOT '
+        'EXISTS (SELECT 1 FROM extended WHERE extended.comment_id = '
+        'ranks.comment_id AND extended.last_feed_id = ranks.feed_id) AND NOT '
+        'EXISTS (SELECT 1 FROM comment_interval WHERE '
+        'comment_interval.comment_id = ranks.comment_id AND '
+        'comment_interval.source = ranks.source AND ranks.feed_id BETWEEN '
+        'comment_interval.first_feed_id AND comment_interval.last_feed_id) '
+        'ON CONFLICT DO NOTHING')
+
+
+def get_copy_comments_statement(from_feed_id, to_feed_id, post_ids):
+    # Copy ranks of posts' comments in one feed to another feed (ids are
+    # written into statement as integers, so it can be sent with others)
+    return get_add_intervals_statement('SELECT feed_comment.comment_id, ' +
+        str(int(to_feed_id)) + ' AS feed_id, feed_comment.feed_rank FROM '
+        'comment JOIN feed_comment ON feed_comment.comment_id = comment.id '
+        'WHERE comment.post_id = ANY(ARRAY[' + ', '.join(str(int(post_id))
+        for post_id in post_ids) + ']::integer[]) AND feed_comment.feed_id = '
+        + str(int(from_feed_id)))
+
+
+def copy_comments(connection, from_feed_id, to_feed_id, post_ids):
+    connection.exec_driver_sql(get_copy_comments_statement(from_feed_id,
+        to_feed_id, post_ids))
+
+
+def get_skip_comments_statement(feed_posts):
+    # Mark (feed_id, post_id) rows whose post's comments weren't scraped (ids
+    # are written into statement as integers, so it can be sent with others)
+    return ('UPDATE feed_post SET comments_skipped = true WHERE (feed_id, '
+        'post_id) IN (' + ', '.join('(' + str(int(feed_id)) + ', ' +
+        str(int(post_id)) + ')' for feed_id, post_id in feed_posts) + ')')
+
+
+def skip_comments(connection, feed_posts):
+    connection.exec_driver_sql(get_skip_comments_statement(feed_posts))
+
+
+def get_roll_up_feeds_statement(feed_ids):
+    # Sum feeds' posts' comment and point counts and their comments' levels
+    # and word counts, replacing their rollups if they were rolled up before
+    # (ids are written into statement as integers, so it can be sent with
+    # others, and comment intervals are bounded by the feeds' ids, so ones
+    # that ended before the feeds aren't scanned)
+    feed_ids = [int(feed_id) for feed_id in feed_ids]
+    feed_id_array = ('ARRAY[' + ', '.join(str(feed_id) for feed_id in
+        feed_ids) + ']::integer[]')
+
+    return ('WITH posts AS (SELECT feed_id, COUNT(*) AS feed_post_count, '
+        'SUM(comment_count) AS comment_count_sum, SUM(point_count) AS '
+        'point_count_sum FROM feed_post WHERE feed_id = ANY(' +
+        feed_id_array + ') GROUP BY feed_id), comments AS (SELECT feed.id AS '
+        'feed_id, COUNT(*) AS feed_comment_count, SUM(comment.level) AS '
+        'level_sum, SUM(comment.total_word_count) AS word_count_sum FROM '
+        'comment_interval JOIN feed ON feed.source = comment_interval.source '
+        'AND feed.id BETWEEN comment_interval.first_feed_id AND '
+        'comment_interval.last_feed_id JOIN comment ON comment.id = '
+        'comment_interval.comment_id WHERE feed.id = ANY(' + feed_id_array +
+        ') AND comment_interval.last_feed_id >= ' + str(min(feed_ids)) +
+        ' AND comment_interval.first_feed_id <= ' + str(max(feed_ids)) +
+        ' GROUP BY feed.id) INSERT INTO feed_rollup (feed_id, '
+        'feed_post_count, comment_count_sum, point_count_sum, '
+        'feed_comment_count, level_sum, word_count_sum) SELECT feed.id, '
+        'COALESCE(posts.feed_post_count, 0), '
+        'COALESCE(posts.comment_count_sum, 0), '
+        'COALESCE(posts.point_count_sum, 0), '
+        'COALESCE(comments.feed_comment_count, 0), '
+        'COALESCE(comments.level_sum, 0), COALESCE(comments.word_count_sum, '
+        '0) FROM feed LEFT JOIN posts ON posts.feed_id = feed.id LEFT JOIN '
+        'comments ON comments.feed_id = feed.id WHERE feed.id = ANY(' +
+        feed_id_array + ') ON CONFLICT (feed_id) DO UPDATE SET '
+        'feed_post_count = excluded.feed_post_count, comment_count_sum = '
+        'excluded.comment_count_sum, point_count_sum = '
+        'excluded.point_count_sum, feed_comment_count = '
+        'excluded.feed_comment_count, level_sum = excluded.level_sum, '
+        'word_count_sum = excluded.word_count_sum')
+
+
+def roll_up_feeds(connection, feed_ids):
+    connection.exec_driver_sql(get_roll_up_feeds_statement(feed_ids))
@@ -1,8 +1,10 @@
+import hashlib
 import os
 
 from datetime import datetime
-from sqlalchemy import Column, ForeignKey, Index, Integer, create_engine
-from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy import (BigInteger, Boolean, Column, ForeignKey,
+    Index, Integer, LargeBinary, UniqueConstraint, create_engine, false)
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 from sqlalchemy.types import Enum, TEXT, TIMESTAMP
 
@@ -27,12 +29,23 @@ Session = sessionmaker(bind=engine, expire_on_commit=False)
 Base = declarative_base()
 
 
+def get_content_hash(context):
+    # Hash content of comments added without the loader the way the loader
+    # hashes them
+    return hashlib.md5(context.get_current_parameters()['content'].encode(
+        'utf-8')).digest()
+
+
 class Feed(Base):
     __tablename__ = 'feed'
     id = Column(Integer, primary_key=True, nullable=False)
     created = Column(TIMESTAMP(timezone=False), default=datetime.utcnow,
         nullable=False)
-    __table_args__ = (Index('feed_id_index', 'id'), )
+    source = Column(Enum('news', 'newest', 'ask', 'show', 'best',
+        name='feed_source'), default='news', server_default='news',
+        nullable=False)
+    __table_args__ = (Index('feed_source_created_index', 'source',
+        'created'), )
 
 
 class Post(Base):
@@ -63,8 +76,14 @@ class Comment(Base):
     total_word_count = Column(Integer, default=0, nullable=False)
     username = Column(TEXT, nullable=False)
     word_counts = Column(TSVECTOR, nullable=False)
-    __table_args__ = (Index('comment_index', 'id', 'level', 'parent_comment',
-        'post_id', 'total_word_count', 'username'), )
+    # MD5 hash of content, to find comments that changed since they were
+    # stored without reading their content
+    content_hash = Column(LargeBinary, default=get_content_hash)
+    # Cover columns read by comment statistics, so they are read from the
+    # index when joined to a feed's comments
+    __table_args__ = (Index('comment_stats_index', 'id', postgresql_include=[
+        'level', 'post_id', 'total_word_count', 'username']),
+        Index('comment_post_id_index', 'post_id'))
 
     post = relationship("Post", back_populates='comments')
 
@@ -82,8 +101,18 @@ class FeedPost(Base):
     comment_count = Column(Integer, default=0, nullable=False)
     feed_rank = Column(Integer, nullable=False)
     point_count = Column(Integer, default=0, nullable=False)
-    __table_args__ = (Index('feed_post_index', 'comment_count', 'feed_id',
-        'feed_rank', 'point_count', 'post_id'), )
+    comments_carried = Column(Boolean, default=False, server_default=false(),
+        nullable=False)
+    # Post's comments weren't (all) scraped for the feed, since its pages
+    # failed or were skipped after the time budget, so they aren't carried
+    # forward from it
+    comments_skipped = Column(Boolean, default=False, server_default=false(),
+        nullable=False)
+    # Lead with feed, which statistics are filtered by, covering the columns
+    # they read, and partition by feed, a month of feeds per partition
+    __table_args__ = (Index('feed_post_feed_index', 'feed_id', 'post_id',
+        postgresql_include=['comment_count', 'feed_rank', 'point_count']),
+        {'postgresql_partition_by': 'RANGE (feed_id)'})
 
     post = relationship("Post", back_populates='feeds')
 
@@ -92,6 +121,92 @@ Post.feeds = relationship(
     "FeedPost", order_by=FeedPost.feed_id, back_populates='post')
 
 
+# Post's first and last front page feeds, with its counts and rank in its
+# latest feed, the feed where it had the most comments, the feed where it had
+# the most points and the feed where it ranked best, kept up to date as feeds
+# are written (feeds aren't foreign keys, so summaries outlive dropped
+# partitions). Posts with a summary are the ones all-time statistics cover
+class PostSummary(Base):
+    __tablename__ = 'post_summary'
+    post_id = Column(Integer, ForeignKey('post.id', ondelete='CASCADE'),
+        primary_key=True, nullable=False)
+    first_feed_id = Column(Integer, nullable=False)
+    last_feed_id = Column(Integer, nullable=False)
+    comment_count = Column(Integer, nullable=False)
+    feed_rank = Column(Integer, nullable=False)
+    point_count = Column(Integer, nullable=False)
+    max_comment_count = Column(Integer, nullable=False)
+    max_comment_feed_rank = Column(Integer, nullable=False)
+    max_comment_point_count = Column(Integer, nullable=False)
+    max_point_comment_count = Column(Integer, nullable=False)
+    max_point_feed_rank = Column(Integer, nullable=False)
+    max_point_count = Column(Integer, nullable=False)
+    best_rank_comment_count = Column(Integer, nullable=False)
+    best_feed_rank = Column(Integer, nullable=False)
+    best_rank_point_count = Column(Integer, nullable=False)
+    # Index the order each all-time statistic reads posts in, so it reads
+    # only the posts it returns
+    __table_args__ = (
+        Index('post_summary_comment_count_index', max_comment_count.desc()),
+        Index('post_summary_point_count_index', max_point_count.desc()),
+        Index('post_summary_rank_index', best_feed_rank,
+            best_rank_point_count.desc()))
+
+    post = relationship("Post")
+
+
+# Sums and counts of a feed's rows, written once the feed is scraped, so
+# averages over many feeds are combined from a row per feed: its posts'
+# comment and point counts, and the tree depths (levels) and word counts of
+# the comments it lists
+class FeedRollup(Base):
+    __tablename__ = 'feed_rollup'
+    feed_id = Column(Integer, ForeignKey('feed.id', ondelete='CASCADE'),
+        primary_key=True, nullable=False)
+    feed_post_count = Column(BigInteger, nullable=False)
+    comment_count_sum = Column(BigInteger, nullable=False)
+    point_count_sum = Column(BigInteger, nullable=False)
+    feed_comment_count = Column(BigInteger, nullable=False)
+    level_sum = Column(BigInteger, nullable=False)
+    word_count_sum = Column(BigInteger, nullable=False)
+
+
+# Count and sums of a post's comments (each stored comment once, however many
+# feeds list it), kept up to date as comments are written, so all-time
+# comment averages are combined from a row per post
+class PostCommentRollup(Base):
+    __tablename__ = 'post_comment_rollup'
+    post_id = Column(Integer, ForeignKey('post.id', ondelete='CASCADE'),
+        primary_key=True, nullable=False)
+    comment_count = Column(BigInteger, nullable=False)
+    level_sum = Column(BigInteger, nullable=False)
+    word_count_sum = Column(BigInteger, nullable=False)
+
+
+# Comment's rank in consecutive feeds of a list, from first feed to last feed,
+# rather than a row for every feed that lists it
+class CommentInterval(Base):
+    __tablename__ = 'comment_interval'
+    comment_id = Column(Integer, ForeignKey('comment.id', ondelete='CASCADE'),
+        primary_key=True, nullable=False)
+    source = Column(Enum('news', 'newest', 'ask', 'show', 'best',
+        name='feed_source'), primary_key=True, nullable=False)
+    first_feed_id = Column(Integer, ForeignKey('feed.id', ondelete='CASCADE'),
+        nullable=False)
+    last_feed_id = Column(Integer, ForeignKey('feed.id', ondelete='CASCADE'),
+        primary_key=True, nullable=False)
+    feed_rank = Column(Integer, nullable=False)
+    # Partition by last feed, a month of feeds per partition, so intervals
+    # that ended before a period aren't scanned
+    __table_args__ = (Index('comment_interval_feed_index', 'source',
+        'last_feed_id', 'first_feed_id', postgresql_include=['comment_id',
+        'feed_rank']), {'postgresql_partition_by': 'RANGE (last_feed_id)'})
+
+    comment = relationship("Comment")
+
+
+# Comment's rank in each feed that lists it, read from comment intervals (a
+# view, so ranks are added as intervals)
 class FeedComment(Base):
     __tablename__ = 'feed_comment'
     comment_id = Column(Integer, ForeignKey('comment.id', ondelete='CASCADE'),
@@ -99,11 +214,30 @@ class FeedComment(Base):
     feed_id = Column(Integer, ForeignKey('feed.id', ondelete='CASCADE'),
         primary_key=True, nullable=False)
     feed_rank = Column(Integer, nullable=False)
-    __table_args__ = (Index('feed_comment_index', 'comment_id', 'feed_id',
-        'feed_rank'), )
 
     comment = relationship("Comment", back_populates='feeds')
 
 
 Comment.feeds = relationship(
     "FeedComment", order_by=FeedComment.feed_id, back_populates='comment')
+
+
+class ScrapeTask(Base):
+    __tablename__ = 'scrape_task'
+    id = Column(Integer, primary_key=True, nullable=False)
+    feed_id = Column(Integer, ForeignKey('feed.id', ondelete='CASCADE'),
+        nullable=False)
+    post_id = Column(Integer, ForeignKey('post.id', ondelete='CASCADE'),
+        nullable=False)
+    comment_count = Column(Integer, default=0, nullable=False)
+    share_feed_ids = Column(ARRAY(Integer), default=list, server_default='{}',
+        nullable=False)
+    status = Column(Enum('pending', 'running', 'done', 'failed',
+        name='scrape_task_status'), default='pending',
+        server_default='pending', nullable=False)
+    claimed_by = Column(TEXT)
+    lease_until = Column(TIMESTAMP(timezone=False))
+    attempts = Column(Integer, default=0, server_default='0', nullable=False)
+    error = Column(TEXT)
+    __table_args__ = (UniqueConstraint('feed_id', 'post_id'),
+        Index('scrape_task_claim_index', 'status', 'lease_until'))
@@ -0,0 +1,384 @@
+import concurrent.futures
+import io
+import multiprocessing
+import os
+
+from bs4 import BeautifulSoup
+from collections import namedtuple
+
+try:
+    import lxml.etree
+except ImportError:
+    lxml = None
+
+
+# Parsers turn a feed page into post records and a post page into comment
+# records plus the number of the post's next page of comments (if any), so
+# the scraper can use any backend that returns the same records
+PostRecord = namedtuple('PostRecord', ['id', 'age', 'link', 'title',
+    'username', 'website', 'comment_count', 'feed_rank', 'point_count'])
+CommentRecord = namedtuple('CommentRecord', ['id', 'level', 'content',
+    'total_word_count', 'age', 'username'])
+
+# Number of comments parsed from a post page at a time when pages are parsed
+# in batches
+DEFAULT_BATCH_SIZE = 500
+
+# Elements read from each row, as (tag, class) pairs
+POST_ROW_ELEMENTS = {('a', 'storylink'), ('span', 'rank'),
+    ('span', 'sitestr'), ('span', 'titleline')}
+SUBTEXT_ROW_ELEMENTS = {('a', 'hnuser'), ('span', 'age'), ('span', 'score')}
+COMMENT_ROW_ELEMENTS = {('a', 'hnuser'), ('div', 'comment'), ('span', 'age'),
+    ('td', 'ind')}
+
+
+def get_post_record(post_id, elements, item_text, text):
+    # Older feed pages mark the link itself with "storylink" class instead
+    # of wrapping it in a "titleline" span
+    link = elements['link']
+    score = elements.get(('span', 'score'))
+    user = elements.get(('a', 'hnuser'))
+    site = elements.get(('span', 'sitestr'))
+
+    return PostRecord(
+        id=post_id,
+        age=text(elements['age_link']),
+        link=link.get('href'),
+        title=text(link),
+        # Username is blank for job postings
+        username=text(user) if user is not None else '',
+        # Website is blank for ask postings
+        website=text(site) if site is not None else '',
+        # Comment count is listed in the last link to the post's page, unless
+        # the post can't be commented on
+        comment_count=(int(item_text.split()[0])
+            if 'comment' in item_text else 0),
+        feed_rank=int(text(elements[('span', 'rank')])[:-1]),
+        # Score is missing for job postings
+        point_count=(int(text(score).split()[0])
+            if score is not None else None),
+        )
+
+
+def get_comment_record(comment_id, elements, content, flagged, text):
+    user = elements.get(('a', 'hnuser'))
+
+    # Flagged comments have a message instead of content, so they don't
+    # count towards word counts
+    content = content.strip()
+
+    return CommentRecord(
+        id=comment_id,
+        # Get comment's level in tree by getting indentation width value
+        # divided by value of one indent (40px)
+        level=int(elements['indent'].get('width')) // 40,
+        content=content,
+        total_word_count=0 if flagged else len(content.split()),
+        age=text(elements['age_link']),
+        username=text(user) if user is not None else '',
+        )
+
+
+class SoupParser:
+    name = 'soup'
+
+    @staticmethod
+    def text(element):
+        return element.get_text()
+
+    @staticmethod
+    def index_row(row, wanted, item_href=None):
+        # Walk row's tree once, keeping the first element for each wanted
+        # (tag, class) pair and the last link to the item page if given
+        elements = {}
+
+        for element in row.find_all(True):
+            for name in element.get('class', ()):
+                key = (element.name, name)
+
+                if key in wanted and key not in elements:
+                    elements[key] = element
+
+            if item_href and element.get('href') == item_href:
+                elements['item_link'] = element
+
+        return elements
+
+    def parse_feed_page(self, content):
+        feed_soup = BeautifulSoup(content, 'html.parser')
+
+        posts = []
+
+        for post_row in feed_soup.find_all('tr', 'athing'):
+            post_id = post_row.get('id')
+            item_href = 'item?id=' + post_id
+
+            elements = self.index_row(post_row, POST_ROW_ELEMENTS)
+            elements.update(self.index_row(post_row.next_sibling,
+                SUBTEXT_ROW_ELEMENTS, item_href))
+
+            title_line = elements.get(('span', 'titleline'))
+            elements['link'] = (title_line.find('a')
+                if title_line is not None else
+                elements[('a', 'storylink')])
+            elements['age_link'] = elements[('span', 'age')].a
+
+            posts.append(get_post_record(post_id, elements,
+                elements['item_link'].get_text(), self.text))
+
+        return posts
+
+    def parse_post_page(self, content):
+        post_soup = BeautifulSoup(content, 'html.parser')
+
+        # If post page contains a "More" link to more comments, get the page
+        # number of the next page to scrape
+        more_link = post_soup.find('a', 'morelink')
+
+        if more_link:
+            next_page_number = more_link.get('href').split('&p=')[1]
+        else:
+            next_page_number = None
+
+        comments = []
+
+        for comment_row in post_soup.select('tr.athing.comtr'):
+            elements = self.index_row(comment_row, COMMENT_ROW_ELEMENTS)
+            elements['indent'] = elements[('td', 'ind')].contents[0]
+            elements['age_link'] = elements[('span', 'age')].a
+
+            comment_div = elements[('div', 'comment')]
+            content_span = comment_div.find('span')
+
+            # If comment has content span, get text from span and remove the
+            # last word ('reply') from it
+            if content_span is not None:
+                comment_content = content_span.get_text().rsplit(' ', 1)[0]
+            else:
+                comment_content = comment_div.get_text()
+
+            comments.append(get_comment_record(comment_row.get('id'),
+                elements, comment_content, content_span is None, self.text))
+
+        return comments, next_page_number
+
+
+class LxmlParser:
+    name = 'lxml'
+
+    def __init__(self):
+        # Hacker News pages are UTF-8 but don't declare a charset (plain
+        # etree elements are used, since lxml.html looks up a class for each
+        # element it returns)
+        self.html_parser = lxml.etree.HTMLParser(encoding='utf-8')
+
+        self.more_link = lxml.etree.XPath(
+            '//a[' + has_class('morelink') + ']')
+
+    # Get text of element and its descendants as plain strings, which don't
+    # keep the parse tree alive like lxml's default "smart" strings
+    text = staticmethod(lxml.etree.XPath('string()', smart_strings=False)
+        if lxml else None)
+
+    @staticmethod
+    def index_rows(tree, row_class, wanted):
+        # Walk page's tree once, starting a row at each table row with
+        # row_class and keeping the first element for each wanted (tag,
+        # class) pair after it and its last link to the item page (lxml
+        # skips elements of other tags without creating them)
+        rows = []
+        elements = None
+        tags = {tag for tag, _ in wanted} | {'tr', 'a'}
+
+        for element in tree.iter(*tags):
+            classes = element.get('class', '').split()
+
+            if element.tag == 'tr' and row_class in classes:
+                elements = {'row': element}
+                item_href = 'item?id=' + element.get('id')
+                rows.append(elements)
+                continue
+
+            if elements is None:
+                continue
+
+            for name in classes:
+                key = (element.tag, name)
+
+                if key in wanted and key not in elements:
+                    elements[key] = element
+
+            if element.tag == 'a' and element.get('href') == item_href:
+                elements['item_link'] = element
+
+        return rows
+
+    def text_without_reply(self, element):
+        parts = [element.text or '']
+
+        for child in element:
+            if (child.tag != 'div' or
+                'reply' not in child.get('class', '').split()):
+                    parts.append(self.text(child))
+
+            parts.append(child.tail or '')
+
+        return ''.join(parts)
+
+    def parse_feed_page(self, content):
+        tree = lxml.etree.fromstring(content, parser=self.html_parser)
+
+        posts = []
+
+        # Each post row is followed by its subtext row, so both rows' elements
+        # are kept for the post
+        for elements in self.index_rows(tree, 'athing',
+            POST_ROW_ELEMENTS | SUBTEXT_ROW_ELEMENTS):
+                title_line = elements.get(('span', 'titleline'))
+                elements['link'] = (title_line.find('a')
+                    if title_line is not None else
+                    elements[('a', 'storylink')])
+                elements['age_link'] = elements[('span', 'age')].find('a')
+
+                posts.append(get_post_record(elements['row'].get('id'),
+                    elements, self.text(elements['item_link']), self.text))
+
+        return posts
+
+    def parse_post_page(self, content):
+        tree = lxml.etree.fromstring(content, parser=self.html_parser)
+
+        more_link = self.more_link(tree)
+
+        if more_link:
+            next_page_number = more_link[0].get('href').split('&p=')[1]
+        else:
+            next_page_number = None
+
+        comments = [self.get_comment(elements) for elements in
+            self.index_rows(tree, 'comtr', COMMENT_ROW_ELEMENTS)]
+
+        return comments, next_page_number
+
+    def iter_post_page(self, content, batch_size):
+        comments = []
+        next_page_number = None
+
+        # Parse page incrementally, reading each comment row once its end
+        # tag is parsed and then removing it and the rows before it from the
+        # tree, so a long thread's tree is never held at once
+        for _, element in lxml.etree.iterparse(io.BytesIO(content),
+            tag=('tr', 'a'), html=True, encoding='utf-8'):
+                classes = element.get('class', '').split()
+
+                if element.tag == 'a':
+                    if 'morelink' in classes:
+                        next_page_number = element.get('href').split(
+                            '&p=')[1]
+
+                    continue
+
+                if 'comtr' not in classes:
+                    continue
+
+                comments.append(self.get_comment(self.index_rows(element,
+                    'comtr', COMMENT_ROW_ELEMENTS)[0]))
+
+                element.clear(keep_tail=True)
+
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+                if len(comments) >= batch_size:
+                    yield comments, None
+                    comments = []
+
+        yield comments, next_page_number
+
+    def get_comment(self, elements):
+        elements['indent'] = elements[('td', 'ind')][0]
+        elements['age_link'] = elements[('span', 'age')].find('a')
+
+        comment_div = elements[('div', 'comment')]
+        content_span = comment_div.find('.//span')
+
+        # Comment text is followed by its reply link inside the content span,
+        # while flagged comments have a message and no span
+        if content_span is not None:
+            comment_content = self.text_without_reply(content_span)
+        else:
+            comment_content = self.text(comment_div)
+
+        return get_comment_record(elements['row'].get('id'), elements,
+            comment_content, content_span is None, self.text)
+
+
+def has_class(name):
+    # XPath test for an element whose class attribute includes name
+    return ('contains(concat(" ", normalize-space(@class), " "), " ' + name +
+        ' ")')
+
+
+PARSERS = {'soup': SoupParser}
+
+if lxml:
+    PARSERS['lxml'] = LxmlParser
+
+DEFAULT_PARSER = 'lxml' if lxml else 'soup'
+
+parser_instances = {}
+
+
+def get_parser(name=None):
+    # Get parser set for scrapes, using the fastest one installed by default
+    name = name or os.getenv('SCRAPE_PARSER') or DEFAULT_PARSER
+
+    if name not in PARSERS:
+        raise ValueError('Unknown or unavailable HTML parser: ' + name)
+
+    if name not in parser_instances:
+        parser_instances[name] = PARSERS[name]()
+
+    return parser_instances[name]
+
+
+def parse_feed_page(content, name=None):
+    # Parse in worker processes, so take and return plain data
+    return get_parser(name).parse_feed_page(content)
+
+
+def parse_post_page(content, name=None):
+    return get_parser(name).parse_post_page(content)
+
+
+def iter_post_page(content, name=None, batch_size=None):
+    # Parse post page into batches of comment records, as (comments, next
+    # page number) pairs with the next page number given with the last
+    # batch, parsing the page incrementally if the parser can, or in one
+    # batch otherwise
+    parser = get_parser(name)
+
+    if not hasattr(parser, 'iter_post_page'):
+        yield parser.parse_post_page(content)
+        return
+
+    yield from parser.iter_post_page(content, batch_size or
+        DEFAULT_BATCH_SIZE)
+
+
+def parse_post_page_batches(content, name=None, batch_size=None):
+    # Parse post page incrementally in a worker process too, so the worker
+    # never holds a long thread's whole tree, returning its batches together
+    # since a generator can't be sent back from the worker
+    return list(iter_post_page(content, name, batch_size))
+
+
+def create_parse_executor(workers):
+    # Fork worker processes from a server process that has imported the
+    # parsers (and the main script), so workers start quickly without
+    # copying the scraper's threads and connections
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['__main__', __name__])
+
+    return concurrent.futures.ProcessPoolExecutor(workers,
+        mp_context=context)
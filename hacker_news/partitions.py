@@ -0,0 +1,98 @@
+import re
+
+from datetime import datetime
+from sqlalchemy import text
+
+# Tables partitioned by feed, one partition per month of feeds
+PARTITIONED_TABLES = ('feed_post', 'comment_interval')
+
+# Feed ids set aside for each month's partition, far more than the feeds
+# scraped in a month, so a month's feeds always fit in its partition
+FEEDS_PER_PARTITION = 1000000
+
+# Key of the advisory lock held while partitions are added, so feeds added by
+# several processes don't create the same partition
+PARTITION_LOCK_KEY = 7526811
+
+
+def get_partition_name(table, month):
+    return f'{table}_{month.year:04d}_{month.month:02d}'
+
+
+def get_month(created):
+    return datetime(created.year, created.month, 1)
+
+
+def get_next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def get_partitions(connection, table='feed_post'):
+    # Return each of table's partitions by month, with the range of feed ids
+    # it holds (None for an unbounded start)
+    rows = connection.execute(text("""
+        SELECT child.relname,
+               pg_get_expr(child.relpartbound, child.oid) AS bound
+          FROM pg_inherits
+          JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+         WHERE pg_inherits.inhparent = CAST(:table AS regclass)
+        """), {'table': table}).all()
+
+    partitions = {}
+
+    for name, bound in rows:
+        start, end = re.search(r'FROM \((\w+)\) TO \((\w+)\)', bound).groups()
+        year, month = name.rsplit('_', 2)[1:]
+
+        partitions[datetime(int(year), int(month), 1)] = (
+            None if start == 'MINVALUE' else int(start), int(end))
+
+    return partitions
+
+
+def create_partitions(connection, month, start, end):
+    for table in PARTITIONED_TABLES:
+        connection.execute(text('CREATE TABLE ' + get_partition_name(table,
+            month) + ' PARTITION OF ' + table + ' FOR VALUES FROM (' +
+            ('MINVALUE' if start is None else str(int(start))) + ') TO (' +
+            str(int(end)) + ')'))
+
+
+def add_feed_partitions(connection, created=None):
+    month = get_month(created or datetime.utcnow())
+
+    connection.execute(text('SELECT pg_advisory_xact_lock(:key)'),
+        {'key': PARTITION_LOCK_KEY})
+
+    partitions = get_partitions(connection)
+    latest_month = max(partitions)
+
+    # Feeds added for months before the latest partition (when replaying
+    # archived scrapes) keep the next feed id, in whichever partition holds it
+    if month < latest_month:
+        return
+
+    # Start month's partition after the latest one if months were skipped
+    if month not in partitions:
+        start = partitions[latest_month][1]
+        partitions[month] = (start, start + FEEDS_PER_PARTITION)
+
+        create_partitions(connection, month, *partitions[month])
+
+    # Move feed ids on to month's partition, when it is the first feed of
+    # the month
+    start = partitions[month][0]
+
+    if start is not None:
+        connection.execute(text("SELECT setval('feed_id_seq', :start, false) "
+            "FROM feed_id_seq WHERE last_value + CAST(is_called AS integer) < "
+            ":start"), {'start': start})
+
+    # Create next month's partition ahead of its first feed
+    next_month = get_next_month(month)
+
+    if next_month not in partitions:
+        start = partitions[month][1]
+
+        create_partitions(connection, next_month, start,
+            start + FEEDS_PER_PARTITION)
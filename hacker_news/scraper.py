@@ -0,0 +1,1229 @@
+import asyncio
+import functools
+import hashlib
+import itertools
+import math
+import os
+import signal
+import time
+
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import func
+from urllib.parse import parse_qs
+
+from hacker_news import (archive, client, coordination, database, loader,
+    models, parsers, partitions, spool)
+
+DEFAULT_BUDGET = 2400
+DEFAULT_DEADLINE = 3000
+DEFAULT_INTERVAL = 3600
+DEFAULT_MAX_BUFFERED_COMMENTS = 5000
+DEFAULT_QUEUE_SIZE = 30
+DEFAULT_REFRESH_HOURS = 6
+FEED_PAGES = (1, 2, 3)
+
+# Lists of posts that can be scraped into feeds, named by their paths on
+# Hacker News, and the lists scraped by default with their page depths
+SOURCE_NAMES = ('news', 'newest', 'ask', 'show', 'best')
+DEFAULT_SOURCES = 'news:3'
+
+# Parse pages in one worker process per core, or on the event loop if there
+# is only one core
+CPU_COUNT = os.cpu_count() or 1
+DEFAULT_PARSE_WORKERS = CPU_COUNT if CPU_COUNT > 1 else 0
+
+FeedSource = namedtuple('FeedSource', ['name', 'pages'])
+
+
+def get_sources(sources=None):
+    # Read lists to scrape as comma-separated names with optional page
+    # depths (e.g., "news:10,newest:2,best"), scraping one page by default
+    sources = sources or os.getenv('SCRAPE_SOURCES') or DEFAULT_SOURCES
+
+    feed_sources = []
+
+    for source in sources.split(','):
+        name, _, depth = source.strip().partition(':')
+
+        if name not in SOURCE_NAMES:
+            raise ValueError('Unknown Hacker News list: ' + name)
+
+        feed_sources.append(FeedSource(name,
+            tuple(range(1, int(depth or 1) + 1))))
+
+    return feed_sources
+
+
+def get_archived_sources(page_archive):
+    # Get lists and pages that were fetched in an archived run
+    pages = {}
+
+    for page in page_archive.pages:
+        path, _, query = page.partition('?')
+        name = path.lstrip('/')
+
+        if name in SOURCE_NAMES:
+            pages.setdefault(name, []).append(int(parse_qs(query)['p'][0]))
+
+    return [FeedSource(name, tuple(sorted(pages[name])))
+        for name in SOURCE_NAMES if name in pages]
+
+
+class ScrapeSummary:
+    def __init__(self):
+        self.feed_ids = []
+        self.posts = 0
+        self.comments = 0
+        self.pages = 0
+        self.carried_posts = 0
+        self.shared_posts = 0
+        self.skipped_posts = []
+        self.failures = []
+        self.timed_out = False
+        self.wall_time = 0
+        self.write_time = 0
+
+    @property
+    def complete(self):
+        return (not self.failures and not self.timed_out and
+            not self.skipped_posts)
+
+    def add_failure(self, description, error):
+        self.failures.append((description, repr(error)))
+
+    def __str__(self):
+        if self.feed_ids:
+            feeds = (('Feed ' if len(self.feed_ids) == 1 else 'Feeds ') +
+                ', '.join(str(feed_id) for feed_id in self.feed_ids))
+        else:
+            feeds = 'Shared post pages'
+
+        summary = (feeds + f': {self.posts} posts, {self.comments} comments, '
+            f'{self.pages} pages, {len(self.failures)} failures in '
+            f'{self.wall_time:.1f}s ({self.write_time:.1f}s writing)')
+
+        if self.carried_posts:
+            summary += (f' ({self.carried_posts} posts with unchanged '
+                'comments carried forward)')
+
+        if self.shared_posts:
+            summary += (f' ({self.shared_posts} posts listed by more than '
+                'one feed scraped once)')
+
+        if self.skipped_posts:
+            summary += (f' ({len(self.skipped_posts)} lowest priority posts '
+                'skipped after time budget)')
+
+        if self.timed_out:
+            summary += ' (deadline reached)'
+
+        return summary
+
+
+class FeedScrape:
+    def __init__(self, feed_id, source, feed_loader=None, row_spool=None):
+        self.feed_id = feed_id
+        self.source = source
+
+        # Buffer scraped rows to write them in one transaction (or spool them)
+        # at end of run
+        self.loader = feed_loader or loader.FeedLoader(feed_id, row_spool)
+
+    def describe_page(self, page):
+        return self.source.name + ' page ' + str(page)
+
+
+class ScrapeRun:
+    def __init__(self, feed_id, hn_client, queue_size=None, deadline=None,
+        budget=None, feed_loader=None, parse_workers=None, parse_executor=None,
+        incremental=None, refresh_hours=None, work_queue=None,
+        row_spool=None, db_pool=None, batch_size=None,
+        max_buffered_comments=None):
+        self.hn_client = hn_client
+        self.queue_size = int(queue_size or os.getenv('SCRAPE_QUEUE_SIZE') or
+            DEFAULT_QUEUE_SIZE)
+        self.deadline = float(deadline or os.getenv('SCRAPE_DEADLINE') or
+            DEFAULT_DEADLINE)
+
+        # Stop starting post pages after budget, leaving the lowest priority
+        # ones unscraped, so the run ends well before the deadline
+        self.budget = float(budget or os.getenv('SCRAPE_BUDGET') or
+            DEFAULT_BUDGET)
+
+        # Parse pages in a pool of worker processes (or on the event loop if
+        # set to 0), unless a pool is shared between runs
+        if parse_workers is None:
+            parse_workers = (os.getenv('SCRAPE_PARSE_WORKERS') or
+                DEFAULT_PARSE_WORKERS)
+
+        self.parse_workers = int(parse_workers)
+        self.parse_executor = parse_executor
+        self.parser_name = parsers.get_parser().name
+
+        # Parse post pages on the event loop in batches of comments, and
+        # write comments once a feed has more than max_buffered_comments of
+        # them, so a long thread's comments are never all kept at once
+        self.batch_size = int(batch_size or os.getenv('SCRAPE_BATCH_SIZE') or
+            parsers.DEFAULT_BATCH_SIZE)
+        self.max_buffered_comments = int(max_buffered_comments or
+            os.getenv('SCRAPE_MAX_BUFFERED_COMMENTS') or
+            DEFAULT_MAX_BUFFERED_COMMENTS)
+
+        # Carry forward comment ranks from previous feed for posts whose
+        # comment count hasn't changed, unless their comments were last
+        # scraped more than refresh_hours before
+        if incremental is None:
+            incremental = os.getenv('SCRAPE_INCREMENTAL', '').lower() in (
+                '1', 'true', 'yes')
+
+        self.incremental = incremental
+        self.refresh_hours = float(refresh_hours or
+            os.getenv('SCRAPE_REFRESH_HOURS') or DEFAULT_REFRESH_HOURS)
+
+        # Share post pages with other scraper processes through the database
+        # if a work queue is given
+        self.work_queue = work_queue
+
+        # Save feeds' rows to a spool on disk to be written to the database
+        # later if given, unless post pages are shared, since other processes
+        # read the rows and tasks that are written for feed pages
+        self.row_spool = row_spool if work_queue is None else None
+
+        # Query and write to the database with a pool of connections, unless
+        # a pool is shared between runs
+        self.db_pool = db_pool
+
+        self.summary = ScrapeSummary()
+        self.feeds = []
+
+        # Scrape front page into feed if given, otherwise feeds are added
+        # for each list to scrape
+        if feed_id is not None:
+            self.add_feed(feed_id, FeedSource('news', FEED_PAGES), feed_loader)
+
+    def add_feed(self, feed_id, source, feed_loader=None):
+        self.feeds.append(FeedScrape(feed_id, source, feed_loader,
+            self.row_spool))
+        self.summary.feed_ids.append(feed_id)
+
+    async def run(self, pages=None):
+        self.pool = self.db_pool
+
+        if self.pool is None:
+            self.pool = await database.create_pool()
+
+        try:
+            return await self.scrape(pages)
+
+        finally:
+            if self.pool is not self.db_pool:
+                await self.pool.close()
+
+    async def scrape(self, pages=None):
+        started = time.monotonic()
+        self.budget_ends = started + self.budget
+
+        # Post pages wait in a bounded queue so feed pages can't get far ahead
+        # of the workers fetching comments, and parsed pages wait in another
+        # so fetching can't get far ahead of adding rows. Workers take the
+        # highest priority post waiting (the lowest value), then the one
+        # queued first
+        self.queue = asyncio.PriorityQueue(maxsize=self.queue_size)
+        self.queue_order = itertools.count()
+        self.persist_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        # Fetch each post's pages once per run for the first feed that lists
+        # it, however many lists it appears on
+        self.post_feeds = {}
+
+        # Claim a post page task from the work queue only when a worker is
+        # free to scrape it
+        self.worker_slots = asyncio.Semaphore(self.hn_client.concurrency)
+
+        self.executor = self.parse_executor
+
+        if self.executor is None and self.parse_workers:
+            self.executor = parsers.create_parse_executor(self.parse_workers)
+
+        try:
+            async with asyncio.timeout(self.deadline):
+                async with asyncio.TaskGroup() as task_group:
+                    persister = task_group.create_task(self.persist())
+                    workers = [task_group.create_task(self.work())
+                        for _ in range(self.hn_client.concurrency)]
+
+                    # Every list's pages share the client's concurrency
+                    # limit and the workers fetching post pages
+                    await asyncio.gather(*(self.scrape_feed_page(feed, page)
+                        for feed in self.feeds
+                        for page in pages or feed.source.pages))
+
+                    # Once feed pages' rows and tasks are written, scrape
+                    # post pages claimed from the work queue until the
+                    # scrape's tasks are finished
+                    if self.work_queue is not None:
+                        await self.persist_queue.join()
+                        await self.claim_tasks()
+
+                    # Wait for queued post pages to finish, then stop workers
+                    await self.queue.join()
+
+                    for worker in workers:
+                        worker.cancel()
+
+                    # Wait for parsed pages to be added to feeds' rows
+                    await self.persist_queue.join()
+
+                    persister.cancel()
+
+        except TimeoutError:
+            self.summary.timed_out = True
+
+        finally:
+            if self.executor is not self.parse_executor:
+                self.executor.shutdown(cancel_futures=True)
+
+        # Add rows from pages parsed before the deadline
+        while not self.persist_queue.empty():
+            await self.add_rows(*self.persist_queue.get_nowait())
+
+        # Write every row scraped for each feed in one transaction, or save
+        # them to spool, rolling up the run's feeds with the last feed's rows,
+        # once comment ranks each feed shares with the others are copied
+        writing = time.monotonic()
+
+        for feed in self.feeds:
+            if feed is self.feeds[-1]:
+                feed.loader.roll_up([run_feed.feed_id
+                    for run_feed in self.feeds])
+
+            await feed.loader.flush_async(self.pool)
+
+        if self.work_queue is not None and self.feeds:
+            await asyncio.to_thread(self.work_queue.clear,
+                [feed.feed_id for feed in self.feeds])
+
+        self.summary.write_time = time.monotonic() - writing
+        self.summary.wall_time = time.monotonic() - started
+
+        return self.summary
+
+    async def parse(self, parse_page, content, *args):
+        if self.executor is None:
+            return parse_page(content, self.parser_name, *args)
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, parse_page, content, self.parser_name, *args)
+
+    async def scrape_feed_page(self, feed, page):
+        description = feed.describe_page(page)
+
+        print('Scrape initiated for ' + description + ' of Hacker News.')
+
+        try:
+            now = self.hn_client.now()
+            feed_content = await self.hn_client.fetch_feed_page(page,
+                feed.source.name)
+            posts = await self.parse(parsers.parse_feed_page, feed_content)
+
+        except Exception as error:
+            self.summary.add_failure(description, error)
+            return
+
+        self.summary.pages += 1
+        self.summary.posts += len(posts)
+
+        carried_post_ids = set()
+
+        if self.incremental:
+            try:
+                previous_feed_id, carried_post_ids = await asyncio.to_thread(
+                    get_unchanged_posts, feed.feed_id, posts,
+                    self.refresh_hours)
+
+            except Exception as error:
+                self.summary.add_failure(description + ' comment counts',
+                    error)
+
+            for post_id in carried_post_ids:
+                feed.loader.carry_forward_comments(previous_feed_id, post_id)
+
+            self.summary.carried_posts += len(carried_post_ids)
+
+        new_posts = []
+        shared_post_feeds = []
+
+        for post in posts:
+            if post.id in carried_post_ids:
+                continue
+
+            if post.id not in self.post_feeds:
+                self.post_feeds[post.id] = feed
+                new_posts.append(post)
+
+            # Copy comment ranks of a post scraped for another feed once
+            # that feed's rows are written
+            elif self.post_feeds[post.id] is not feed:
+                shared_post_feeds.append((post.id, self.post_feeds[post.id]))
+                self.summary.shared_posts += 1
+
+        # Scrape top-ranked posts and posts gaining the most comments first
+        priorities = await self.get_priorities(feed, new_posts)
+        new_posts.sort(key=lambda post: priorities[post.id])
+
+        if self.work_queue is not None:
+            await self.persist_queue.put((description, functools.partial(
+                self.publish_feed_rows, feed, posts, now, carried_post_ids,
+                new_posts, shared_post_feeds)))
+            return
+
+        await self.persist_queue.put((description, functools.partial(
+            add_feed_rows, posts, feed.loader, now, carried_post_ids,
+            self.pool)))
+
+        for post_id, post_feed in shared_post_feeds:
+            post_feed.loader.share_comments(feed.feed_id, post_id)
+
+        for post in new_posts:
+            await self.queue.put((priorities[post.id], next(self.queue_order),
+                feed, post.id, post.comment_count, None))
+
+    async def get_priorities(self, feed, posts):
+        query = database.get_previous_comment_counts(self.pool, feed.feed_id,
+            [post.id for post in posts])
+
+        # Order posts by rank alone if the database can't be reached or is
+        # too slow to answer, as for other queries made while scraping
+        try:
+            previous_comment_counts = await query_or_spool(feed.loader,
+                query, {})
+
+        except database.CONNECTION_ERRORS:
+            previous_comment_counts = {}
+
+        return {post.id: get_priority(post,
+            previous_comment_counts.get(post.id)) for post in posts}
+
+    async def publish_feed_rows(self, feed, posts, now, carried_post_ids,
+        new_posts, shared_post_feeds):
+        # Write feed page's rows before adding tasks for its posts, so post
+        # pages claimed by other processes can refer to them
+        await add_feed_rows(posts, feed.loader, now, carried_post_ids,
+            self.pool)
+        await feed.loader.flush_async(self.pool)
+
+        # Run work queue's queries in a thread, so they don't block the event
+        # loop while other pages are being fetched
+        await asyncio.to_thread(self.work_queue.enqueue, feed.feed_id,
+            new_posts)
+
+        for post_id, post_feed in shared_post_feeds:
+            await asyncio.to_thread(self.work_queue.share, post_feed.feed_id,
+                post_id, feed.feed_id)
+
+    async def claim_tasks(self):
+        # Wait for this scrape's feeds, or for every running scrape if this
+        # process is only helping with post pages
+        feed_ids = [feed.feed_id for feed in self.feeds] or None
+
+        while True:
+            # Once time budget is spent, stop claiming tasks and give up this
+            # scrape's unclaimed ones, while running ones are finished
+            if time.monotonic() >= self.budget_ends:
+                if feed_ids is None:
+                    return
+
+                self.summary.skipped_posts.extend(await asyncio.to_thread(
+                    self.work_queue.skip, feed_ids))
+
+            else:
+                await self.worker_slots.acquire()
+
+                tasks = await asyncio.to_thread(self.work_queue.claim)
+
+                # Scrape claimed tasks ahead of any other post pages
+                if tasks:
+                    task = tasks[0]
+
+                    await self.queue.put((0, next(self.queue_order),
+                        FeedScrape(task.feed_id, None), task.post_id,
+                        task.comment_count, task))
+                    continue
+
+                self.worker_slots.release()
+
+            remaining = await asyncio.to_thread(self.work_queue.remaining,
+                feed_ids)
+
+            if remaining == 0 and (feed_ids is not None or
+                not await asyncio.to_thread(coordination.is_scrape_running)):
+                    return
+
+            await asyncio.sleep(self.work_queue.poll_interval)
+
+    async def work(self):
+        while True:
+            _, _, feed, post_id, comment_count, task = await self.queue.get()
+
+            try:
+                # Leave post pages still waiting once time budget is spent,
+                # which are the lowest priority ones
+                if task is None and time.monotonic() >= self.budget_ends:
+                    self.summary.skipped_posts.append(post_id)
+                    feed.loader.skip_comments(post_id)
+                    continue
+
+                error = await self.scrape_post_pages(feed, post_id,
+                    comment_count)
+
+                # Write rows of post claimed from work queue once its pages
+                # are added, then finish its task
+                if task is not None:
+                    await self.persist_queue.put(('post ' + post_id + ' task',
+                        functools.partial(self.finish_task, feed.loader, task,
+                        error)))
+
+                # Don't carry forward comments of a post whose pages failed
+                elif error is not None:
+                    feed.loader.skip_comments(post_id)
+
+            finally:
+                if task is not None:
+                    self.worker_slots.release()
+
+                self.queue.task_done()
+
+    async def finish_task(self, feed_loader, task, error):
+        await feed_loader.flush_async(self.pool)
+
+        await asyncio.to_thread(self.work_queue.complete, task, error)
+
+    async def fetch_post_page(self, post_id, page_number):
+        now = self.hn_client.now()
+        post_content = await self.hn_client.fetch_post_page(post_id,
+            page_number)
+
+        # Parse page in batches in a worker process, or on the event loop as
+        # they are added
+        if self.executor is not None:
+            batches = await self.parse(parsers.parse_post_page_batches,
+                post_content, self.batch_size)
+        else:
+            batches = parsers.iter_post_page(post_content, self.parser_name,
+                self.batch_size)
+
+        return now, batches
+
+    async def scrape_post_pages(self, feed, post_id, comment_count=0):
+        page_number = None
+        parents = []
+        first_rank = 1
+        prefetched = {}
+
+        try:
+            # Follow "More" links until the post's last page of comments
+            while True:
+                description = ('post ' + str(post_id) + ' page ' +
+                    str(page_number or 1))
+
+                try:
+                    if page_number in prefetched:
+                        now, batches = await prefetched.pop(page_number)
+                    else:
+                        now, batches = await self.fetch_post_page(post_id,
+                            page_number)
+
+                    page_comment_count = 0
+
+                    # A post's pages (and their batches of comments) are
+                    # added in order, so they share the comment tree's
+                    # parents and continue its ranks
+                    for comments, next_page_number in batches:
+                        await self.persist_queue.put((description,
+                            functools.partial(self.add_post_rows, feed,
+                            post_id, comments, parents, now, first_rank)))
+
+                        first_rank += len(comments)
+                        page_comment_count += len(comments)
+                        self.summary.comments += len(comments)
+
+                except Exception as error:
+                    self.summary.add_failure(description, error)
+                    return repr(error)
+
+                self.summary.pages += 1
+
+                if next_page_number is None:
+                    print('Post ' + str(post_id) + ' and its comments scraped')
+                    return
+
+                # Fetch the pages that the rest of the post's comments are
+                # estimated to fill at once, rather than learning of each
+                # page from the one before it
+                if next_page_number not in prefetched:
+                    page_count = max(1, math.ceil((comment_count - first_rank +
+                        1) / max(page_comment_count, 1)))
+
+                    for number in range(int(next_page_number),
+                        int(next_page_number) + page_count):
+                            prefetched[str(number)] = asyncio.ensure_future(
+                                self.fetch_post_page(post_id, str(number)))
+
+                page_number = next_page_number
+
+        finally:
+            # Drop pages fetched past the post's last page
+            for task in prefetched.values():
+                if task.done() and not task.cancelled():
+                    task.exception()
+                else:
+                    task.cancel()
+
+    async def add_post_rows(self, feed, post_id, comments, parents, now,
+        first_rank):
+        await add_post_rows(post_id, comments, parents, feed.loader, now,
+            first_rank, self.pool)
+
+        if len(feed.loader.comments) >= self.max_buffered_comments:
+            await feed.loader.flush_comments_async(self.pool)
+
+    async def persist(self):
+        while True:
+            description, add_page_rows = await self.persist_queue.get()
+
+            try:
+                await self.add_rows(description, add_page_rows)
+
+            finally:
+                self.persist_queue.task_done()
+
+    async def add_rows(self, description, add_page_rows):
+        try:
+            await add_page_rows()
+
+        except Exception as error:
+            self.summary.add_failure(description, error)
+
+
+async def find_existing_ids(feed_loader, model, ids, db_pool=None):
+    # Query with a connection from the pool if given, without blocking the
+    # event loop, or with a session in a thread
+    if db_pool is not None:
+        query = database.get_existing_ids(db_pool, model.__tablename__, ids)
+    else:
+        query = asyncio.to_thread(query_session, get_existing_ids, model, ids)
+
+    # Rows are skipped when spooled rows are written if they are already in
+    # the database, so spool every row if it can't be reached
+    return await query_or_spool(feed_loader, query, set())
+
+
+async def find_content_hashes(feed_loader, comment_ids, db_pool=None):
+    if db_pool is not None:
+        query = database.get_content_hashes(db_pool, comment_ids)
+    else:
+        query = asyncio.to_thread(query_session, get_content_hashes,
+            comment_ids)
+
+    # Spool every comment if database can't be reached, as for other rows
+    return await query_or_spool(feed_loader, query, {})
+
+
+def query_session(get_rows, *args):
+    # Connect to database
+    session = models.Session()
+
+    try:
+        return get_rows(session, *args)
+
+    finally:
+        session.close()
+
+
+async def query_or_spool(feed_loader, query, unavailable):
+    if feed_loader.row_spool is None:
+        return await query
+
+    # Treat a database too slow to answer like one that can't be reached,
+    # rather than holding up the scrape waiting for it
+    try:
+        return await asyncio.wait_for(query,
+            feed_loader.row_spool.query_timeout)
+
+    except (TimeoutError, OperationalError, *database.CONNECTION_ERRORS):
+        return unavailable
+
+
+def get_priority(post, previous_comment_count=None):
+    # Rank posts by position in feed, moving them ahead by the number of
+    # comments they gained since the previous feed (all of them if they
+    # weren't in it)
+    growth = max(post.comment_count - (previous_comment_count or 0), 0)
+
+    return post.feed_rank / (1 + growth)
+
+
+def get_existing_ids(session, model, ids):
+    # Return the given ids (as strings, the way they are scraped from the page)
+    # that are already stored for model, using a single set-based query
+    if not ids:
+        return set()
+
+    rows = session.query(model.id).filter(
+        model.id.in_([int(row_id) for row_id in ids])).all()
+
+    return {str(row.id) for row in rows}
+
+
+def get_content_hashes(session, comment_ids):
+    # Return content hashes of the given comments that are already stored, by
+    # id as a string
+    if not comment_ids:
+        return {}
+
+    comment_ids = [int(comment_id) for comment_id in comment_ids]
+    rows = session.query(models.Comment.id,
+        models.Comment.content_hash).filter(
+            models.Comment.id.in_(comment_ids)).all()
+
+    return {str(row.id): row.content_hash for row in rows}
+
+
+def get_content_hash(content):
+    # Hash content the way the loader hashes stored comments
+    return hashlib.md5(content.encode('utf-8')).digest()
+
+
+def get_created(age, now):
+    # Get UTC timestamp for posting time by subtracting the number of
+    # days/hours/minutes ago given on the webpage from the current UTC
+    # timestamp
+    count, time_unit = age.split()[:2]
+
+    if 'day' in time_unit:
+        created = now - 86400 * int(count)
+
+    elif 'hour' in time_unit:
+        created = now - 3600 * int(count)
+
+    else:
+        created = now - 60 * int(count)
+
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(created))
+
+
+def add_feeds(sources, created=None):
+    # Connect to database
+    session = models.Session()
+
+    # Add a feed to database for each list, at the time given if any
+    new_feeds = [models.Feed(source=source.name) for source in sources]
+
+    for new_feed in new_feeds:
+        if created is not None:
+            new_feed.created = created
+
+    # Make sure feed and comment rows of the feeds' month have a partition
+    partitions.add_feed_partitions(session.connection(), created)
+
+    session.add_all(new_feeds)
+
+    session.commit()
+
+    feed_ids = [new_feed.id for new_feed in new_feeds]
+
+    session.close()
+
+    return feed_ids
+
+
+def describe_sources(sources):
+    return ', '.join(source.name + ' (' + str(len(source.pages)) +
+        (' page)' if len(source.pages) == 1 else ' pages)')
+        for source in sources)
+
+
+def scrape_loop(sources=None):
+    sources = get_sources(sources)
+
+    # Share post pages with other scraper processes if enabled
+    if coordination.is_enabled():
+        work_queue = coordination.WorkQueue()
+    else:
+        work_queue = None
+
+    # Scrape feeds in one process at a time, helping with the running
+    # scrape's post pages instead if they are shared
+    with coordination.scrape_lock() as acquired:
+        if not acquired and work_queue is None:
+            print('Scrape not started, since another scrape is running.')
+
+            return None
+
+        if not acquired:
+            print('Another scrape is running, so scraping its post pages.')
+
+            return help_scrape(work_queue)
+
+        feed_ids = add_feeds(sources)
+
+        # Scrape every list's pages asynchronously, saving their rows to a
+        # spool if one is set
+        row_spool = spool.get_row_spool()
+
+        summary = asyncio.run(scrape_feeds(zip(feed_ids, sources),
+            work_queue, row_spool))
+
+    report_scrape(sources, summary)
+
+    # Write spooled rows of this scrape and any earlier ones to database
+    if row_spool is not None:
+        drain_spool(row_spool)
+
+    return summary
+
+
+def help_scrape(work_queue):
+    summary = asyncio.run(scrape_feeds([], work_queue))
+
+    print('Post pages scraped for other scrapes. ' + str(summary))
+
+    for description, error in summary.failures:
+        print('Scrape failed for ' + description + ': ' + error)
+
+    return summary
+
+
+def scrape_worker():
+    work_queue = coordination.WorkQueue()
+
+    print('Scrape worker started, scraping post pages shared by scrapes.')
+
+    # Keep scraping post pages that scrapes add to the work queue
+    while True:
+        if work_queue.remaining() or coordination.is_scrape_running():
+            help_scrape(work_queue)
+
+        time.sleep(work_queue.poll_interval)
+
+
+def report_scrape(sources, summary):
+    print('Scrape completed for ' + describe_sources(sources) +
+        ' of Hacker News. ' + str(summary))
+
+    for description, error in summary.failures:
+        print('Scrape failed for ' + description + ': ' + error)
+
+    if summary.skipped_posts:
+        print('Comments not scraped after time budget for posts: ' +
+            ', '.join(summary.skipped_posts))
+
+
+def drain_spool(row_spool):
+    try:
+        drained = row_spool.drain()
+
+    except Exception as error:
+        print('Spooled rows not written to database, so they will be written '
+            'after the next scrape: ' + repr(error))
+
+        return None
+
+    if drained is None:
+        print('Spooled rows are already being written to database.')
+    elif drained:
+        print('Spooled rows written to database in ' + str(drained) +
+            ' batches.')
+
+    return drained
+
+
+def scrape_daemon(interval=None, runs=None):
+    interval = float(interval or os.getenv('SCRAPE_INTERVAL') or
+        DEFAULT_INTERVAL)
+
+    if interval <= 0:
+        raise ValueError('Scrape interval must be a positive number of '
+            'seconds')
+
+    print('Scrape daemon started, scraping Hacker News every ' +
+        str(interval) + 's.')
+
+    return asyncio.run(run_daemon(interval, runs))
+
+
+async def run_daemon(interval, runs=None):
+    summaries = []
+    scrapes = 0
+
+    # Finish the current scrape before stopping when asked to terminate
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+
+    archive_directory = os.getenv('SCRAPE_ARCHIVE_DIR')
+    parse_workers = int(os.getenv('SCRAPE_PARSE_WORKERS') or
+        DEFAULT_PARSE_WORKERS)
+
+    if coordination.is_enabled():
+        work_queue = coordination.WorkQueue()
+    else:
+        work_queue = None
+
+    # Write spooled rows to database in a thread while the next scrape runs
+    # or waits
+    row_spool = spool.get_row_spool()
+    draining = None
+
+    # Keep one parse worker pool, HTTP client (and its connection pool) and
+    # database connection pool for every scrape, rather than starting them
+    # for each one
+    if parse_workers:
+        parse_executor = parsers.create_parse_executor(parse_workers)
+    else:
+        parse_executor = None
+
+    db_pool = await database.create_pool()
+
+    try:
+        async with client.HackerNewsClient() as hn_client:
+            scheduled = time.monotonic()
+
+            while not stop.is_set():
+                lag = time.monotonic() - scheduled
+
+                # Report a scrape that failed, such as when database is
+                # unavailable, and carry on with the next scheduled one,
+                # rather than stopping the daemon
+                try:
+                    # Leave scheduled scrape to another process if one is
+                    # already scraping
+                    with coordination.scrape_lock() as acquired:
+                        if acquired:
+                            sources = get_sources()
+                            feed_ids = add_feeds(sources)
+
+                            if archive_directory:
+                                hn_client.page_archive = archive.PageArchive(
+                                    archive_directory)
+
+                            scrape_run = ScrapeRun(None, hn_client,
+                                parse_executor=parse_executor,
+                                work_queue=work_queue, row_spool=row_spool,
+                                db_pool=db_pool)
+
+                            for feed_id, source in zip(feed_ids, sources):
+                                scrape_run.add_feed(feed_id, source)
+
+                            summary = await scrape_run.run()
+
+                except Exception as error:
+                    print('Scheduled scrape failed, so the next scheduled '
+                        'scrape will be run: ' + repr(error))
+
+                else:
+                    if acquired:
+                        report_scrape(sources, summary)
+                        print(f'Scrape started {lag:.1f}s after its '
+                            'scheduled time.')
+
+                        summaries.append(summary)
+
+                        if row_spool is not None and (draining is None or
+                            draining.done()):
+                                draining = asyncio.create_task(
+                                    asyncio.to_thread(drain_spool, row_spool))
+
+                    else:
+                        print('Scheduled scrape skipped, since another scrape '
+                            'is running.')
+
+                scrapes += 1
+
+                if runs is not None and scrapes >= runs:
+                    break
+
+                # Schedule next scrape for the first interval after this one
+                # started that hasn't passed yet, skipping scrapes that would
+                # have overlapped this one
+                scheduled += interval
+                skipped = 0
+
+                while scheduled < time.monotonic():
+                    scheduled += interval
+                    skipped += 1
+
+                if skipped:
+                    print('Skipped ' + str(skipped) + ' scheduled scrapes '
+                        'while the previous scrape was still running.')
+
+                try:
+                    await asyncio.wait_for(stop.wait(),
+                        scheduled - time.monotonic())
+
+                except TimeoutError:
+                    pass
+
+    finally:
+        if draining is not None:
+            await draining
+
+        await db_pool.close()
+
+        if parse_executor is not None:
+            parse_executor.shutdown()
+
+    return summaries
+
+
+async def scrape_feeds(feeds, work_queue=None, row_spool=None):
+    # Save fetched pages to archive if an archive directory is set
+    archive_directory = os.getenv('SCRAPE_ARCHIVE_DIR')
+
+    if archive_directory:
+        page_archive = archive.PageArchive(archive_directory)
+    else:
+        page_archive = None
+
+    # Share one HTTP client (and its connection pool) across every page and
+    # post fetched for the feeds
+    async with client.HackerNewsClient(
+        page_archive=page_archive) as hn_client:
+            scrape_run = ScrapeRun(None, hn_client, work_queue=work_queue,
+                row_spool=row_spool)
+
+            for feed_id, source in feeds:
+                scrape_run.add_feed(feed_id, source)
+
+            return await scrape_run.run()
+
+
+def replay_loop(directory, runs=None):
+    summaries = []
+
+    # Re-process every archived run (or the given runs) in order, without
+    # fetching pages from Hacker News
+    for run in runs or archive.list_runs(directory):
+        page_archive = archive.PageArchive(directory, run)
+        sources = get_archived_sources(page_archive)
+
+        # Add feeds to database with time run was scraped
+        feed_ids = add_feeds(sources, datetime.fromtimestamp(
+            page_archive.started, timezone.utc).replace(tzinfo=None))
+
+        summary = asyncio.run(replay_feeds(zip(feed_ids, sources),
+            page_archive))
+
+        print('Replay completed for archived run ' + run + '. ' +
+            str(summary))
+
+        for description, error in summary.failures:
+            print('Replay failed for ' + description + ': ' + error)
+
+        summaries.append(summary)
+
+    return summaries
+
+
+async def replay_feeds(feeds, page_archive):
+    async with archive.ArchiveClient(page_archive) as hn_client:
+        scrape_run = ScrapeRun(None, hn_client)
+
+        for feed_id, source in feeds:
+            scrape_run.add_feed(feed_id, source)
+
+        return await scrape_run.run()
+
+
+def get_unchanged_posts(feed_id, posts, refresh_hours):
+    # Connect to database
+    session = models.Session()
+
+    try:
+        feed = session.get(models.Feed, feed_id)
+
+        previous_feed = session.query(models.Feed).filter(
+            models.Feed.source == feed.source,
+            models.Feed.id < feed_id).order_by(models.Feed.id.desc()).first()
+
+        if previous_feed is None or not posts:
+            return None, set()
+
+        post_ids = [int(post.id) for post in posts]
+
+        # Get last feed that each post's comments were scraped in (rather
+        # than carried forward or skipped)
+        last_scraped = session.query(models.FeedPost.post_id,
+            func.max(models.Feed.created).label('created')).join(
+            models.Feed, models.Feed.id == models.FeedPost.feed_id).filter(
+            models.FeedPost.post_id.in_(post_ids),
+            models.FeedPost.comments_carried.is_(False),
+            models.FeedPost.comments_skipped.is_(False)).group_by(
+            models.FeedPost.post_id).subquery()
+
+        # Get comment counts of posts in previous feed whose comments were
+        # scraped recently enough, and weren't skipped in that feed
+        rows = session.query(models.FeedPost.post_id,
+            models.FeedPost.comment_count).join(last_scraped,
+            last_scraped.c.post_id == models.FeedPost.post_id).filter(
+            models.FeedPost.feed_id == previous_feed.id,
+            models.FeedPost.post_id.in_(post_ids),
+            models.FeedPost.comments_skipped.is_(False),
+            last_scraped.c.created >= feed.created - timedelta(
+                hours=refresh_hours)).all()
+
+    finally:
+        session.close()
+
+    previous_comment_counts = {str(row.post_id): row.comment_count
+        for row in rows}
+
+    return previous_feed.id, {post.id for post in posts
+        if previous_comment_counts.get(post.id) == post.comment_count}
+
+
+async def add_feed_rows(posts, feed_loader, now, carried_post_ids=(),
+    db_pool=None):
+    post_ids = []
+
+    # Check which posts exist in database with one query for the whole page
+    existing_post_ids = await find_existing_ids(feed_loader, models.Post,
+        [post.id for post in posts], db_pool)
+
+    for post in posts:
+        post_id = post.id
+
+        # Add core post data if it is not in database already
+        if post_id not in existing_post_ids:
+            # Set post's type based on title
+            if 'Show HN:' in post.title:
+                type = 'show'
+            elif 'Ask HN:' in post.title:
+                type = 'ask'
+            else:
+                type = 'article'
+
+            # Add post data to feed's rows to load into database
+            feed_loader.add_post(post_id, get_created(post.age, now),
+                post.link, post.title, type, post.username, post.website)
+
+        # Add feed-based post data to feed's rows to load into database
+        # (job postings have no score)
+        feed_loader.add_feed_post(post_id, post.comment_count,
+            post.feed_rank, post.point_count or 0,
+            post_id in carried_post_ids)
+
+        post_ids.append(post_id)
+
+    return post_ids
+
+
+async def add_post_rows(post_id, comments, parents, feed_loader, now,
+    first_rank=1, db_pool=None):
+    # Check which comments exist in database, and their content hashes, with
+    # one query for the whole page
+    content_hashes = await find_content_hashes(feed_loader,
+        [comment.id for comment in comments], db_pool)
+
+    # Set starting comment feed rank to the one before the page's first
+    # comment (0 on the post's first page)
+    comment_feed_rank = first_rank - 1
+
+    for comment in comments:
+        comment_id = comment.id
+        level = comment.level
+
+        # Comments are listed depth-first, so comment's parent is the latest
+        # comment one level up in the tree (blank for top-level comments)
+        if 0 < level <= len(parents):
+            parent_comment = parents[level - 1]
+        else:
+            parent_comment = None
+
+        # Make comment the latest one at its level for the comments after it
+        del parents[level:]
+        parents.extend([None] * (level - len(parents)))
+        parents.append(int(comment_id))
+
+        # Add core comment data if it is not in database already
+        if comment_id not in content_hashes:
+            feed_loader.add_comment(comment_id, comment.content,
+                get_created(comment.age, now), level, parent_comment,
+                post_id, comment.total_word_count, comment.username)
+
+        # Rewrite comment if it was edited, flagged or deleted since it was
+        # stored, comparing hashes rather than stored content (or if it isn't
+        # hashed yet, which stores its hash)
+        elif content_hashes[comment_id] != get_content_hash(comment.content):
+            feed_loader.update_comment(comment_id, comment.content,
+                comment.total_word_count)
+
+        # Increment comment feed rank to get current comment's rank
+        comment_feed_rank += 1
+
+        # Add feed-based comment data to feed's rows to load into database
+        feed_loader.add_feed_comment(comment_id, comment_feed_rank)
+
+
+async def scrape_page(page, feed_id, hn_client, feed_loader=None):
+    # Buffer rows with a loader of its own if page is not being scraped as
+    # part of a feed
+    standalone = feed_loader is None
+
+    if standalone:
+        feed_loader = loader.FeedLoader(feed_id)
+
+    print('Scrape initiated for page ' + str(page) + ' of Hacker News.')
+
+    # Get current UTC time in seconds
+    now = hn_client.now()
+
+    # Get post records from feed page
+    feed_content = await hn_client.fetch_feed_page(page)
+
+    post_ids = await add_feed_rows(parsers.parse_feed_page(feed_content),
+        feed_loader, now)
+
+    # Write rows now if page is not being scraped as part of a feed
+    if standalone:
+        feed_loader.flush()
+
+    # Return post ids so their pages can be queued for comment scraping
+    return post_ids
+
+
+async def scrape_post(post_id, feed_id, hn_client, page_number, parents=None,
+    feed_loader=None):
+    # Keep latest comment id at each level of the comment tree, carried over
+    # from the post's previous page of comments if given
+    if parents is None:
+        parents = []
+
+    # Buffer rows with a loader of its own if post page is not being scraped
+    # as part of a feed
+    standalone = feed_loader is None
+
+    if standalone:
+        feed_loader = loader.FeedLoader(feed_id)
+
+    # Get current UTC time in seconds
+    now = hn_client.now()
+
+    # Get comment records from post's webpage, specifying page number if
+    # given
+    post_content = await hn_client.fetch_post_page(post_id, page_number)
+
+    comments, next_page_number = parsers.parse_post_page(post_content)
+
+    await add_post_rows(post_id, comments, parents, feed_loader, now)
+
+    # Write rows now if post page is not being scraped as part of a feed
+    if standalone:
+        feed_loader.flush()
+
+    # Print message if there are no more pages of comments to scrape
+    if next_page_number is None:
+        print('Post ' + str(post_id) + ' and its comments scraped')
+
+    return len(comments), next_page_number
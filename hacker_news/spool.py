@@ -0,0 +1,105 @@
+import fcntl
+import json
+import os
+import time
+
+from hacker_news import loader
+
+DEFAULT_QUERY_TIMEOUT = 5
+
+
+# Save rows scraped for the database as batches of JSON lines on local disk,
+# one line per table's rows or feed's copied comment ranks, and write them to
+# the database later, so scraping doesn't wait for (or lose rows to) a slow
+# or unavailable database:
+#   00001525170600000000000-1234-1.jsonl
+# Batches are written to a temporary file and renamed into place, so a partly
+# written batch is never read, and are named by the time they were saved, so
+# they are written to the database in that order. Rows that are already in the
+# database are skipped when loaded, so a batch that was written but not
+# removed before a crash is written again without duplicating rows. Queries
+# made while scraping (which rows are already stored) give up after
+# query_timeout seconds, and rows are spooled as if the database was
+# unavailable.
+class RowSpool:
+    def __init__(self, directory, query_timeout=None):
+        self.directory = directory
+        self.batch_count = 0
+        self.query_timeout = float(query_timeout or
+            os.getenv('SCRAPE_SPOOL_QUERY_TIMEOUT') or DEFAULT_QUERY_TIMEOUT)
+
+    def add_batch(self, rows, copied_comments):
+        lines = [json.dumps({'table': table, 'rows': list(table_rows)},
+            default=str) for table, table_rows in rows.items() if table_rows]
+        lines.extend(json.dumps({'copied_comments': copy})
+            for copy in copied_comments)
+
+        if not lines:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.batch_count += 1
+        path = os.path.join(self.directory, f'{time.time_ns():023d}-'
+            f'{os.getpid()}-{self.batch_count}.jsonl')
+
+        # Make sure batch is on disk before it can be written to the database
+        with open(path + '.tmp', 'w') as batch_file:
+            batch_file.write('\n'.join(lines) + '\n')
+            batch_file.flush()
+            os.fsync(batch_file.fileno())
+
+        os.replace(path + '.tmp', path)
+
+    def list_batches(self):
+        if not os.path.isdir(self.directory):
+            return []
+
+        return sorted(name for name in os.listdir(self.directory)
+            if name.endswith('.jsonl'))
+
+    def read_batch(self, name):
+        rows = {}
+        copied_comments = []
+
+        with open(os.path.join(self.directory, name)) as batch_file:
+            for line in batch_file:
+                entry = json.loads(line)
+
+                if 'table' in entry:
+                    rows.setdefault(entry['table'], []).extend(entry['rows'])
+                else:
+                    copied_comments.append(entry['copied_comments'])
+
+        return rows, copied_comments
+
+    def drain(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Write batches to database from one process (or thread) at a time,
+        # leaving them to the one already writing them
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+            except BlockingIOError:
+                return None
+
+            # Write each batch in one transaction, removing it once it is
+            # committed and stopping at the first one that can't be written
+            drained = 0
+
+            for name in self.list_batches():
+                loader.write_rows(*self.read_batch(name))
+                os.remove(os.path.join(self.directory, name))
+
+                drained += 1
+
+            return drained
+
+
+def get_row_spool():
+    # Spool rows if a spool directory is set
+    directory = os.getenv('SCRAPE_SPOOL_DIR')
+
+    return RowSpool(directory) if directory else None
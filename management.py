@@ -10,7 +10,7 @@ from crontab import CronTab
 from datetime import datetime
 from sqlalchemy import text
 
-from hacker_news import hacker_news, models
+from hacker_news import loader, models, scraper, spool
 
 
 def initialize_database():
@@ -64,6 +64,49 @@ def initialize_database():
     return
 
 
+def backfill_feed_rollups(batch_size=100):
+    # Connect to database
+    session = models.Session()
+
+    # Roll up feeds that have no rollup yet (ones scraped before rollups were
+    # written), a batch of consecutive feeds per transaction
+    rolled_up = 0
+
+    try:
+        while True:
+            feed_ids = session.execute(
+                text("""
+                  SELECT feed.id
+                    FROM feed
+                   WHERE NOT EXISTS (SELECT 1
+                                       FROM feed_rollup
+                                      WHERE feed_rollup.feed_id = feed.id)
+                ORDER BY feed.id
+                   LIMIT :batch_size;
+                """),
+                {'batch_size': batch_size}
+                ).scalars().all()
+
+            if not feed_ids:
+                break
+
+            loader.roll_up_feeds(session.connection(), feed_ids)
+
+            session.commit()
+
+            rolled_up += len(feed_ids)
+
+            print('Rolled up feeds ' + str(feed_ids[0]) + ' to ' +
+                str(feed_ids[-1]) + '.')
+
+    finally:
+        session.close()
+
+    print('Feed rollups backfilled for ' + str(rolled_up) + ' feeds.')
+
+    return rolled_up
+
+
 def schedule_hourly_scrape():
     # Initiate CronTab instance for current user
     user = getpass.getuser()
@@ -162,11 +205,27 @@ def main():
             'init_db',
             'sched_scrape',
             'scrape_hn',
+            'scrape_daemon',
+            'scrape_worker',
             'backup_db',
             'sched_backup',
+            'replay',
+            'drain_spool',
+            'backfill_rollups',
         ],
         help='management action to run',
     )
+    parser.add_argument(
+        '--run',
+        action='append',
+        help='archived scrape run to replay (defaults to every run)',
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        help='seconds between the starts of daemon scrapes (defaults to '
+        'SCRAPE_INTERVAL or 3600)',
+    )
     args = parser.parse_args()
 
     if args.action == 'init_db':
@@ -174,11 +233,21 @@ def main():
     elif args.action == 'sched_scrape':
         schedule_hourly_scrape()
     elif args.action == 'scrape_hn':
-        hacker_news.scrape_loop()
+        scraper.scrape_loop()
+    elif args.action == 'scrape_daemon':
+        scraper.scrape_daemon(args.interval)
+    elif args.action == 'scrape_worker':
+        scraper.scrape_worker()
     elif args.action == 'backup_db':
         backup_database()
     elif args.action == 'sched_backup':
         schedule_weekly_backup()
+    elif args.action == 'replay':
+        scraper.replay_loop(os.environ['SCRAPE_ARCHIVE_DIR'], args.run)
+    elif args.action == 'drain_spool':
+        scraper.drain_spool(spool.RowSpool(os.environ['SCRAPE_SPOOL_DIR']))
+    elif args.action == 'backfill_rollups':
+        backfill_feed_rollups()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import text
+from unittest import mock
+
+from hacker_news import archive, client, models, scraper
+from utils.tests import FIXTURES_DIR, FixtureServer, HackerNewsTestCase
+
+
+class PageArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_stores_identical_pages_once(self):
+        page_archive = archive.PageArchive(self.directory.name,
+            '20180501T103000Z')
+        page_archive.add_page('/item?id=1', b'<html>same</html>')
+        page_archive.add_page('/item?id=2', b'<html>same</html>')
+        page_archive.add_page('/news?p=1', b'<html>feed</html>')
+
+        objects = [name for _, _, names in os.walk(os.path.join(
+            self.directory.name, 'objects')) for name in names]
+
+        self.assertEqual(len(objects), 2)
+        self.assertEqual(page_archive.get_page('/item?id=2'),
+            b'<html>same</html>')
+        self.assertIsNone(page_archive.get_page('/item?id=3'))
+
+    def test_reads_run_manifest(self):
+        archive.PageArchive(self.directory.name, '20180501T103000Z').add_page(
+            '/news?p=1', b'<html>feed</html>')
+
+        page_archive = archive.PageArchive(self.directory.name,
+            '20180501T103000Z')
+
+        self.assertEqual(archive.list_runs(self.directory.name),
+            ['20180501T103000Z'])
+        self.assertEqual(page_archive.started, 1525170600)
+        self.assertEqual(page_archive.get_page('/news?p=1'),
+            b'<html>feed</html>')
+
+
+class ReplayTest(HackerNewsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        # Start new feeds after sample feeds, which are inserted with
+        # explicit ids
+        session = models.Session()
+        session.execute(text("SELECT setval('feed_id_seq', 10)"))
+        session.commit()
+        session.close()
+
+    def get_feed_rows(self, feed_id):
+        session = models.Session()
+        feed_posts = session.query(models.FeedPost.post_id,
+            models.FeedPost.comment_count, models.FeedPost.feed_rank,
+            models.FeedPost.point_count).filter_by(feed_id=feed_id).order_by(
+            models.FeedPost.post_id).all()
+        feed_comments = session.query(models.FeedComment.comment_id,
+            models.FeedComment.feed_rank).filter_by(feed_id=feed_id).order_by(
+            models.FeedComment.comment_id).all()
+        session.close()
+
+        return feed_posts, feed_comments
+
+    def test_replays_archived_scrape_without_network(self):
+        with (
+            mock.patch.dict(os.environ,
+                {'SCRAPE_ARCHIVE_DIR': self.directory.name}),
+            FixtureServer() as fixture_server,
+        ):
+            os.environ['HN_BASE_URL'] = fixture_server.url
+            scraped = scraper.scrape_loop()
+
+        # Ensure nothing is fetched while replaying
+        with mock.patch.object(client.HackerNewsClient, 'open',
+            side_effect=AssertionError('network used')):
+                summaries = scraper.replay_loop(self.directory.name)
+
+        self.assertEqual(len(summaries), 1)
+        self.assertTrue(summaries[0].complete)
+        self.assertEqual((summaries[0].posts, summaries[0].comments,
+            summaries[0].pages), (scraped.posts, scraped.comments,
+            scraped.pages))
+        self.assertEqual(self.get_feed_rows(summaries[0].feed_ids[0]),
+            self.get_feed_rows(scraped.feed_ids[0]))
+
+    def test_reports_pages_missing_from_archive(self):
+        page_archive = archive.PageArchive(self.directory.name,
+            '20180501T103000Z')
+
+        with open(os.path.join(FIXTURES_DIR, 'test-feed-page-1.html'),
+            'rb') as fixture:
+                page_archive.add_page('/news?p=1', fixture.read())
+
+        summary = scraper.replay_loop(self.directory.name)[0]
+
+        session = models.Session()
+        feed = session.get(models.Feed, summary.feed_ids[0])
+        session.close()
+
+        self.assertEqual(feed.created.isoformat(), '2018-05-01T10:30:00')
+        self.assertEqual(summary.posts, 1)
+        # Ensure only the feed pages archived for the run are replayed
+        self.assertEqual(feed.source, 'news')
+        self.assertEqual(summary.pages, 1)
+        self.assertEqual([description for description, _ in summary.failures],
+            ['post 1 page 1'])
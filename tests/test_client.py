@@ -0,0 +1,138 @@
+import aiohttp
+import asyncio
+import time
+import unittest
+
+from hacker_news.client import HackerNewsClient
+from utils.tests import FixtureServer
+
+
+class HackerNewsClientTest(unittest.IsolatedAsyncioTestCase):
+    async def test_fetches_feed_and_post_pages_from_base_url(self):
+        with FixtureServer() as fixture_server:
+            async with HackerNewsClient(fixture_server.url) as hn_client:
+                feed_page = await hn_client.fetch_feed_page(1)
+                post_page = await hn_client.fetch_post_page(3, '2')
+
+        self.assertIn(b"class='athing' id='1'", feed_page)
+        self.assertIn(b"class='athing comtr ' id='5'", post_page)
+        self.assertEqual(
+            fixture_server.requests, ['/news?p=1', '/item?id=3&p=2'])
+
+    async def test_negotiates_gzip_responses(self):
+        with FixtureServer() as fixture_server:
+            async with HackerNewsClient(fixture_server.url) as hn_client:
+                feed_page = await hn_client.fetch_feed_page(2)
+
+        self.assertIn(b'Ask HN:', feed_page)
+        self.assertEqual(fixture_server.gzipped, 1)
+
+    async def test_reuses_keep_alive_connection(self):
+        with FixtureServer() as fixture_server:
+            async with HackerNewsClient(fixture_server.url,
+                concurrency=1) as hn_client:
+                    for page in range(1, 4):
+                        await hn_client.fetch_feed_page(page)
+
+        self.assertEqual(len(fixture_server.requests), 3)
+        self.assertEqual(len(fixture_server.client_ports), 1)
+
+    async def test_limits_concurrent_requests(self):
+        with FixtureServer(delay=0.1) as fixture_server:
+            async with HackerNewsClient(fixture_server.url,
+                concurrency=2) as hn_client:
+                    await asyncio.gather(*(hn_client.fetch_feed_page(page)
+                        for page in [1, 2, 3, 1, 2, 3]))
+
+        self.assertEqual(len(fixture_server.requests), 6)
+        self.assertEqual(fixture_server.max_in_flight, 2)
+
+    async def test_raises_for_missing_page(self):
+        with FixtureServer() as fixture_server:
+            async with HackerNewsClient(fixture_server.url) as hn_client:
+                with self.assertRaises(aiohttp.ClientResponseError):
+                    await hn_client.fetch_post_page(100)
+
+    async def test_spaces_requests_to_host_rate(self):
+        with FixtureServer() as fixture_server:
+            async with HackerNewsClient(fixture_server.url, rate=20,
+                burst=1) as hn_client:
+                    started = time.monotonic()
+
+                    await asyncio.gather(*(hn_client.fetch_feed_page(1)
+                        for _ in range(5)))
+
+                    elapsed = time.monotonic() - started
+
+        # Ensure requests after the first wait for the budget to refill
+        self.assertEqual(len(fixture_server.requests), 5)
+        self.assertGreaterEqual(elapsed, 0.19)
+
+    async def test_fetches_other_lists_from_their_paths(self):
+        with FixtureServer(pages={'/best?p=2': b'best'}) as fixture_server:
+            async with HackerNewsClient(fixture_server.url) as hn_client:
+                best_page = await hn_client.fetch_feed_page(2, 'best')
+
+        self.assertEqual(best_page, b'best')
+        self.assertEqual(fixture_server.requests, ['/best?p=2'])
+
+    async def test_retries_server_errors_with_backoff(self):
+        with FixtureServer(errors={'/news?p=1': [503, 502]}) as fixture_server:
+            async with HackerNewsClient(fixture_server.url,
+                backoff=0.01) as hn_client:
+                    feed_page = await hn_client.fetch_feed_page(1)
+
+        self.assertIn(b"class='athing' id='1'", feed_page)
+        self.assertEqual(fixture_server.requests, ['/news?p=1'] * 3)
+
+    async def test_gives_up_after_retries(self):
+        with FixtureServer(errors={'/news?p=1': [500] * 5}) as fixture_server:
+            async with HackerNewsClient(fixture_server.url, retries=2,
+                backoff=0.01) as hn_client:
+                    with self.assertRaises(aiohttp.ClientResponseError):
+                        await hn_client.fetch_feed_page(1)
+
+        self.assertEqual(len(fixture_server.requests), 3)
+
+    async def test_waits_as_long_as_throttling_response_asks(self):
+        with FixtureServer(errors={'/news?p=1': [429]},
+            retry_after={429: 1}) as fixture_server:
+                async with HackerNewsClient(fixture_server.url,
+                    backoff=0.01) as hn_client:
+                        started = time.monotonic()
+                        await hn_client.fetch_feed_page(1)
+                        elapsed = time.monotonic() - started
+
+        self.assertGreaterEqual(elapsed, 1)
+
+    async def test_slows_down_when_throttled_and_recovers(self):
+        with FixtureServer(errors={'/news?p=1': [429, 503]}) as fixture_server:
+            async with HackerNewsClient(fixture_server.url, rate=100,
+                backoff=0.01) as hn_client:
+                    rate_limit = hn_client.get_rate_limit(
+                        fixture_server.url.split('//')[1])
+
+                    await hn_client.fetch_feed_page(1)
+                    throttled_rate = rate_limit.rate
+
+                    for _ in range(3):
+                        await hn_client.fetch_feed_page(2)
+
+        # Ensure rate was halved twice, then raised after each healthy
+        # response
+        self.assertEqual(throttled_rate, 25.5)
+        self.assertEqual(rate_limit.rate, 27)
+
+    async def test_pauses_requests_after_failures_in_a_row(self):
+        with FixtureServer(errors={'/item?id=1': [503] * 2}) as fixture_server:
+            async with HackerNewsClient(fixture_server.url, retries=1,
+                backoff=0.01, breaker_threshold=2,
+                breaker_pause=0.5) as hn_client:
+                    with self.assertRaises(aiohttp.ClientResponseError):
+                        await hn_client.fetch_post_page(1)
+
+                    started = time.monotonic()
+                    await hn_client.fetch_feed_page(1)
+                    elapsed = time.monotonic() - started
+
+        self.assertGreaterEqual(elapsed, 0.45)
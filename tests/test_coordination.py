@@ -0,0 +1,280 @@
+import asyncio
+import threading
+import time
+
+from sqlalchemy import event, text
+
+from hacker_news import client, coordination, models, scraper
+from utils import pages
+from utils.tests import FixtureServer, HackerNewsTestCase
+
+
+class ScrapeLockTest(HackerNewsTestCase):
+    def test_lets_one_scrape_hold_lock(self):
+        with coordination.scrape_lock() as acquired:
+            self.assertTrue(acquired)
+            self.assertTrue(coordination.is_scrape_running())
+
+            with coordination.scrape_lock() as acquired_again:
+                self.assertFalse(acquired_again)
+
+        self.assertFalse(coordination.is_scrape_running())
+
+    def test_checks_for_running_scrape_without_taking_lock(self):
+        statements = []
+
+        def record(connection, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(models.engine, 'before_cursor_execute', record)
+
+        try:
+            self.assertFalse(coordination.is_scrape_running())
+        finally:
+            event.remove(models.engine, 'before_cursor_execute', record)
+
+        self.assertFalse(any('advisory_lock' in statement
+            for statement in statements))
+
+    def test_skips_scrape_while_another_is_running(self):
+        with coordination.scrape_lock():
+            summary = scraper.scrape_loop()
+
+        self.assertIsNone(summary)
+
+
+class WorkQueueTest(HackerNewsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.add_all(models.Post(id=post_id, link='', title='',
+            type='article') for post_id in range(901, 905))
+        session.commit()
+        session.close()
+
+        self.posts = [scraper.parsers.PostRecord(str(post_id), '', '', '', '',
+            '', 3, 1, 1) for post_id in range(901, 905)]
+
+    def test_claims_tasks_skipping_locked_ones(self):
+        work_queue = coordination.WorkQueue()
+        work_queue.enqueue(5, self.posts)
+
+        # Lock the first two tasks from another connection, as a process
+        # claiming them would
+        session = models.Session()
+        locked_ids = session.execute(text('SELECT id FROM scrape_task ORDER '
+            'BY id LIMIT 2 FOR UPDATE')).scalars().all()
+
+        claimed = work_queue.claim(4)
+
+        session.commit()
+        session.close()
+
+        self.assertEqual([task.post_id for task in claimed], ['903', '904'])
+        self.assertEqual(sorted(task.id for task in work_queue.claim(4)),
+            locked_ids)
+        self.assertEqual(work_queue.claim(4), [])
+        self.assertEqual(work_queue.remaining([5]), 4)
+
+    def test_claims_task_again_once_its_lease_ends(self):
+        coordination.WorkQueue(lease=0.01).enqueue(5, self.posts[:1])
+        task = coordination.WorkQueue(lease=0.01, worker='first').claim()[0]
+
+        time.sleep(0.05)
+
+        work_queue = coordination.WorkQueue(worker='second')
+        self.assertEqual(work_queue.claim(), [task])
+
+        work_queue.complete(task)
+
+        session = models.Session()
+        row = session.get(models.ScrapeTask, task.id)
+        session.close()
+
+        self.assertEqual((row.status, row.claimed_by, row.attempts),
+            ('done', 'second', 2))
+        self.assertEqual(work_queue.remaining(), 0)
+
+    def test_marks_comments_of_failed_task_skipped(self):
+        session = models.Session()
+        session.add(models.Feed(id=6))
+        session.add_all(models.FeedPost(feed_id=feed_id, post_id=901,
+            feed_rank=1) for feed_id in (5, 6))
+        session.commit()
+        session.close()
+
+        work_queue = coordination.WorkQueue()
+        work_queue.enqueue(5, self.posts[:1])
+        task = work_queue.claim()[0]
+        work_queue.share(5, '901', 6)
+        work_queue.complete(task, 'Page not found')
+
+        session = models.Session()
+        skipped = dict(session.query(models.FeedPost.feed_id,
+            models.FeedPost.comments_skipped).filter(
+            models.FeedPost.post_id == 901).all())
+        session.close()
+
+        self.assertEqual(skipped, {5: True, 6: True})
+
+    def test_skips_tasks_that_are_not_being_worked_on(self):
+        session = models.Session()
+        session.add_all(models.FeedPost(feed_id=5, post_id=int(post.id),
+            feed_rank=1) for post in self.posts)
+        session.commit()
+        session.close()
+
+        work_queue = coordination.WorkQueue()
+        work_queue.enqueue(5, self.posts)
+
+        claimed = work_queue.claim()
+
+        self.assertEqual(sorted(work_queue.skip([5])), ['902', '903', '904'])
+        self.assertEqual(work_queue.remaining([5]), 1)
+
+        work_queue.complete(claimed[0])
+
+        session = models.Session()
+        skipped = dict(session.query(models.FeedPost.post_id,
+            models.FeedPost.comments_skipped).filter(
+            models.FeedPost.feed_id == 5).all())
+        session.close()
+
+        self.assertEqual(work_queue.remaining([5]), 0)
+        self.assertEqual(skipped, {901: False, 902: True, 903: True,
+            904: True})
+
+
+class DistributedScrapeTest(HackerNewsTestCase):
+    def test_processes_split_post_pages_of_one_scrape(self):
+        posts = pages.synthetic_posts(5, first_id=901)
+        threads = {post['id']: pages.synthetic_thread(3,
+            first_id=post['id'] * 100, seed=post['id']) for post in posts}
+
+        # Post 902 is on both lists
+        generated_pages = {
+            '/news?p=1': pages.feed_page(posts[:4]),
+            '/best?p=1': pages.feed_page([posts[4], posts[1]]),
+            }
+
+        for post_id, thread in threads.items():
+            generated_pages['/item?id=' + str(post_id)] = pages.post_page(
+                post_id, thread)
+
+        session = models.Session()
+        session.execute(text("SELECT setval('feed_id_seq', 10)"))
+        session.commit()
+        session.close()
+
+        sources = scraper.get_sources('news,best')
+        feed_ids = scraper.add_feeds(sources)
+
+        async def coordinate(locked):
+            with coordination.scrape_lock():
+                locked.set()
+
+                async with client.HackerNewsClient(fixture_server.url,
+                    concurrency=1) as hn_client:
+                        work_queue = coordination.WorkQueue(
+                            poll_interval=0.05, worker='coordinator')
+                        scrape_run = scraper.ScrapeRun(None, hn_client,
+                            parse_workers=0, work_queue=work_queue)
+
+                        for feed_id, source in zip(feed_ids, sources):
+                            scrape_run.add_feed(feed_id, source)
+
+                        return await scrape_run.run()
+
+        async def help_scrape(locked):
+            await locked.wait()
+
+            async with client.HackerNewsClient(fixture_server.url,
+                concurrency=1) as hn_client:
+                    work_queue = coordination.WorkQueue(poll_interval=0.05,
+                        worker='helper')
+
+                    return await scraper.ScrapeRun(None, hn_client,
+                        parse_workers=0, work_queue=work_queue).run()
+
+        async def scrape():
+            locked = asyncio.Event()
+
+            return await asyncio.gather(coordinate(locked),
+                help_scrape(locked))
+
+        with FixtureServer(delay=0.1,
+            pages=generated_pages) as fixture_server:
+                coordinated, helped = asyncio.run(scrape())
+
+        session = models.Session()
+        shared_comments = [dict(session.query(models.FeedComment.comment_id,
+            models.FeedComment.feed_rank).join(models.Comment).filter(
+            models.Comment.post_id == 902,
+            models.FeedComment.feed_id == feed_id).all())
+            for feed_id in feed_ids]
+        comment_count = session.query(models.FeedComment).filter(
+            models.FeedComment.feed_id == feed_ids[0]).count()
+        task_count = session.query(models.ScrapeTask).count()
+        session.close()
+
+        item_requests = [request for request in fixture_server.requests
+            if request.startswith('/item')]
+
+        # Ensure each post page was scraped once, by one process or the other
+        self.assertTrue(coordinated.complete and helped.complete)
+        self.assertEqual(sorted(item_requests), ['/item?id=' + str(post_id)
+            for post_id in range(901, 906)])
+        self.assertGreater(coordinated.comments, 0)
+        self.assertGreater(helped.comments, 0)
+        self.assertEqual(coordinated.comments + helped.comments, 15)
+        self.assertEqual(comment_count, 12)
+        self.assertEqual(len(shared_comments[0]), 3)
+        self.assertEqual(shared_comments[0], shared_comments[1])
+        self.assertEqual(task_count, 0)
+
+    def test_queries_work_queue_off_event_loop(self):
+        posts = pages.synthetic_posts(2, first_id=901)
+        generated_pages = {'/news?p=1': pages.feed_page(posts)}
+
+        for post in posts:
+            generated_pages['/item?id=' + str(post['id'])] = pages.post_page(
+                post['id'], pages.synthetic_thread(2,
+                first_id=post['id'] * 100, seed=post['id']))
+
+        session = models.Session()
+        session.execute(text("SELECT setval('feed_id_seq', 10)"))
+        session.commit()
+        session.close()
+
+        threads = set()
+
+        class RecordingWorkQueue(coordination.WorkQueue):
+            def claim(self, limit=1):
+                threads.add(threading.get_ident())
+                return super().claim(limit)
+
+            def remaining(self, feed_ids=None):
+                threads.add(threading.get_ident())
+                return super().remaining(feed_ids)
+
+        sources = scraper.get_sources('news')
+        feed_ids = scraper.add_feeds(sources)
+
+        async def scrape():
+            async with client.HackerNewsClient(fixture_server.url,
+                concurrency=1) as hn_client:
+                    work_queue = RecordingWorkQueue(poll_interval=0.01)
+                    scrape_run = scraper.ScrapeRun(None, hn_client,
+                        parse_workers=0, work_queue=work_queue)
+                    scrape_run.add_feed(feed_ids[0], sources[0])
+
+                    return await scrape_run.run()
+
+        with FixtureServer(pages=generated_pages) as fixture_server:
+            summary = asyncio.run(scrape())
+
+        self.assertTrue(summary.complete)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.get_ident(), threads)
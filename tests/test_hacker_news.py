@@ -2,8 +2,16 @@ import json
 import os
 import re
 
+from hacker_news import loader, models
 from utils.tests import HackerNewsTestCase
 
+STAT_ENDPOINTS = ('average_comment_count', 'average_comment_tree_depth',
+    'average_comment_word_count', 'average_point_count',
+    'comments_highest_word_count', 'comment_words', 'deepest_comment_tree',
+    'posts_highest_comment_count', 'posts_highest_point_count', 'post_types',
+    'title_words', 'top_posts', 'top_websites', 'users_most_comments',
+    'users_most_posts', 'users_most_words')
+
 
 # Test /api/hacker_news/comment endpoint [GET]
 class TestComment(HackerNewsTestCase):
@@ -2681,3 +2689,61 @@ class TestUsersMostWords(HackerNewsTestCase):
 
         # Assert
         self.assertEqual(len(users), 2)
+
+
+# Test that all-time statistics cover the front page's feeds only
+class TestAllTimeFrontPage(HackerNewsTestCase):
+    def get_all_time_stats(self):
+        return {endpoint: json.loads(self.client.get(
+            '/api/hacker_news/stats/all/' + endpoint,
+            query_string={'count': 100}).get_data(as_text=True))
+            for endpoint in STAT_ENDPOINTS}
+
+    def test_stats_all_leave_out_other_lists(self):
+        # Arrange
+        stats = self.get_all_time_stats()
+
+        session = models.Session()
+        session.add(models.Feed(id=5, source='newest'))
+        session.commit()
+        session.close()
+
+        # Add a post that would lead every statistic, listed only by another
+        # list's feed
+        feed_loader = loader.FeedLoader(5)
+        feed_loader.add_post(50, '2018-05-01 10:00', 'https://new.com',
+            'Newest post', 'article', 'newcomer', 'new.com')
+        feed_loader.add_feed_post(50, 5000, 1, 100000)
+        feed_loader.add_comment(60, 'word ' * 1000, '2018-05-01 10:30', 50,
+            None, 50, 1000, 'newcomer')
+        feed_loader.add_feed_comment(60, 1)
+        feed_loader.flush()
+
+        session = models.Session()
+        loader.roll_up_feeds(session.connection(), [5])
+        session.commit()
+        session.close()
+
+        # Act and assert
+        self.assertEqual(self.get_all_time_stats(), stats)
+
+
+# Test that statistics for the hour read the latest feed whose scrape finished
+class TestHourDuringScrape(HackerNewsTestCase):
+    def get_hour_stats(self):
+        return {endpoint: json.loads(self.client.get(
+            '/api/hacker_news/stats/hour/' + endpoint).get_data(as_text=True))
+            for endpoint in STAT_ENDPOINTS}
+
+    def test_stats_hour_skip_feed_being_scraped(self):
+        # Arrange
+        stats = self.get_hour_stats()
+
+        # Add the feed of a scrape that hasn't written its rows yet
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.commit()
+        session.close()
+
+        # Act and assert
+        self.assertEqual(self.get_hour_stats(), stats)
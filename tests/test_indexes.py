@@ -0,0 +1,135 @@
+from datetime import datetime
+from sqlalchemy import event, text
+
+from hacker_news import hacker_news, loader, models, partitions
+from server import app
+from utils.tests import HackerNewsTestCase
+
+
+class FeedIndexTest(HackerNewsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        # Fill database with many feeds, each listing a slice of posts and
+        # comments (with content as long as a typical comment's), so
+        # filtering by feed is much cheaper than a full scan
+        session = models.Session()
+        session.execute(text("""
+            INSERT INTO feed (id, created, source)
+                 SELECT id, NOW() - id * INTERVAL '10 minutes', 'news'
+                   FROM generate_series(100, 399) AS id;
+
+            INSERT INTO post (id, created, link, title, type, username,
+                        website)
+                 SELECT id, NOW(), 'https://a.com', 'Title', 'article',
+                        'user', 'a.com'
+                   FROM generate_series(10000, 12999) AS id;
+
+            INSERT INTO feed_post (feed_id, post_id, comment_count,
+                        feed_rank, point_count)
+                 SELECT feed_id, 10000 + (feed_id * 10 + rank) % 3000,
+                        rank * 2, rank, rank * 3
+                   FROM generate_series(100, 399) AS feed_id,
+                        generate_series(1, 30) AS rank;
+
+            INSERT INTO comment (id, content, created, level, post_id,
+                        total_word_count, username, word_counts)
+                 SELECT id, REPEAT('word ', 100), NOW(), id % 5,
+                        10000 + id % 3000, 100, 'user' || id % 100, ''
+                   FROM generate_series(100000, 159999) AS id;
+
+            INSERT INTO comment_interval (comment_id, source,
+                        first_feed_id, last_feed_id, feed_rank)
+                 SELECT 100000 + (feed_id * 200 + rank) % 60000, 'news',
+                        feed_id, feed_id, rank
+                   FROM generate_series(100, 399) AS feed_id,
+                        generate_series(1, 600) AS rank;
+
+            """))
+
+        # Roll up feeds as finished scrapes do, all but the one the
+        # statistics below read, which is summed from its rows
+        loader.roll_up_feeds(session.connection(), range(100, 399))
+
+        session.execute(text('ANALYZE'))
+        session.commit()
+        session.close()
+
+    def explain_getter(self, getter, feed_ids=[399]):
+        statements = []
+
+        def record(connection, cursor, statement, parameters, *args):
+            statements.append((statement, parameters))
+
+        event.listen(models.engine, 'before_cursor_execute', record)
+
+        try:
+            with app.test_request_context():
+                getter(feed_ids)
+        finally:
+            event.remove(models.engine, 'before_cursor_execute', record)
+
+        # Explain the statistic's query the way the endpoint sends it
+        connection = models.engine.raw_connection()
+
+        try:
+            cursor = connection.cursor()
+            plans = []
+
+            for statement, parameters in statements:
+                cursor.execute('EXPLAIN ' + statement, parameters)
+                plans.append('\n'.join(row[0] for row in cursor.fetchall()))
+
+            return '\n'.join(plans)
+
+        finally:
+            connection.close()
+
+    def test_feed_post_statistics_scan_feed_index(self):
+        for getter in (hacker_news.get_average_comment_count,
+            hacker_news.get_average_point_count,
+            hacker_news.get_posts_with_highest_comment_counts,
+            hacker_news.get_top_posts):
+                with self.subTest(getter=getter.__name__):
+                    plan = self.explain_getter(getter)
+
+                    self.assertIn('Index Cond: (feed_id = 399)', plan)
+                    self.assertNotIn('Seq Scan on feed_post', plan)
+
+    def test_feed_comment_statistics_scan_feed_index(self):
+        # Intervals of the synthetic feeds are in this month's partition
+        partition = partitions.get_partition_name('comment_interval',
+            partitions.get_month(datetime.utcnow()))
+
+        for getter in (hacker_news.get_average_comment_tree_depth,
+            hacker_news.get_average_comment_word_count,
+            hacker_news.get_users_with_most_comments):
+                with self.subTest(getter=getter.__name__):
+                    plan = self.explain_getter(getter)
+
+                    self.assertIn('Index Only Scan using comment_interval',
+                        plan)
+                    self.assertNotIn('Seq Scan on ' + partition, plan)
+                    self.assertNotIn('Seq Scan on comment ', plan)
+
+    def test_feeds_are_found_by_source_and_time(self):
+        plan = self.explain_getter(lambda feed_ids: hacker_news.get_feeds(
+            'hour'))
+
+        self.assertIn('feed_source_created_index', plan)
+
+    def test_all_time_post_statistics_read_post_summaries(self):
+        session = models.Session()
+        loader.summarize_posts(session.connection())
+        session.execute(text('ANALYZE post_summary'))
+        session.commit()
+        session.close()
+
+        for getter in (hacker_news.get_posts_with_highest_comment_counts,
+            hacker_news.get_posts_with_highest_point_counts,
+            hacker_news.get_top_posts):
+                with self.subTest(getter=getter.__name__):
+                    plan = self.explain_getter(getter, None)
+
+                    self.assertIn('Index Scan using post_summary_', plan)
+                    self.assertNotIn('feed_post', plan)
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import unittest
+
+from hacker_news import database, loader, models
+from utils.tests import HackerNewsTestCase
+
+
+class ColumnValuesTest(unittest.TestCase):
+    def test_splits_rows_into_columns_of_text(self):
+        self.assertEqual(loader.get_column_values([(1, 'a\tb\nc', None),
+            (2, 'd\\e', True)]), [['1', '2'], ['a\tb\nc', 'd\\e'],
+            [None, 'True']])
+
+
+class FeedLoaderTest(HackerNewsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.commit()
+        session.close()
+
+    def test_loads_feed_rows_in_one_flush(self):
+        feed_loader = loader.FeedLoader(5)
+        feed_loader.add_post(10, '2018-05-01 10:00', 'https://a.com',
+            'Ask HN:\tTabs', 'ask', 'user', '')
+        feed_loader.add_feed_post(10, 2, 1, 5)
+        feed_loader.add_comment(20, 'First line\nsecond \\ line',
+            '2018-05-01 10:30', 0, None, 10, 4, 'user')
+        feed_loader.add_comment(21, 'Reply', '2018-05-01 10:31', 1, 20, 10,
+            1, 'other')
+        feed_loader.add_feed_comment(20, 1)
+        feed_loader.add_feed_comment(21, 2)
+
+        feed_loader.flush()
+
+        session = models.Session()
+        post = session.get(models.Post, 10)
+        comment = session.get(models.Comment, 20)
+        reply = session.get(models.Comment, 21)
+        feed_ranks = dict(session.query(models.FeedComment.comment_id,
+            models.FeedComment.feed_rank).filter_by(feed_id=5).all())
+        session.close()
+
+        self.assertEqual(post.title, 'Ask HN:\tTabs')
+        self.assertEqual(comment.content, 'First line\nsecond \\ line')
+        self.assertEqual(comment.word_counts,
+            "'first':1 'line':2,4 'second':3")
+        self.assertEqual(comment.content_hash, hashlib.md5(
+            b'First line\nsecond \\ line').digest())
+        self.assertEqual(reply.parent_comment, 20)
+        self.assertEqual(feed_ranks, {20: 1, 21: 2})
+        self.assertEqual(feed_loader.comments, [])
+
+    def test_skips_rows_that_already_exist(self):
+        feed_loader = loader.FeedLoader(5)
+
+        # Add comment that is already stored, twice as if it was listed on
+        # two pages of the feed
+        feed_loader.add_comment(1, 'changed', '2018-05-01 10:30', 0, None, 1,
+            1, 'test')
+        feed_loader.add_feed_comment(1, 1)
+        feed_loader.add_feed_comment(1, 2)
+
+        feed_loader.flush()
+
+        session = models.Session()
+        comment = session.get(models.Comment, 1)
+        feed_comment_count = session.query(models.FeedComment).filter_by(
+            comment_id=1, feed_id=5).count()
+        session.close()
+
+        self.assertEqual(comment.content, 'test')
+        self.assertEqual(feed_comment_count, 1)
+
+    def test_rewrites_updated_comments(self):
+        session = models.Session()
+        content_hash = session.get(models.Comment, 1).content_hash
+        session.close()
+
+        feed_loader = loader.FeedLoader(5)
+        feed_loader.update_comment(1, '[flagged]', 0)
+
+        feed_loader.flush()
+
+        session = models.Session()
+        comment = session.get(models.Comment, 1)
+        session.close()
+
+        self.assertEqual(comment.content, '[flagged]')
+        self.assertEqual(comment.total_word_count, 0)
+        self.assertEqual(comment.word_counts, "'flagged':1")
+        self.assertNotEqual(comment.content_hash, content_hash)
+        self.assertEqual(comment.content_hash,
+            hashlib.md5(b'[flagged]').digest())
+        self.assertEqual(feed_loader.updated_comments, [])
+
+    def test_extends_comment_intervals_while_rank_is_unchanged(self):
+        session = models.Session()
+        session.add_all([models.Feed(id=6), models.Feed(id=7)])
+        session.commit()
+        session.close()
+
+        feed_loader = loader.FeedLoader(5)
+        feed_loader.add_post(10, '2018-05-01 10:00', 'https://a.com',
+            'Title', 'article', 'user', 'a.com')
+        feed_loader.add_comment(20, 'First', '2018-05-01 10:30', 0, None, 10,
+            1, 'user')
+        feed_loader.add_feed_comment(20, 1)
+        feed_loader.flush()
+
+        # Keep comment's rank in next feed, then change it, writing the next
+        # feed's ranks twice as if a batch was written again
+        for feed_id, feed_rank in ((6, 1), (6, 1), (7, 2)):
+            feed_loader = loader.FeedLoader(feed_id)
+            feed_loader.add_feed_comment(20, feed_rank)
+            feed_loader.flush()
+
+        session = models.Session()
+        intervals = session.query(models.CommentInterval.first_feed_id,
+            models.CommentInterval.last_feed_id,
+            models.CommentInterval.feed_rank).filter_by(
+            comment_id=20).order_by(models.CommentInterval.first_feed_id).all()
+        feed_ranks = dict(session.query(models.FeedComment.feed_id,
+            models.FeedComment.feed_rank).filter_by(comment_id=20).all())
+        session.close()
+
+        self.assertEqual([tuple(interval) for interval in intervals],
+            [(5, 6, 1), (7, 7, 2)])
+        self.assertEqual(feed_ranks, {5: 1, 6: 1, 7: 2})
+
+    def test_summarizes_posts_from_their_feed_rows(self):
+        session = models.Session()
+        session.add_all([models.Feed(id=6), models.Feed(id=7)])
+        session.commit()
+        session.close()
+
+        # Write post's feed rows out of order, and one feed's row twice
+        for feed_id, comment_count, feed_rank, point_count in ((5, 2, 1, 3),
+            (7, 6, 2, 9), (6, 8, 1, 4), (6, 8, 1, 4)):
+                feed_loader = loader.FeedLoader(feed_id)
+                feed_loader.add_post(10, '2018-05-01 10:00', 'https://a.com',
+                    'Title', 'article', 'user', 'a.com')
+                feed_loader.add_feed_post(10, comment_count, feed_rank,
+                    point_count)
+                feed_loader.flush()
+
+        session = models.Session()
+        summary = session.get(models.PostSummary, 10)
+        session.close()
+
+        self.assertEqual((summary.first_feed_id, summary.last_feed_id),
+            (5, 7))
+        self.assertEqual((summary.comment_count, summary.feed_rank,
+            summary.point_count), (6, 2, 9))
+        self.assertEqual((summary.max_comment_count,
+            summary.max_comment_feed_rank, summary.max_comment_point_count),
+            (8, 1, 4))
+        self.assertEqual((summary.max_point_comment_count,
+            summary.max_point_feed_rank, summary.max_point_count), (6, 2, 9))
+        self.assertEqual((summary.best_rank_comment_count,
+            summary.best_feed_rank, summary.best_rank_point_count), (8, 1, 4))
+
+    def test_loads_feed_rows_with_connection_pool(self):
+        feed_loader = loader.FeedLoader(5)
+        feed_loader.add_post(10, '2018-05-01 10:00', 'https://a.com',
+            'Title', 'article', 'user', 'a.com')
+        feed_loader.add_feed_post(10, 1, 1, 5, False)
+        feed_loader.add_comment(20, 'Tab\there', '2018-05-01 10:30', 0, None,
+            10, 2, 'user')
+        feed_loader.add_feed_comment(20, 1)
+
+        # Copy ranks of a sample post's comments from its sample feed
+        session = models.Session()
+        sample = session.query(models.FeedComment.feed_id,
+            models.Comment.post_id).join(models.Comment).first()
+        sample_ranks = dict(session.query(models.FeedComment.comment_id,
+            models.FeedComment.feed_rank).join(models.Comment).filter(
+            models.FeedComment.feed_id == sample.feed_id,
+            models.Comment.post_id == sample.post_id).all())
+        session.close()
+
+        feed_loader.carry_forward_comments(sample.feed_id, sample.post_id)
+
+        async def flush():
+            db_pool = await database.create_pool()
+
+            try:
+                await feed_loader.flush_async(db_pool)
+
+            finally:
+                await db_pool.close()
+
+        asyncio.run(flush())
+
+        session = models.Session()
+        comment = session.get(models.Comment, 20)
+        feed_ranks = dict(session.query(models.FeedComment.comment_id,
+            models.FeedComment.feed_rank).filter_by(feed_id=5).all())
+        session.close()
+
+        self.assertEqual(comment.content, 'Tab\there')
+        self.assertEqual(comment.word_counts, "'tab':1")
+        self.assertEqual(feed_ranks, {20: 1, **sample_ranks})
+        self.assertEqual(feed_loader.feed_posts, [])
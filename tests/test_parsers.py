@@ -0,0 +1,127 @@
+import os
+import unittest
+
+from hacker_news import parsers
+from utils import pages
+from utils.tests import FIXTURES_DIR
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as fixture:
+        return fixture.read()
+
+
+class SoupParserTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = parsers.get_parser('soup')
+
+    def test_parses_feed_page(self):
+        posts = self.parser.parse_feed_page(
+            read_fixture('test-feed-page-1.html'))
+
+        self.assertEqual(posts, [parsers.PostRecord(id='1',
+            age='1 minute ago', link='https://test.com', title='Show HN: Test',
+            username='test', website='test.com', comment_count=1, feed_rank=1,
+            point_count=1)])
+
+    def test_parses_post_page(self):
+        comments, next_page_number = self.parser.parse_post_page(
+            read_fixture('test-post-3-page-2.html'))
+
+        self.assertIsNone(next_page_number)
+        self.assertEqual([(comment.id, comment.level, comment.content,
+            comment.username) for comment in comments],
+            [('4', 0, 'test', 'test'), ('5', 1, 'test2', 'test2')])
+
+    def test_gets_next_page_number(self):
+        _, next_page_number = self.parser.parse_post_page(
+            read_fixture('test-post-3-page.html'))
+
+        self.assertEqual(next_page_number, '2')
+
+    def test_rejects_unknown_parser(self):
+        with self.assertRaises(ValueError):
+            parsers.get_parser('regex')
+
+
+@unittest.skipUnless('lxml' in parsers.PARSERS, 'lxml is not installed')
+class ParserParityTest(unittest.TestCase):
+    def setUp(self):
+        self.reference = parsers.get_parser('soup')
+        self.parser = parsers.get_parser('lxml')
+
+    def assertSameRecords(self, method, content):
+        self.assertEqual(getattr(self.parser, method)(content),
+            getattr(self.reference, method)(content))
+
+    def test_feed_fixtures(self):
+        for page in (1, 2, 3):
+            with self.subTest(page=page):
+                self.assertSameRecords('parse_feed_page',
+                    read_fixture('test-feed-page-' + str(page) + '.html'))
+
+    def test_post_fixtures(self):
+        for name in ('test-post-1-page.html', 'test-post-2-page.html',
+            'test-post-3-page.html', 'test-post-3-page-2.html'):
+                with self.subTest(name=name):
+                    self.assertSameRecords('parse_post_page',
+                        read_fixture(name))
+
+    def test_generated_pages(self):
+        posts = pages.synthetic_posts(30)
+        thread = pages.synthetic_thread(500)
+
+        # Include text that isn't ASCII, since pages don't declare a charset
+        posts[0]['title'] = 'Ask HN: Café naïveté — résumé?'
+        thread[0]['content'] = 'Ünïcode “quotes” and émoji 🚀'
+
+        self.assertSameRecords('parse_feed_page',
+            pages.feed_page(posts, more_page=2))
+        self.assertSameRecords('parse_post_page',
+            pages.post_page(posts[0]['id'], thread, more_page=2))
+
+
+@unittest.skipUnless('lxml' in parsers.PARSERS, 'lxml is not installed')
+class StreamingParserTest(unittest.TestCase):
+    def assertSameBatches(self, content, batch_size):
+        batches = list(parsers.iter_post_page(content, 'lxml', batch_size))
+        comments, next_page_number = parsers.parse_post_page(content, 'lxml')
+
+        self.assertTrue(all(len(batch) == batch_size
+            for batch, _ in batches[:-1]))
+        self.assertEqual([comment for batch, _ in batches
+            for comment in batch], comments)
+        self.assertEqual([page for _, page in batches],
+            [None] * (len(batches) - 1) + [next_page_number])
+
+    def test_post_fixtures(self):
+        for name in ('test-post-1-page.html', 'test-post-2-page.html',
+            'test-post-3-page.html', 'test-post-3-page-2.html'):
+                with self.subTest(name=name):
+                    self.assertSameBatches(read_fixture(name), 1)
+
+    def test_generated_pages(self):
+        thread = pages.synthetic_thread(250)
+        thread[0]['content'] = 'Ünïcode “quotes” and émoji 🚀'
+
+        self.assertSameBatches(pages.post_page(1, thread, more_page=2), 100)
+        self.assertSameBatches(pages.post_page(1, thread[:100]), 100)
+
+    def test_parses_whole_page_with_parser_that_cannot_stream(self):
+        content = read_fixture('test-post-3-page.html')
+
+        self.assertEqual(list(parsers.iter_post_page(content, 'soup', 1)),
+            [parsers.parse_post_page(content, 'soup')])
+
+    def test_streams_page_in_parse_worker(self):
+        content = pages.post_page(1, pages.synthetic_thread(250),
+            more_page=2)
+        executor = parsers.create_parse_executor(1)
+        self.addCleanup(executor.shutdown)
+
+        batches = executor.submit(parsers.parse_post_page_batches, content,
+            'lxml', 100).result()
+
+        self.assertEqual([len(batch) for batch, _ in batches], [100, 100, 50])
+        self.assertEqual(batches, list(parsers.iter_post_page(content, 'lxml',
+            100)))
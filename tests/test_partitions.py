@@ -0,0 +1,79 @@
+from datetime import datetime
+from sqlalchemy import text
+
+from hacker_news import models, partitions, scraper
+from utils.tests import HackerNewsTestCase
+
+
+class FeedPartitionTest(HackerNewsTestCase):
+    def get_partitions(self):
+        session = models.Session()
+        feed_partitions = partitions.get_partitions(session.connection())
+        session.close()
+
+        return feed_partitions
+
+    def add_feed(self, created):
+        return scraper.add_feeds(scraper.get_sources('news'), created)[0]
+
+    def test_creates_next_months_partition_ahead(self):
+        month = partitions.get_month(datetime.utcnow())
+
+        self.assertIn(month, self.get_partitions())
+        self.assertIn(partitions.get_next_month(month), self.get_partitions())
+
+    def test_starts_first_feed_of_month_in_its_partition(self):
+        month = partitions.get_next_month(partitions.get_month(
+            datetime.utcnow()))
+        start, end = self.get_partitions()[month]
+
+        feed_id = self.add_feed(month)
+
+        self.assertEqual(feed_id, start)
+        self.assertEqual(self.add_feed(month), start + 1)
+        self.assertEqual(self.get_partitions()[partitions.get_next_month(
+            month)], (end, end + partitions.FEEDS_PER_PARTITION))
+
+        # Check feed's rows are stored in its month's partition
+        session = models.Session()
+        session.execute(text('INSERT INTO feed_post (feed_id, post_id, '
+            'comment_count, feed_rank, point_count) VALUES (:feed_id, 1, 1, '
+            '1, 1)'), {'feed_id': feed_id})
+        partition = session.execute(text('SELECT tableoid::regclass::text '
+            'FROM feed_post WHERE feed_id = :feed_id'),
+            {'feed_id': feed_id}).scalar()
+        session.commit()
+        session.close()
+
+        self.assertEqual(partition, partitions.get_partition_name(
+            'feed_post', month))
+
+    def test_keeps_feed_ids_of_replayed_months(self):
+        feed_partitions = self.get_partitions()
+
+        session = models.Session()
+        session.execute(text("SELECT setval('feed_id_seq', 10)"))
+        session.commit()
+        session.close()
+
+        self.assertEqual(self.add_feed(datetime(2018, 5, 1)), 11)
+        self.assertEqual(self.get_partitions(), feed_partitions)
+
+    def test_scans_only_partitions_of_filtered_feeds(self):
+        month = partitions.get_next_month(partitions.get_month(
+            datetime.utcnow()))
+        feed_id = self.add_feed(month)
+
+        # Explain the statistic's query for the month's feed
+        session = models.Session()
+        query = session.query(models.FeedPost.post_id).filter(
+            models.FeedPost.feed_id.in_([feed_id]))
+        statement = str(query.statement.compile(compile_kwargs={
+            'literal_binds': True}))
+        plan = '\n'.join(row[0] for row in session.execute(text('EXPLAIN ' +
+            statement)).all())
+        session.close()
+
+        self.assertIn(partitions.get_partition_name('feed_post', month), plan)
+        self.assertNotIn(partitions.get_partition_name('feed_post',
+            partitions.get_month(datetime.utcnow())), plan)
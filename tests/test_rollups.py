@@ -0,0 +1,276 @@
+from sqlalchemy import text
+
+from hacker_news import hacker_news, loader, models
+from server import app
+from utils.tests import HackerNewsTestCase
+
+import management
+
+FEED_COMMENTS = ('feed_comment JOIN comment ON comment.id = '
+    'feed_comment.comment_id')
+
+# Averages read from rollups, with the feed rows and column they average
+AVERAGES = (
+    ('average_comment_count', 'feed_post', 'feed_post.comment_count'),
+    ('average_point_count', 'feed_post', 'feed_post.point_count'),
+    ('average_comment_tree_depth', FEED_COMMENTS, 'comment.level'),
+    ('average_comment_word_count', FEED_COMMENTS,
+        'comment.total_word_count'),
+    )
+
+
+class FeedRollupTest(HackerNewsTestCase):
+    def get_rollups(self):
+        session = models.Session()
+        rollups = session.execute(text('SELECT * FROM feed_rollup ORDER BY '
+            'feed_id')).all()
+        session.close()
+
+        return [tuple(rollup) for rollup in rollups]
+
+    def get_row_average(self, rows, column, feed_ids):
+        # Average feeds' rows directly, the way statistics did before rollups
+        session = models.Session()
+        average = session.execute(text('SELECT AVG(' + column + ') FROM ' +
+            rows + ' WHERE feed_id = ANY(:feed_ids)'),
+            {'feed_ids': feed_ids}).scalar()
+        session.close()
+
+        return round(average)
+
+    def get_post_comment_average(self, column):
+        # Average comments of front page posts, each comment once
+        session = models.Session()
+        average = session.execute(text('SELECT AVG(' + column + ') FROM '
+            'comment JOIN post_summary ON post_summary.post_id = '
+            'comment.post_id')).scalar()
+        session.close()
+
+        return round(average)
+
+    def test_scrape_rolls_up_its_feed(self):
+        session = models.Session()
+        rollup = session.get(models.FeedRollup, 1)
+        feed_post_count = session.query(models.FeedPost).filter_by(
+            feed_id=1).count()
+        feed_comment_count = session.query(models.FeedComment).filter_by(
+            feed_id=1).count()
+        session.close()
+
+        self.assertEqual(rollup.feed_post_count, feed_post_count)
+        self.assertEqual(rollup.feed_comment_count, feed_comment_count)
+
+    def test_rolls_up_feed_with_its_last_rows(self):
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.commit()
+        session.close()
+
+        feed_loader = loader.FeedLoader(5)
+        feed_loader.add_post(10, '2018-05-01 10:00', 'https://a.com',
+            'Title', 'article', 'user', 'a.com')
+        feed_loader.add_feed_post(10, 4, 1, 6)
+        feed_loader.add_comment(20, 'One two three', '2018-05-01 10:30', 0,
+            None, 10, 3, 'user')
+        feed_loader.add_comment(21, 'Reply', '2018-05-01 10:31', 1, 20, 10,
+            1, 'other')
+        feed_loader.add_feed_comment(20, 1)
+        feed_loader.add_feed_comment(21, 2)
+        feed_loader.flush()
+
+        session = models.Session()
+        self.assertIsNone(session.get(models.FeedRollup, 5))
+        session.close()
+
+        # Roll up feed with its last (empty) flush, then again with a post
+        # added later
+        feed_loader.roll_up()
+        feed_loader.flush()
+
+        feed_loader.add_feed_post(1, 2, 2, 4)
+        feed_loader.roll_up()
+        feed_loader.flush()
+
+        session = models.Session()
+        rollup = session.get(models.FeedRollup, 5)
+        session.close()
+
+        self.assertEqual((rollup.feed_post_count, rollup.comment_count_sum,
+            rollup.point_count_sum), (2, 6, 10))
+        self.assertEqual((rollup.feed_comment_count, rollup.level_sum,
+            rollup.word_count_sum), (2, 1, 4))
+        self.assertEqual(feed_loader.rolled_up_feed_ids, [])
+
+    def test_updated_comment_changes_rolled_up_word_counts(self):
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.commit()
+        session.close()
+
+        feed_loader = loader.FeedLoader(5)
+        feed_loader.add_post(10, '2018-05-01 10:00', 'https://a.com',
+            'Title', 'article', 'user', 'a.com')
+        feed_loader.add_feed_post(10, 1, 1, 3)
+        feed_loader.add_comment(20, 'One two three', '2018-05-01 10:30', 0,
+            None, 10, 3, 'user')
+        feed_loader.add_feed_comment(20, 1)
+        feed_loader.roll_up()
+        feed_loader.flush()
+
+        # Rewrite the comment once its feed is rolled up, as a later scrape
+        # does when its content changed
+        feed_loader.update_comment(20, 'One two three four five', 5)
+        feed_loader.flush()
+
+        session = models.Session()
+        rollup = session.get(models.FeedRollup, 5)
+        session.close()
+
+        self.assertEqual((rollup.feed_comment_count, rollup.word_count_sum),
+            (1, 5))
+
+    def test_rolls_up_feeds_after_comments_shared_into_them(self):
+        session = models.Session()
+        session.add_all([models.Feed(id=5), models.Feed(id=6)])
+        session.commit()
+        session.close()
+
+        # Post is scraped for the second feed, which shares its comment
+        # ranks with the first feed once the first feed's rows are written
+        first_loader = loader.FeedLoader(5)
+        first_loader.add_post(10, '2018-05-01 10:00', 'https://a.com',
+            'Title', 'article', 'user', 'a.com')
+        first_loader.add_feed_post(10, 1, 2, 3)
+        second_loader = loader.FeedLoader(6)
+        second_loader.add_post(10, '2018-05-01 10:00', 'https://a.com',
+            'Title', 'article', 'user', 'a.com')
+        second_loader.add_feed_post(10, 1, 1, 3)
+        second_loader.add_comment(20, 'One two three', '2018-05-01 10:30', 0,
+            None, 10, 3, 'user')
+        second_loader.add_feed_comment(20, 1)
+        second_loader.share_comments(5, 10)
+
+        first_loader.flush()
+        second_loader.roll_up([5, 6])
+        second_loader.flush()
+
+        session = models.Session()
+        rollups = {feed_id: session.get(models.FeedRollup,
+            feed_id).feed_comment_count for feed_id in (5, 6)}
+        session.close()
+
+        self.assertEqual(rollups, {5: 1, 6: 1})
+
+    def test_averages_combine_rollups_with_feeds_being_scraped(self):
+        with app.test_request_context():
+            feed_ids = hacker_news.get_feeds('week')
+
+        self.assertGreater(len(feed_ids), 1)
+
+        # Leave a feed without a rollup, as if it was still being scraped
+        session = models.Session()
+        session.execute(text('DELETE FROM feed_rollup WHERE feed_id = '
+            ':feed_id'), {'feed_id': feed_ids[-1]})
+        session.commit()
+        session.close()
+
+        for endpoint, rows, column in AVERAGES:
+            with self.subTest(endpoint=endpoint):
+                response = self.client.get('/api/hacker_news/stats/week/' +
+                    endpoint)
+
+                self.assertEqual(response.get_json(), self.get_row_average(
+                    rows, column, feed_ids))
+
+    def test_all_time_averages_read_every_rollup(self):
+        session = models.Session()
+        feed_ids = session.execute(text('SELECT id FROM feed')).scalars().all()
+        session.close()
+
+        for endpoint, rows, column in AVERAGES:
+            with self.subTest(endpoint=endpoint):
+                response = self.client.get('/api/hacker_news/stats/all/' +
+                    endpoint)
+
+                # Comments are averaged once each, however many feeds list
+                # them
+                if rows == FEED_COMMENTS:
+                    average = self.get_post_comment_average(column)
+                else:
+                    average = self.get_row_average(rows, column, feed_ids)
+
+                self.assertEqual(response.get_json(), average)
+
+    def test_rolls_up_posts_comments_as_they_are_written(self):
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.commit()
+        session.close()
+
+        feed_loader = loader.FeedLoader(5)
+        feed_loader.add_post(10, '2018-05-01 10:00', 'https://a.com',
+            'Title', 'article', 'user', 'a.com')
+        feed_loader.add_comment(20, 'One two three', '2018-05-01 10:30', 0,
+            None, 10, 3, 'user')
+        feed_loader.add_comment(21, 'Reply', '2018-05-01 10:31', 1, 20, 10,
+            1, 'other')
+        feed_loader.flush()
+
+        # Rewrite a comment that changed, add another to the post and load
+        # one that is already written again
+        feed_loader.update_comment(21, 'Longer reply', 2)
+        feed_loader.add_comment(20, 'One two three', '2018-05-01 10:30', 0,
+            None, 10, 3, 'user')
+        feed_loader.add_comment(22, 'Last', '2018-05-01 10:32', 2, 21, 10, 1,
+            'user')
+        feed_loader.flush()
+
+        session = models.Session()
+        rollup = session.get(models.PostCommentRollup, 10)
+        session.close()
+
+        self.assertEqual((rollup.comment_count, rollup.level_sum,
+            rollup.word_count_sum), (3, 3, 6))
+
+    def test_averages_nothing_without_rows(self):
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.commit()
+        session.close()
+
+        # Roll up a feed with a post but no comments
+        feed_loader = loader.FeedLoader(5)
+        feed_loader.add_feed_post(1, 2, 2, 4)
+        feed_loader.roll_up()
+        feed_loader.flush()
+
+        session = models.Session()
+        level_average = hacker_news.get_rolled_up_average(session, [5],
+            models.FeedRollup.level_sum, models.FeedRollup.feed_comment_count,
+            None)
+
+        # Leave no front page feed or post rolled up
+        session.execute(text('DELETE FROM feed_rollup'))
+        session.execute(text('DELETE FROM post_comment_rollup'))
+        session.commit()
+        session.close()
+
+        self.assertIsNone(level_average)
+
+        for endpoint, rows, column in AVERAGES:
+            with self.subTest(endpoint=endpoint):
+                response = self.client.get('/api/hacker_news/stats/all/' +
+                    endpoint)
+
+                self.assertIsNone(response.get_json())
+
+    def test_backfill_rolls_up_feeds_without_rollups(self):
+        rollups = self.get_rollups()
+
+        session = models.Session()
+        session.execute(text('DELETE FROM feed_rollup WHERE feed_id <> 1'))
+        session.commit()
+        session.close()
+
+        self.assertEqual(management.backfill_feed_rollups(batch_size=2), 3)
+        self.assertEqual(self.get_rollups(), rollups)
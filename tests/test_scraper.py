@@ -0,0 +1,744 @@
+import asyncio
+import contextlib
+import io
+import os
+import time
+import tracemalloc
+import unittest
+
+from datetime import datetime, timedelta
+from sqlalchemy import event, text
+from types import SimpleNamespace
+from unittest import mock
+
+from hacker_news import (client, database, loader, models, parsers,
+    scraper)
+from utils import pages
+from utils.tests import (FixtureServer, HackerNewsTestCase, run_with_client,
+    scrape_feed)
+
+
+class FakeClient:
+    concurrency = 2
+
+    def __init__(self, delay=0):
+        self.delay = delay
+
+    def now(self):
+        return 0
+
+    async def fetch_feed_page(self, page, source='news'):
+        return page
+
+    async def fetch_post_page(self, post_id, page_number):
+        await asyncio.sleep(self.delay)
+
+        return post_id, page_number
+
+
+def parse_feed_page(page, parser_name):
+    if page == 2:
+        raise ValueError('bad feed page')
+
+    return [SimpleNamespace(id=str(page * 10 + i), comment_count=0,
+        feed_rank=i + 1) for i in range(3)]
+
+
+def parse_post_page(content, parser_name):
+    post_id, page_number = content
+
+    if post_id == '31':
+        raise ValueError('bad post page')
+
+    # Give the first post of every page a second page of comments
+    if post_id.endswith('0') and page_number is None:
+        return ['comment'] * 2, '2'
+
+    return ['comment'], None
+
+
+def iter_post_page(content, parser_name, batch_size):
+    yield parse_post_page(content, parser_name)
+
+
+@mock.patch.object(parsers, 'parse_feed_page', parse_feed_page)
+@mock.patch.object(parsers, 'parse_post_page', parse_post_page)
+@mock.patch.object(parsers, 'iter_post_page', iter_post_page)
+class ScrapeRunTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.feed_loader = mock.MagicMock(flush_async=mock.AsyncMock(),
+            row_spool=None)
+
+        add_feed_rows = mock.patch.object(scraper, 'add_feed_rows')
+        add_post_rows = mock.patch.object(scraper, 'add_post_rows')
+        self.add_feed_rows = add_feed_rows.start()
+        self.add_post_rows = add_post_rows.start()
+
+        mock.patch.object(database, 'get_previous_comment_counts',
+            return_value={}).start()
+        self.addCleanup(mock.patch.stopall)
+
+    async def test_waits_for_every_post_and_more_page(self):
+        summary = await scraper.ScrapeRun(1, FakeClient(delay=0.01),
+            queue_size=2, feed_loader=self.feed_loader,
+            parse_workers=0).run(pages=(1, 4))
+
+        added_pages = [(call.args[0], len(call.args[1]))
+            for call in self.add_post_rows.call_args_list]
+
+        self.assertEqual(len(added_pages), 8)
+        self.assertIn(('40', 1), added_pages)
+        self.assertEqual(self.add_feed_rows.call_count, 2)
+        self.assertEqual(summary.posts, 6)
+        self.assertEqual(summary.comments, 10)
+        self.assertEqual(summary.pages, 10)
+        self.assertTrue(summary.complete)
+
+    async def test_adds_post_pages_in_order(self):
+        await scraper.ScrapeRun(1, FakeClient(), feed_loader=self.feed_loader,
+            parse_workers=0).run(pages=(1,))
+
+        calls = [call.args for call in self.add_post_rows.call_args_list
+            if call.args[0] == '10']
+
+        # Ensure both pages of post share the comment tree's parents
+        self.assertEqual([len(args[1]) for args in calls], [2, 1])
+        self.assertIs(calls[0][2], calls[1][2])
+
+    async def test_records_failures_without_stopping_run(self):
+        self.add_post_rows.side_effect = lambda post_id, *args: (
+            post_id == '12' and 1 / 0)
+
+        summary = await scraper.ScrapeRun(1, FakeClient(),
+            feed_loader=self.feed_loader, parse_workers=0).run()
+
+        self.assertEqual(summary.posts, 6)
+        self.assertEqual(sorted(description
+            for description, _ in summary.failures),
+            ['news page 2', 'post 12 page 1', 'post 31 page 1'])
+        self.assertFalse(summary.complete)
+
+    async def test_stops_at_deadline(self):
+        summary = await scraper.ScrapeRun(1, FakeClient(delay=10),
+            deadline=0.1, feed_loader=self.feed_loader,
+            parse_workers=0).run()
+
+        # Ensure rows scraped before the deadline are still written
+        self.add_feed_rows.assert_called()
+        self.feed_loader.flush_async.assert_awaited_once()
+        self.assertTrue(summary.timed_out)
+        self.assertEqual(summary.comments, 0)
+        self.assertLess(summary.wall_time, 1)
+
+
+class ExistenceCheckTest(HackerNewsTestCase):
+    def scrape_post_statements(self, post_id):
+        statements = []
+
+        def record(*args):
+            statements.append(args[2])
+
+        async def scrape_post(feed_id):
+            async with client.HackerNewsClient(
+                fixture_server.url) as hn_client:
+                    return await scraper.scrape_post(post_id, feed_id,
+                        hn_client, None)
+
+        # Add feed after sample feeds, which are inserted with explicit ids
+        feed_id = 5
+
+        session = models.Session()
+        session.add(models.Feed(id=feed_id))
+        session.commit()
+        session.close()
+
+        event.listen(models.engine, 'before_cursor_execute', record)
+
+        try:
+            with FixtureServer() as fixture_server:
+                asyncio.run(scrape_post(feed_id))
+        finally:
+            event.remove(models.engine, 'before_cursor_execute', record)
+
+        return statements
+
+    def test_checks_existing_comments_in_one_query(self):
+        statements = self.scrape_post_statements(1)
+        queries = [statement for statement in statements
+            if statement.startswith('SELECT')]
+
+        # Ensure the page's comment ids are looked up in one query (rows are
+        # then written by the feed loader's inserts)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('comment.id IN', queries[0])
+
+
+class ParentResolutionTest(HackerNewsTestCase):
+    def test_resolves_parent_on_continuation_page(self):
+        session = models.Session()
+        comment = session.get(models.Comment, 5)
+        session.close()
+
+        self.assertEqual(comment.level, 1)
+        self.assertEqual(comment.parent_comment, 4)
+
+    def test_resolves_parents_across_more_pages_in_parse_workers(self):
+        thread = pages.synthetic_thread(80, seed=3)
+        generated_pages = {
+            '/news?p=1': pages.feed_page(pages.synthetic_posts(1, first_id=1)),
+            '/item?id=1': pages.post_page(1, thread[:40], more_page=2),
+            '/item?id=1&p=2': pages.post_page(1, thread[40:]),
+            }
+
+        async def scrape_feed(feed_id):
+            async with client.HackerNewsClient(
+                fixture_server.url) as hn_client:
+                    return await scraper.ScrapeRun(feed_id, hn_client,
+                        parse_workers=2).run(pages=(1,))
+
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.commit()
+
+        with FixtureServer(pages=generated_pages) as fixture_server:
+            summary = asyncio.run(scrape_feed(5))
+
+        rows = dict(session.query(models.Comment.id,
+            models.Comment.parent_comment).filter(
+            models.Comment.id >= thread[0]['id']).all())
+        session.close()
+
+        # Ensure the thread continues below a comment from the first page
+        self.assertGreater(thread[40]['level'], 0)
+        self.assertEqual(summary.comments, 80)
+        self.assertEqual(rows, {comment['id']: comment['parent_comment']
+            for comment in thread})
+
+
+class IncrementalScrapeTest(HackerNewsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.posts = pages.synthetic_posts(2, first_id=901)
+        self.threads = {}
+
+        for post in self.posts:
+            self.threads[post['id']] = pages.synthetic_thread(5,
+                first_id=post['id'] * 100, seed=post['id'])
+            post['comment_count'] = 5
+
+    def scrape_feed(self, feed_id, created, failing_post_ids=(), **kwargs):
+        generated_pages = {'/news?p=1': pages.feed_page(self.posts)}
+
+        for post_id, thread in self.threads.items():
+            if post_id not in failing_post_ids:
+                generated_pages['/item?id=' + str(post_id)] = (
+                    pages.post_page(post_id, thread))
+
+        return scrape_feed(feed_id, generated_pages, created=created,
+            **kwargs)
+
+    def feed_comment_ranks(self, feed_id, post_id):
+        session = models.Session()
+        rows = session.query(models.FeedComment.comment_id,
+            models.FeedComment.feed_rank).join(models.Comment,
+            models.Comment.id == models.FeedComment.comment_id).filter(
+            models.FeedComment.feed_id == feed_id,
+            models.Comment.post_id == post_id).all()
+        session.close()
+
+        return dict(rows)
+
+    def test_carries_forward_unchanged_posts(self):
+        now = datetime.utcnow()
+        self.scrape_feed(5, now - timedelta(hours=1))
+
+        # Give second post a new comment
+        self.threads[902].append(dict(self.threads[902][-1], id=90299))
+        self.posts[1]['comment_count'] = 6
+
+        summary, requests = self.scrape_feed(6, now, incremental=True)
+
+        self.assertNotIn('/item?id=901', requests)
+        self.assertIn('/item?id=902', requests)
+        self.assertEqual(summary.carried_posts, 1)
+        self.assertEqual(self.feed_comment_ranks(6, 901),
+            self.feed_comment_ranks(5, 901))
+        self.assertEqual(len(self.feed_comment_ranks(6, 902)), 6)
+
+        session = models.Session()
+        carried = dict(session.query(models.FeedPost.post_id,
+            models.FeedPost.comments_carried).filter(
+            models.FeedPost.feed_id == 6).all())
+        session.close()
+
+        self.assertEqual(carried, {901: True, 902: False})
+
+    def test_refetches_posts_whose_pages_failed(self):
+        now = datetime.utcnow()
+        self.scrape_feed(5, now - timedelta(hours=2))
+
+        # Fail first post's page once it has a new comment
+        self.posts[0]['comment_count'] = 6
+        self.scrape_feed(6, now - timedelta(hours=1), failing_post_ids=[901],
+            incremental=True)
+
+        session = models.Session()
+        skipped = dict(session.query(models.FeedPost.post_id,
+            models.FeedPost.comments_skipped).filter(
+            models.FeedPost.feed_id == 6).all())
+        session.close()
+
+        self.assertEqual(skipped, {901: True, 902: False})
+
+        # Scrape post again, rather than carrying forward its comments from
+        # the feed they weren't scraped for
+        summary, requests = self.scrape_feed(7, now, incremental=True)
+
+        self.assertIn('/item?id=901', requests)
+        self.assertNotIn('/item?id=902', requests)
+        self.assertEqual(summary.carried_posts, 1)
+        self.assertEqual(self.feed_comment_ranks(7, 901),
+            self.feed_comment_ranks(5, 901))
+
+    def test_refetches_posts_scraped_before_refresh_interval(self):
+        now = datetime.utcnow()
+        self.scrape_feed(5, now - timedelta(hours=7))
+
+        summary, requests = self.scrape_feed(6, now, incremental=True,
+            refresh_hours=6)
+
+        self.assertIn('/item?id=901', requests)
+        self.assertIn('/item?id=902', requests)
+        self.assertEqual(summary.carried_posts, 0)
+
+
+def get_thread_pages(thread):
+    # Serve a feed of one post with the given comment thread
+    return {
+        '/news?p=1': pages.feed_page(pages.synthetic_posts(1, first_id=901)),
+        '/item?id=901': pages.post_page(901, thread),
+        }
+
+
+class ContentChangeTest(HackerNewsTestCase):
+    def scrape_feed(self, feed_id, thread):
+        # Record which comments are rewritten
+        patch = mock.patch.object(loader.FeedLoader, 'update_comment',
+            autospec=True, side_effect=loader.FeedLoader.update_comment)
+
+        with patch as update_comment:
+            scrape_feed(feed_id, get_thread_pages(thread))
+
+        return [call.args[1] for call in update_comment.call_args_list]
+
+    def test_rewrites_only_changed_comments(self):
+        thread = pages.synthetic_thread(5, first_id=90100, seed=1)
+
+        self.assertEqual(self.scrape_feed(5, thread), [])
+        self.assertEqual(self.scrape_feed(6, thread), [])
+
+        # Flag second comment after it was stored
+        thread[1] = dict(thread[1], content='[flagged]')
+
+        self.assertEqual(self.scrape_feed(7, thread), ['90101'])
+
+        session = models.Session()
+        contents = dict(session.query(models.Comment.id,
+            models.Comment.content).filter(
+            models.Comment.post_id == 901).all())
+        session.close()
+
+        self.assertEqual(contents[90101], '[flagged]')
+        self.assertEqual(len(contents), 5)
+
+
+class IntervalStorageTest(HackerNewsTestCase):
+    def scrape_feed(self, feed_id, thread):
+        scrape_feed(feed_id, get_thread_pages(thread))
+
+    def test_extends_intervals_of_unchanged_comments(self):
+        thread = pages.synthetic_thread(20, first_id=90100, seed=1)
+
+        for feed_id in range(5, 15):
+            self.scrape_feed(feed_id, thread)
+
+        # Move last comment to the top of the thread, changing every rank
+        thread = [dict(thread[-1], level=0, parent_comment=None)] + thread[:-1]
+
+        self.scrape_feed(15, thread)
+
+        session = models.Session()
+        interval_count = session.query(models.CommentInterval).filter(
+            models.CommentInterval.comment_id >= 90100).count()
+        feed_comment_count = session.query(models.FeedComment).filter(
+            models.FeedComment.comment_id >= 90100).count()
+        first_ranks = dict(session.query(models.FeedComment.comment_id,
+            models.FeedComment.feed_rank).filter(
+            models.FeedComment.feed_id == 5).all())
+        last_ranks = dict(session.query(models.FeedComment.comment_id,
+            models.FeedComment.feed_rank).filter(
+            models.FeedComment.feed_id == 15).all())
+        session.close()
+
+        # Store one interval per comment for ten unchanged feeds, and a new
+        # one for each comment whose rank changed
+        self.assertEqual(feed_comment_count, 20 * 11)
+        self.assertEqual(interval_count, 20 * 2)
+        self.assertEqual(first_ranks[90119], 20)
+        self.assertEqual(last_ranks[90119], 1)
+        self.assertEqual(last_ranks[90100], 2)
+
+
+class SourcesTest(unittest.TestCase):
+    def test_reads_lists_and_page_depths(self):
+        self.assertEqual(scraper.get_sources('news:3, best, newest:2'), [
+            scraper.FeedSource('news', (1, 2, 3)),
+            scraper.FeedSource('best', (1,)),
+            scraper.FeedSource('newest', (1, 2)),
+            ])
+
+    def test_rejects_unknown_list(self):
+        with self.assertRaises(ValueError):
+            scraper.get_sources('news:3,jobs:1')
+
+
+class MultiSourceScrapeTest(HackerNewsTestCase):
+    def test_fetches_post_listed_by_several_feeds_once(self):
+        posts = pages.synthetic_posts(4, first_id=901)
+        threads = {post['id']: pages.synthetic_thread(3,
+            first_id=post['id'] * 100, seed=post['id']) for post in posts}
+
+        # Post 902 is on both front pages and best page, and post 904 is only
+        # on best page
+        generated_pages = {
+            '/news?p=1': pages.feed_page(posts[:2]),
+            '/news?p=2': pages.feed_page(posts[1:3]),
+            '/best?p=1': pages.feed_page([posts[3], posts[1]]),
+            }
+
+        for post_id, thread in threads.items():
+            generated_pages['/item?id=' + str(post_id)] = pages.post_page(
+                post_id, thread)
+
+        # Start new feeds after sample feeds, which are inserted with
+        # explicit ids
+        session = models.Session()
+        session.execute(text("SELECT setval('feed_id_seq', 10)"))
+        session.commit()
+        session.close()
+
+        with FixtureServer(pages=generated_pages) as fixture_server:
+            os.environ['HN_BASE_URL'] = fixture_server.url
+
+            try:
+                summary = scraper.scrape_loop('news:2,best:1')
+            finally:
+                del os.environ['HN_BASE_URL']
+
+        news_feed_id, best_feed_id = summary.feed_ids
+
+        session = models.Session()
+        feeds = session.query(models.Feed.id, models.Feed.source).filter(
+            models.Feed.id.in_(summary.feed_ids))
+        sources = dict(feeds.all())
+        best_ranks = dict(session.query(models.FeedPost.post_id,
+            models.FeedPost.feed_rank).filter_by(feed_id=best_feed_id).all())
+        shared_comments = [dict(session.query(models.FeedComment.comment_id,
+            models.FeedComment.feed_rank).join(models.Comment).filter(
+            models.Comment.post_id == 902,
+            models.FeedComment.feed_id == feed_id).all())
+            for feed_id in summary.feed_ids]
+        rolled_up_counts = [session.get(models.FeedRollup,
+            feed_id).feed_comment_count for feed_id in summary.feed_ids]
+        comment_counts = [session.query(models.FeedComment).filter_by(
+            feed_id=feed_id).count() for feed_id in summary.feed_ids]
+        session.close()
+
+        item_requests = [request for request in fixture_server.requests
+            if request.startswith('/item')]
+
+        self.assertTrue(summary.complete)
+        self.assertEqual(rolled_up_counts, comment_counts)
+        self.assertEqual(sources, {news_feed_id: 'news',
+            best_feed_id: 'best'})
+        self.assertEqual(sorted(item_requests), ['/item?id=901',
+            '/item?id=902', '/item?id=903', '/item?id=904'])
+        self.assertEqual(best_ranks, {904: 1, 902: 2})
+        self.assertEqual(len(shared_comments[0]), 3)
+        self.assertEqual(shared_comments[0], shared_comments[1])
+
+
+class RetryTest(HackerNewsTestCase):
+    def test_retries_more_page_instead_of_losing_rest_of_thread(self):
+        thread = pages.synthetic_thread(20, seed=4)
+        generated_pages = {
+            '/news?p=1': pages.feed_page(pages.synthetic_posts(1,
+                first_id=901)),
+            '/item?id=901': pages.post_page(901, thread[:10], more_page=2),
+            '/item?id=901&p=2': pages.post_page(901, thread[10:]),
+            }
+
+        async def scrape(hn_client):
+            return await scraper.ScrapeRun(5, hn_client,
+                parse_workers=0).run(pages=(1,))
+
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.commit()
+        session.close()
+
+        with FixtureServer(pages=generated_pages,
+            errors={'/item?id=901&p=2': [503, 503]}) as fixture_server:
+                summary = asyncio.run(run_with_client(fixture_server, scrape,
+                    backoff=0.01))
+
+        self.assertTrue(summary.complete)
+        self.assertEqual(summary.comments, 20)
+        self.assertEqual(fixture_server.requests.count('/item?id=901&p=2'), 3)
+
+
+class PrefetchTest(HackerNewsTestCase):
+    def test_fetches_continuation_pages_at_once_and_stitches_in_order(self):
+        thread = pages.synthetic_thread(120, seed=5)
+        post = pages.synthetic_posts(1, first_id=901)[0]
+        post['comment_count'] = 120
+
+        generated_pages = {
+            '/news?p=1': pages.feed_page([post]),
+            '/item?id=901': pages.post_page(901, thread[:30], more_page=2),
+            '/item?id=901&p=2': pages.post_page(901, thread[30:60],
+                more_page=3),
+            '/item?id=901&p=3': pages.post_page(901, thread[60:90],
+                more_page=4),
+            '/item?id=901&p=4': pages.post_page(901, thread[90:]),
+            }
+
+        async def scrape(hn_client):
+            return await scraper.ScrapeRun(5, hn_client,
+                parse_workers=0).run(pages=(1,))
+
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.commit()
+
+        with FixtureServer(delay=0.2, pages=generated_pages) as fixture_server:
+            summary = asyncio.run(run_with_client(fixture_server, scrape))
+
+        rows = session.query(models.Comment.id, models.Comment.parent_comment,
+            models.FeedComment.feed_rank).join(models.FeedComment).filter(
+            models.FeedComment.feed_id == 5).order_by(
+            models.FeedComment.feed_rank).all()
+        session.close()
+
+        # Ensure pages 2 to 4 were requested together once page 1 showed
+        # how many comments a page holds
+        self.assertEqual(summary.comments, 120)
+        self.assertEqual(fixture_server.max_in_flight, 3)
+        self.assertEqual(len(fixture_server.requests), 5)
+        self.assertEqual([(row.id, row.parent_comment, row.feed_rank)
+            for row in rows], [(comment['id'], comment['parent_comment'],
+            rank) for rank, comment in enumerate(thread, 1)])
+
+
+class PriorityTest(HackerNewsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.posts = pages.synthetic_posts(5, first_id=901)
+
+        for post in self.posts:
+            post['comment_count'] = 2
+
+    def scrape_feed(self, feed_id, delay=0, **kwargs):
+        generated_pages = {'/news?p=1': pages.feed_page(self.posts)}
+
+        for post in self.posts:
+            generated_pages['/item?id=' + str(post['id'])] = pages.post_page(
+                post['id'], pages.synthetic_thread(2,
+                first_id=post['id'] * 100, seed=post['id']))
+
+        summary, requests = scrape_feed(feed_id, generated_pages, delay=delay,
+            concurrency=1, **kwargs)
+
+        return summary, [request for request in requests
+            if request.startswith('/item')]
+
+    def test_scrapes_posts_gaining_most_comments_first(self):
+        self.scrape_feed(5)
+
+        # Bottom post gains ten comments and next to bottom post gains two
+        # before the next scrape
+        self.posts[4]['comment_count'] = 12
+        self.posts[3]['comment_count'] = 4
+
+        summary, item_requests = self.scrape_feed(6)
+
+        self.assertTrue(summary.complete)
+        self.assertEqual(item_requests, ['/item?id=905', '/item?id=901',
+            '/item?id=904', '/item?id=902', '/item?id=903'])
+
+    def test_skips_lowest_priority_posts_after_time_budget(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary, item_requests = self.scrape_feed(5, delay=0.3,
+                budget=0.45)
+
+        # Ensure the post started within budget was finished and the rest
+        # were recorded as skipped
+        self.assertEqual(item_requests, ['/item?id=901'])
+        self.assertEqual(summary.comments, 2)
+        self.assertEqual(summary.skipped_posts, ['902', '903', '904', '905'])
+        self.assertFalse(summary.complete)
+        self.assertFalse(summary.timed_out)
+        self.assertIn('4 lowest priority posts skipped', str(summary))
+
+        session = models.Session()
+        skipped = dict(session.query(models.FeedPost.post_id,
+            models.FeedPost.comments_skipped).filter(
+            models.FeedPost.feed_id == 5).all())
+        session.close()
+
+        self.assertEqual(skipped, {901: False, 902: True, 903: True,
+            904: True, 905: True})
+
+
+class LongThreadTest(HackerNewsTestCase):
+    def test_keeps_memory_bounded_while_scraping_long_thread(self):
+        post = pages.synthetic_posts(1, first_id=901)[0]
+        post['comment_count'] = 5000
+        thread = pages.synthetic_thread(5000, seed=9)
+
+        feed_content = pages.feed_page([post])
+        post_content = pages.post_page(901, thread)
+
+        class PageClient:
+            concurrency = 1
+
+            def now(self):
+                return time.time()
+
+            async def fetch_feed_page(self, page, source='news'):
+                return feed_content
+
+            async def fetch_post_page(self, post_id, page_number):
+                return post_content
+
+        async def scrape():
+            return await scraper.ScrapeRun(5, PageClient(), queue_size=2,
+                parse_workers=0, batch_size=100,
+                max_buffered_comments=500).run(pages=(1,))
+
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.commit()
+
+        # Compare memory held at once during scrape with memory that the
+        # page's comment records take when it is parsed all at once
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+
+        comments, _ = parsers.parse_post_page(post_content, 'lxml')
+        records_size = tracemalloc.get_traced_memory()[0]
+        del comments
+
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = asyncio.run(scrape())
+
+        peak = tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+
+        comment_count = session.query(models.FeedComment).filter(
+            models.FeedComment.feed_id == 5).count()
+        session.close()
+
+        # Ensure that scraping held less than half as much as the records of
+        # a page parsed all at once
+        self.assertTrue(summary.complete)
+        self.assertEqual(comment_count, 5000)
+        self.assertLess(peak, records_size / 2)
+
+
+class DaemonTest(HackerNewsTestCase):
+    def run_daemon(self, delay=0, **kwargs):
+        posts = pages.synthetic_posts(2, first_id=901)
+        generated_pages = {'/news?p=1': pages.feed_page(posts)}
+
+        for post in posts:
+            generated_pages['/item?id=' + str(post['id'])] = pages.post_page(
+                post['id'], pages.synthetic_thread(3,
+                first_id=post['id'] * 100, seed=post['id']))
+
+        # Start new feeds after sample feeds, which are inserted with
+        # explicit ids
+        session = models.Session()
+        session.execute(text("SELECT setval('feed_id_seq', 10)"))
+        session.commit()
+        session.close()
+
+        output = io.StringIO()
+
+        with FixtureServer(delay=delay,
+            pages=generated_pages) as fixture_server:
+                with (
+                    mock.patch.dict(os.environ, {
+                        'HN_BASE_URL': fixture_server.url,
+                        'SCRAPE_CONCURRENCY': '1',
+                        'SCRAPE_PARSE_WORKERS': '0',
+                        'SCRAPE_SOURCES': 'news:1',
+                        }),
+                    contextlib.redirect_stdout(output),
+                ):
+                    summaries = scraper.scrape_daemon(**kwargs)
+
+        session = models.Session()
+        created = [session.get(models.Feed, summary.feed_ids[0]).created
+            for summary in summaries]
+        session.close()
+
+        return summaries, created, fixture_server, output.getvalue()
+
+    def test_reuses_connection_between_scheduled_scrapes(self):
+        summaries, created, fixture_server, _ = self.run_daemon(interval=0.5,
+            runs=2)
+
+        self.assertEqual(len(summaries), 2)
+        self.assertTrue(all(summary.complete for summary in summaries))
+        self.assertGreaterEqual((created[1] - created[0]).total_seconds(),
+            0.45)
+        self.assertEqual(len(fixture_server.requests), 6)
+        self.assertEqual(len(fixture_server.client_ports), 1)
+
+    def test_skips_scrapes_that_would_overlap_running_one(self):
+        summaries, created, _, output = self.run_daemon(delay=0.3,
+            interval=0.2, runs=2)
+
+        self.assertGreaterEqual((created[1] - created[0]).total_seconds(),
+            summaries[0].wall_time)
+        self.assertRegex(output, r'Skipped [1-9]\d* scheduled scrapes')
+
+    def test_keeps_scraping_after_a_scrape_fails(self):
+        add_feeds = scraper.add_feeds
+        calls = []
+
+        # Fail first scrape as if database was unavailable
+        def add_feeds_once_database_is_up(sources):
+            calls.append(sources)
+
+            if len(calls) == 1:
+                raise OSError('Database is unavailable')
+
+            return add_feeds(sources)
+
+        patch = mock.patch.object(scraper, 'add_feeds',
+            side_effect=add_feeds_once_database_is_up)
+
+        with patch:
+            summaries, _, _, output = self.run_daemon(interval=0.1, runs=2)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(summaries), 1)
+        self.assertTrue(summaries[0].complete)
+        self.assertIn('Scheduled scrape failed', output)
@@ -0,0 +1,155 @@
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from sqlalchemy.exc import OperationalError
+from unittest import mock
+
+from hacker_news import client, database, loader, models, scraper, spool
+from utils import pages
+from utils.tests import FixtureServer, HackerNewsTestCase
+
+
+class RowSpoolTest(HackerNewsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        self.row_spool = spool.RowSpool(os.path.join(self.directory.name,
+            'spool'))
+
+        session = models.Session()
+        session.add(models.Feed(id=5))
+        session.commit()
+        session.close()
+
+        posts = pages.synthetic_posts(3, first_id=901)
+        self.generated_pages = {'/news?p=1': pages.feed_page(posts)}
+
+        for post in posts:
+            self.generated_pages['/item?id=' + str(post['id'])] = (
+                pages.post_page(post['id'], pages.synthetic_thread(4,
+                first_id=post['id'] * 100, seed=post['id'])))
+
+    def scrape(self):
+        async def scrape():
+            async with client.HackerNewsClient(
+                fixture_server.url) as hn_client:
+                    return await scraper.ScrapeRun(5, hn_client,
+                        parse_workers=0, row_spool=self.row_spool).run(
+                        pages=(1,))
+
+        with FixtureServer(pages=self.generated_pages) as fixture_server:
+            return asyncio.run(scrape())
+
+    def count_rows(self):
+        session = models.Session()
+        counts = (session.query(models.FeedPost).filter(
+            models.FeedPost.feed_id == 5).count(),
+            session.query(models.FeedComment).filter(
+            models.FeedComment.feed_id == 5).count())
+        session.close()
+
+        return counts
+
+    def test_writes_spooled_rows_once_drained(self):
+        summary = self.scrape()
+
+        self.assertEqual(summary.comments, 12)
+        self.assertEqual(self.count_rows(), (0, 0))
+        self.assertEqual(len(self.row_spool.list_batches()), 1)
+
+        # Keep a copy of batch to write it again, as if spool was drained
+        # but the batch wasn't removed before a crash
+        copy_directory = os.path.join(self.directory.name, 'copy')
+        shutil.copytree(self.row_spool.directory, copy_directory)
+
+        self.assertEqual(self.row_spool.drain(), 1)
+        self.assertEqual(self.row_spool.list_batches(), [])
+        self.assertEqual(self.count_rows(), (3, 12))
+
+        shutil.rmtree(self.row_spool.directory)
+        shutil.copytree(copy_directory, self.row_spool.directory)
+
+        self.assertEqual(self.row_spool.drain(), 1)
+        self.assertEqual(self.count_rows(), (3, 12))
+
+    def test_keeps_rows_while_database_is_unavailable(self):
+        unavailable = OperationalError('SELECT', {}, Exception('unavailable'))
+
+        # Spool every row without checking which are already stored
+        with mock.patch.object(scraper, 'get_existing_ids',
+            side_effect=unavailable), mock.patch.object(scraper,
+            'get_content_hashes', side_effect=unavailable):
+                summary = self.scrape()
+
+        self.assertTrue(summary.complete)
+
+        output = io.StringIO()
+
+        with mock.patch.object(loader, 'write_rows', side_effect=unavailable):
+            with contextlib.redirect_stdout(output):
+                drained = scraper.drain_spool(self.row_spool)
+
+        self.assertIsNone(drained)
+        self.assertIn('Spooled rows not written', output.getvalue())
+        self.assertEqual(len(self.row_spool.list_batches()), 1)
+        self.assertEqual(self.count_rows(), (0, 0))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(scraper.drain_spool(self.row_spool), 1)
+
+        self.assertEqual(self.count_rows(), (3, 12))
+
+    def test_spools_rows_while_database_is_too_slow_to_answer(self):
+        self.row_spool.query_timeout = 0.05
+        get_existing_ids = scraper.get_existing_ids
+
+        def get_existing_ids_slowly(*args):
+            time.sleep(0.2)
+
+            return get_existing_ids(*args)
+
+        with mock.patch.object(scraper, 'get_existing_ids',
+            side_effect=get_existing_ids_slowly):
+                summary = self.scrape()
+
+        self.assertTrue(summary.complete)
+        self.assertEqual(summary.comments, 12)
+        self.assertLess(summary.wall_time, 1)
+        self.assertEqual(len(self.row_spool.list_batches()), 1)
+
+        self.assertEqual(self.row_spool.drain(), 1)
+        self.assertEqual(self.count_rows(), (3, 12))
+
+    def test_orders_posts_by_rank_while_database_is_too_slow(self):
+        self.row_spool.query_timeout = 0.05
+
+        async def get_previous_comment_counts_slowly(*args):
+            await asyncio.sleep(10)
+
+            return {}
+
+        with mock.patch.object(database, 'get_previous_comment_counts',
+            get_previous_comment_counts_slowly):
+                summary = self.scrape()
+
+        self.assertTrue(summary.complete)
+        self.assertEqual(summary.comments, 12)
+        self.assertLess(summary.wall_time, 1)
+
+    def test_ignores_partly_written_batches(self):
+        os.makedirs(self.row_spool.directory)
+
+        with open(os.path.join(self.row_spool.directory,
+            '1-1-1.jsonl.tmp'), 'w') as batch_file:
+                batch_file.write('{"table": "feed_post", "rows": [[5, ')
+
+        self.assertEqual(self.row_spool.list_batches(), [])
+        self.assertEqual(self.row_spool.drain(), 0)
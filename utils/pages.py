@@ -0,0 +1,137 @@
+import random
+
+from html import escape
+
+WORDS = ('the quick brown fox jumps over lazy dog hacker news thread reply '
+    'database query parser async event loop rust python postgres index '
+    'benchmark latency throughput cache memory disk network').split()
+
+
+# Build feed and post pages with the same markup as news.ycombinator.com so
+# tests and benchmarks can scrape pages of any size
+def feed_page(posts, more_page=None):
+    rows = []
+
+    for rank, post in enumerate(posts, 1):
+        rows.append(
+            f"<tr class='athing submission' id='{post['id']}'>"
+            f'<td align="right" valign="top" class="title">'
+            f'<span class="rank">{rank}.</span></td>'
+            f'<td valign="top" class="votelinks"></td><td class="title">'
+            f'<span class="titleline"><a href="{escape(post["link"])}">'
+            f'{escape(post["title"])}</a><span class="sitebit comhead"> ('
+            f'<a href="from?site={post["website"]}"><span class="sitestr">'
+            f'{post["website"]}</span></a>)</span></span></td></tr>'
+            f'<tr><td colspan="2"></td><td class="subtext">'
+            f'<span class="subline"><span class="score" '
+            f'id="score_{post["id"]}">{post["point_count"]} points</span> '
+            f'by <a href="user?id={post["username"]}" class="hnuser">'
+            f'{post["username"]}</a> <span class="age">'
+            f'<a href="item?id={post["id"]}">{post["age"]}</a></span> | '
+            f'<a href="item?id={post["id"]}">'
+            f'{post["comment_count"]}&nbsp;comments</a></span></td></tr>'
+            f'<tr class="spacer" style="height:5px"></tr>')
+
+    if more_page:
+        rows.append(f'<tr class="morespace"></tr><tr><td colspan="2"></td>'
+            f'<td class="title"><a href="?p={more_page}" class="morelink" '
+            f'rel="next">More</a></td></tr>')
+
+    return ('<html lang="en" op="news"><body><center><table id="hnmain">'
+        '<tr><td><table border="0" class="itemlist">' + ''.join(rows) +
+        '</table></td></tr></table></center></body></html>').encode('utf-8')
+
+
+def post_page(post_id, comments, more_page=None):
+    rows = []
+
+    for comment in comments:
+        if comment['content'] is None:
+            body = '<div class="comment"></div>'
+            user = ''
+        else:
+            body = (f'<div class="comment"><span class="commtext c00">'
+                f'{escape(comment["content"])}<span>\n</span>'
+                f'<div class="reply"> <p><font size="1">\n<u>'
+                f'<a href="reply?id={comment["id"]}">reply</a></u>\n'
+                f'</font>\n</p></div></span></div>')
+            user = (f'<a href="user?id={comment["username"]}" '
+                f'class="hnuser">{comment["username"]}</a> ')
+
+        rows.append(
+            f"<tr class='athing comtr' id='{comment['id']}'><td>"
+            f"<table border='0'><tr><td class='ind' "
+            f"indent='{comment['level']}'><img src=\"s.gif\" height=\"1\" "
+            f"width=\"{comment['level'] * 40}\"></td>"
+            f'<td valign="top" class="votelinks"></td><td class="default">'
+            f'<div style="margin-top:2px; margin-bottom:-10px;">'
+            f'<span class="comhead">{user}<span class="age">'
+            f'<a href="item?id={comment["id"]}">{comment["age"]}</a></span>'
+            f'</span></div><br>{body}</td></tr></table></td></tr>')
+
+    if more_page:
+        rows.append(f'<tr class="morespace"></tr><tr><td><table><tr><td>'
+            f'</td><td class="title"><a href="item?id={post_id}&amp;'
+            f'p={more_page}" class="morelink" rel="next">More</a></td></tr>'
+            f'</table></td></tr>')
+
+    return ('<html lang="en" op="item"><body><center><table id="hnmain">'
+        '<tr><td><table border="0" class="comment-tree">' + ''.join(rows) +
+        '</table></td></tr></table></center></body></html>').encode('utf-8')
+
+
+def synthetic_posts(count, first_id=1000, seed=0):
+    generator = random.Random(seed)
+    posts = []
+
+    for i in range(count):
+        website = generator.choice(WORDS) + '.com'
+        title = ' '.join(generator.choice(WORDS) for _ in range(6))
+        posts.append({
+            'id': first_id + i,
+            'age': str(generator.randint(1, 23)) + ' hours ago',
+            'comment_count': generator.randint(0, 500),
+            'link': 'https://' + website + '/' + str(i),
+            'point_count': generator.randint(1, 900),
+            'title': generator.choice(['', 'Show HN: ', 'Ask HN: ']) + title,
+            'username': 'user' + str(generator.randint(1, 50)),
+            'website': website,
+            })
+
+    return posts
+
+
+# Generate a depth-first comment thread where each comment is at most one
+# level deeper than the comment before it, as on a real post page
+def synthetic_thread(count, first_id=100000, seed=0):
+    generator = random.Random(seed)
+    comments = []
+    parents = []
+    level = 0
+
+    for i in range(count):
+        if i and generator.random() < 0.6:
+            level = min(level + 1, 12)
+        elif i:
+            level = generator.randint(0, level)
+
+        if generator.random() < 0.02:
+            content = None
+        else:
+            content = ' '.join(generator.choice(WORDS)
+                for _ in range(generator.randint(1, 80)))
+
+        del parents[level:]
+
+        comments.append({
+            'id': first_id + i,
+            'age': str(generator.randint(1, 59)) + ' minutes ago',
+            'content': content,
+            'level': level,
+            'parent_comment': parents[-1] if parents else None,
+            'username': 'user' + str(generator.randint(1, 300)),
+            })
+
+        parents.append(first_id + i)
+
+    return comments
@@ -1,75 +1,178 @@
 import alembic.config
+import asyncio
+import gzip
 import json
 import os
 import testing.postgresql
+import threading
+import time
 import unittest
 
 from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import func
 from testing.common.database import DatabaseFactory
-from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-from hacker_news import hacker_news, models
+from hacker_news import client, loader, models, scraper
 from server import app
 
 import management
 
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'fixtures')
 
-# Mock requests to Hacker News to test scrape function
-def mocked_requests_get(*args, **kwargs):
-    class MockResponse:
-        def __init__(self, content, status_code):
-            self.content = content
-            self.status_code = status_code
 
-    feed_urls = []
-    feed_pages = []
+# Serve fixture pages in place of Hacker News to test scrape function
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
 
-    post_urls = []
-    post_pages = []
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
 
-    for i in range(1, 4):
-        feed_urls.append('https://news.ycombinator.com/news?p=' + str(i))
+        self.server.requests.append(self.path)
+        self.server.client_ports.add(self.client_address[1])
 
-        feed_page = 'fixtures/test-feed-page-' + str(i) + '.html'
+        # Answer with the next error status injected for this path, if any
+        with self.server.lock:
+            errors = self.server.errors.get(self.path)
+            status = errors.pop(0) if errors else None
 
-        with open(feed_page, 'r') as test_feed_page:
-            test_feed_page = test_feed_page.read()
+        if status is not None:
+            self.send_response(status)
 
-            feed_pages.append(test_feed_page.encode('utf-8'))
+            if status in self.server.retry_after:
+                self.send_header('Retry-After',
+                    str(self.server.retry_after[status]))
 
-        post_urls.append('https://news.ycombinator.com/item?id=' + str(i))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
 
-        post_page = 'fixtures/test-post-' + str(i) + '-page.html'
+        # Serve generated pages registered for this path, otherwise map feed
+        # page (/news?p=1) and post page (/item?id=3&p=2) URLs to fixture files
+        if self.path in self.server.pages:
+            fixture = None
 
-        with open(post_page, 'r') as test_post_page:
-            test_post_page = test_post_page.read()
+        elif url.path == '/news':
+            fixture = 'test-feed-page-' + query.get('p', ['1'])[0] + '.html'
 
-        post_pages.append(test_post_page.encode('utf-8'))
+        elif url.path == '/item' and 'p' in query:
+            fixture = ('test-post-' + query['id'][0] + '-page-' +
+                query['p'][0] + '.html')
 
-    post_urls.append('https://news.ycombinator.com/item?id=3&p=2')
+        elif url.path == '/item':
+            fixture = 'test-post-' + query['id'][0] + '-page.html'
 
-    post_page = 'fixtures/test-post-3-page-2.html'
-    with open(post_page, 'r') as test_post_page:
-        test_post_page = test_post_page.read()
+        else:
+            fixture = None
 
-    post_pages.append(test_post_page.encode('utf-8'))
+        fixture_path = os.path.join(FIXTURES_DIR, fixture or '')
 
-    for i in range(len(feed_urls)):
-        if args[0] == feed_urls[i]:
-            return MockResponse(feed_pages[i], 200)
+        if self.path in self.server.pages:
+            content = self.server.pages[self.path]
 
-    for i in range(len(post_urls)):
-        if args[0] == post_urls[i]:
-            return MockResponse(post_pages[i], 200)
+        elif fixture and os.path.isfile(fixture_path):
+            with open(fixture_path, 'rb') as fixture_page:
+                content = fixture_page.read()
 
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
 
-# Create database tables and load initial data from fixtures and fake HN scrape
-# into test database
-@mock.patch('requests.get', side_effect=mocked_requests_get)
-def initialize_test_database(postgresql, mock_get):
+        # Hold response open to let tests observe concurrent requests
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight,
+                self.server.in_flight)
+
+        time.sleep(self.server.delay)
+
+        with self.server.lock:
+            self.server.in_flight -= 1
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            content = gzip.compress(content)
+            self.server.gzipped += 1
+            self.send_header('Content-Encoding', 'gzip')
+
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        return
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay=0, pages=None, errors=None, retry_after=None):
+        super().__init__(('127.0.0.1', 0), FixtureRequestHandler)
+        self.delay = delay
+        self.pages = pages or {}
+        self.errors = errors or {}
+        self.retry_after = retry_after or {}
+        self.requests = []
+        self.client_ports = set()
+        self.gzipped = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:' + str(self.server_address[1])
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+async def run_with_client(fixture_server, scrape, **kwargs):
+    async with client.HackerNewsClient(fixture_server.url,
+        **kwargs) as hn_client:
+            return await scrape(hn_client)
+
+
+# Add feed and scrape its first page from a fixture server serving pages,
+# returning the run's summary and the paths it requested
+def scrape_feed(feed_id, pages, created=None, delay=0, concurrency=None,
+    **run_kwargs):
+    session = models.Session()
+    session.add(models.Feed(id=feed_id, created=created or datetime.utcnow()))
+    session.commit()
+    session.close()
+
+    async def scrape(hn_client):
+        return await scraper.ScrapeRun(feed_id, hn_client, parse_workers=0,
+            **run_kwargs).run(pages=(1,))
+
+    client_kwargs = {} if concurrency is None else {
+        'concurrency': concurrency}
+
+    with FixtureServer(delay=delay, pages=pages) as fixture_server:
+        summary = asyncio.run(run_with_client(fixture_server, scrape,
+            **client_kwargs))
+
+    return summary, fixture_server.requests
+
+
+# Connect to test database and create its text dictionary and tables
+def create_test_database(postgresql):
     db_port = postgresql.dsn()['port']
     db_host = postgresql.dsn()['host']
     db_user = postgresql.dsn()['user']
@@ -93,9 +196,20 @@ def initialize_test_database(postgresql, mock_get):
 
     alembic.config.main(argv=alembicArgs)
 
-    # Run fake Hacker News scrape to get sample feed, post, and comment from
-    # past hour
-    hacker_news.scrape_loop()
+
+# Create database tables and load initial data from fixtures and fake HN scrape
+# into test database
+def initialize_test_database(postgresql):
+    create_test_database(postgresql)
+
+    # Run fake Hacker News scrape against fixture server to get sample feed,
+    # post, and comment from past hour
+    with FixtureServer() as fixture_server:
+        os.environ['HN_BASE_URL'] = fixture_server.url
+
+        scraper.scrape_loop()
+
+        del os.environ['HN_BASE_URL']
 
     # Connect to database
     session = models.Session()
@@ -201,23 +315,35 @@ def initialize_test_database(postgresql, mock_get):
 
     session.add(all_comment)
 
-    # Add sample feed_comment data to database for each feed and comment
-    past_day_feed_comment = models.FeedComment(
-        comment_id=past_day_comment.id, feed_id=past_day_feed.id,
+    # Add sample comment interval data to database for each feed and comment
+    past_day_comment_interval = models.CommentInterval(
+        comment_id=past_day_comment.id, source='news',
+        first_feed_id=past_day_feed.id, last_feed_id=past_day_feed.id,
         feed_rank=3)
 
-    session.add(past_day_feed_comment)
+    session.add(past_day_comment_interval)
 
-    past_week_feed_comment = models.FeedComment(
-        comment_id=past_week_comment.id, feed_id=past_week_feed.id,
+    past_week_comment_interval = models.CommentInterval(
+        comment_id=past_week_comment.id, source='news',
+        first_feed_id=past_week_feed.id, last_feed_id=past_week_feed.id,
         feed_rank=5)
 
-    session.add(past_week_feed_comment)
+    session.add(past_week_comment_interval)
+
+    all_comment_interval = models.CommentInterval(comment_id=all_comment.id,
+        source='news', first_feed_id=all_feed.id, last_feed_id=all_feed.id,
+        feed_rank=7)
 
-    all_feed_comment = models.FeedComment(comment_id=all_comment.id,
-        feed_id=all_feed.id, feed_rank=7)
+    session.add(all_comment_interval)
+
+    session.commit()
 
-    session.add(all_feed_comment)
+    # Summarize sample posts and roll up sample feeds and posts' comments,
+    # whose rows weren't written by the loader
+    loader.summarize_posts(session.connection())
+    loader.roll_up_posts(session.connection())
+    loader.roll_up_feeds(session.connection(), [past_day_feed.id,
+        past_week_feed.id, all_feed.id])
 
     session.commit()
 